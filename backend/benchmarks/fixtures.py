@@ -0,0 +1,189 @@
+"""
+基准测试用的样例文档
+按规模参数生成 PDF / XLSX / DOCX / PPTX / CSV，内容为模拟的采购清单，结果可复现（固定随机种子）。
+供压测（/api/files/parse）与解析器基准共用，也可指定真实文件目录替代。
+"""
+
+import io
+import os
+import random
+from typing import Dict, List
+
+PRODUCTS = (
+    "服务器", "交换机", "路由器", "防火墙", "笔记本电脑", "台式机", "打印机", "投影仪",
+    "UPS电源", "光纤跳线", "机柜", "存储阵列", "无线AP", "视频会议终端", "硬盘", "内存条",
+)
+SUPPLIERS = (
+    "华信科技有限公司", "中电数码股份有限公司", "联创网络技术有限公司", "远航信息系统有限公司",
+    "鼎新通信设备有限公司", "博远智能科技有限公司",
+)
+COLUMNS = ("序号", "项目名称", "细化产品", "供应商名称", "数量", "单价", "中标金额")
+
+# 生成的文件类型（扩展名）
+DOCUMENT_TYPES = ("pdf", "xlsx", "docx", "pptx", "csv")
+
+
+def sample_rows(n: int, seed: int = 0) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        product = rng.choice(PRODUCTS)
+        quantity = rng.randint(1, 200)
+        unit_price = round(rng.uniform(100, 50000), 2)
+        rows.append(
+            {
+                "序号": i,
+                "项目名称": f"{2020 + i % 5}年度{product}集中采购项目（第{i % 7 + 1}批）",
+                "细化产品": product,
+                "供应商名称": rng.choice(SUPPLIERS),
+                "数量": quantity,
+                "单价": unit_price,
+                "中标金额": round(quantity * unit_price, 2),
+            }
+        )
+    return rows
+
+
+def _wide_values(row: Dict[str, object], width: int) -> List[object]:
+    values = [row[c] for c in COLUMNS]
+    # 超出基本列的部分用数值指标列补齐，模拟宽表
+    values.extend(round(float(row["单价"]) * (k + 1) / 10, 2) for k in range(width - len(COLUMNS)))
+    return values
+
+
+def wide_columns(width: int) -> List[str]:
+    return list(COLUMNS) + [f"指标{k + 1}" for k in range(width - len(COLUMNS))]
+
+
+def make_xlsx(rows: int, sheets: int = 1, width: int = len(COLUMNS)) -> bytes:
+    from openpyxl import Workbook
+
+    # write_only 模式逐行写出，大表生成时内存平稳
+    workbook = Workbook(write_only=True)
+    for s in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{s + 1}")
+        sheet.append(wide_columns(width))
+        for row in sample_rows(rows, seed=s):
+            sheet.append(_wide_values(row, width))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def make_csv(rows: int, width: int = len(COLUMNS)) -> bytes:
+    lines = [",".join(wide_columns(width))]
+    for row in sample_rows(rows):
+        lines.append(",".join(str(v) for v in _wide_values(row, width)))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def make_docx(paragraphs: int, table_rows: int = 50, tables: int = 1) -> bytes:
+    import docx
+
+    document = docx.Document()
+    document.add_heading("采购需求说明书", level=1)
+    for row in sample_rows(paragraphs):
+        document.add_paragraph(
+            f"{row['序号']}. {row['项目名称']}：采购{row['细化产品']} {row['数量']} 台，"
+            f"预算单价 {row['单价']} 元，由{row['供应商名称']}提供技术支持与售后服务。"
+        )
+    for t in range(tables):
+        table = document.add_table(rows=1, cols=len(COLUMNS))
+        for cell, name in zip(table.rows[0].cells, COLUMNS):
+            cell.text = name
+        for row in sample_rows(table_rows, seed=t + 1):
+            for cell, name in zip(table.add_row().cells, COLUMNS):
+                cell.text = str(row[name])
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(slides: int) -> bytes:
+    import pptx
+
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]
+    rows = sample_rows(slides * 5)
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"采购方案 第 {i + 1} 部分"
+        body = slide.placeholders[1].text_frame
+        for row in rows[i * 5 : (i + 1) * 5]:
+            body.add_paragraph().text = f"{row['细化产品']} x{row['数量']} 单价 {row['单价']}"
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """手写最小 PDF（Helvetica 文本页）；标准字体不含中文，文本使用 ASCII。"""
+    rng = random.Random(0)
+    objects: List[bytes] = []
+    page_ids = []
+    font_id = 3
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(b"")  # Pages，页对象生成后回填
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for p in range(pages):
+        text = ["BT /F1 10 Tf 50 790 Td 13 TL"]
+        for line in range(lines_per_page):
+            text.append(
+                f"(Item {p * lines_per_page + line + 1}: product-{rng.randint(1, 500)} "
+                f"qty {rng.randint(1, 200)} unit price {rng.uniform(100, 50000):.2f} CNY) '"
+            )
+        text.append("ET")
+        stream = "\n".join(text).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    )
+    return out.getvalue()
+
+
+def make_document(doc_type: str, scale: int = 1) -> bytes:
+    """按类型生成文档，scale 为规模倍数（1 约为常见的几十 KB 附件）。"""
+    match doc_type:
+        case "pdf":
+            return make_pdf(pages=10 * scale)
+        case "xlsx":
+            return make_xlsx(rows=300 * scale)
+        case "csv":
+            return make_csv(rows=300 * scale)
+        case "docx":
+            return make_docx(paragraphs=100 * scale)
+        case "pptx":
+            return make_pptx(slides=10 * scale)
+    raise ValueError(f"不支持的文档类型: {doc_type}")
+
+
+def build_corpus(directory: str, scale: int = 1) -> List[str]:
+    """在 directory 下生成每种类型一个文档，已存在的文件直接复用。"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for doc_type in DOCUMENT_TYPES:
+        path = os.path.join(directory, f"sample-x{scale}.{doc_type}")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(make_document(doc_type, scale))
+        paths.append(path)
+    return paths
@@ -0,0 +1 @@
+"""后端压测：模拟 LLM 服务 + 本地数据库，测量各接口的延迟分位数、吞吐与内存。"""
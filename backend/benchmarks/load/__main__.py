@@ -0,0 +1,332 @@
+"""
+压测入口：启动模拟 LLM 与后端服务（uvicorn 子进程），依次运行各场景并输出报告
+
+用法（在 backend 目录下）：
+    python -m benchmarks.load --output baseline.json
+    python -m benchmarks.load --baseline baseline.json --fail-on-regression
+    python -m benchmarks.load --scenarios chat,sync --concurrency 50 --requests 500
+
+默认使用临时 SQLite 库代替 MatrixOne（--database-url 可指定本地 MySQL 兼容库），
+LLM 由 benchmarks.load.fake_llm 按 --llm-ttft / --llm-tps 模拟。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fixtures import DOCUMENT_TYPES, build_corpus, sample_rows
+from benchmarks.load.report import compare, format_comparison, summarize
+from benchmarks.load.scenarios import (
+    BENCH_TABLE,
+    SCENARIO_NAMES,
+    Scenario,
+    ScenarioError,
+    build_scenarios,
+)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RssSampler:
+    """后台线程按间隔读取进程 RSS（/proc，仅 Linux；其他平台不报告）。"""
+
+    def __init__(self, pid: int, interval: float = 0.1) -> None:
+        self.path = Path(f"/proc/{pid}/status")
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def read(self) -> Optional[float]:
+        try:
+            for line in self.path.read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    def start(self) -> None:
+        self.peak = self.read() or 0.0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[Dict[str, float]]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        end = self.read()
+        if end is None:
+            return None
+        return {"rss_peak_mb": round(self.peak, 1), "rss_end_mb": round(end, 1)}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            value = self.read()
+            if value is not None:
+                self.peak = max(self.peak, value)
+
+
+async def prepare_database(database_url: str, rows: int) -> None:
+    """建表并生成 MOI 查询场景的样例数据。须在设置 DATABASE_URL 环境变量后导入 src。"""
+    from sqlalchemy import Column, Integer, MetaData, Numeric, String, Table
+
+    from src.db.models import Base
+    from src.db.session import engine
+
+    bench = Table(
+        BENCH_TABLE,
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("项目名称", String(255)),
+        Column("细化产品", String(64), index=True),
+        Column("供应商名称", String(128)),
+        Column("中标金额", Numeric(18, 2)),
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(bench.drop, checkfirst=True)
+        await conn.run_sync(bench.create)
+        batch = []
+        for row in sample_rows(rows):
+            batch.append({name: row[name] for name in ("项目名称", "细化产品", "供应商名称", "中标金额")})
+            if len(batch) >= 1000:
+                await conn.execute(bench.insert(), batch)
+                batch = []
+        if batch:
+            await conn.execute(bench.insert(), batch)
+    await engine.dispose()
+
+
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程已退出（{process.returncode}）: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"等待服务就绪超时: {url}")
+
+
+async def run_scenario(
+    base_url: str,
+    scenario: Scenario,
+    *,
+    concurrency: int,
+    requests: int,
+    duration: Optional[float],
+    warmup: int,
+    sampler: Optional[RssSampler],
+) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await scenario.setup(client)
+        for i in range(warmup):
+            try:
+                await scenario.request(client, i)
+            except (ScenarioError, httpx.HTTPError):
+                pass
+
+        sequence = itertools.count(warmup)
+        latencies: List[float] = []
+        ttfts: List[float] = []
+        errors: List[str] = []
+        last = warmup + requests
+        deadline = time.perf_counter() + duration if duration else None
+
+        async def worker() -> None:
+            while True:
+                i = next(sequence)
+                if (deadline is None and i >= last) or (
+                    deadline is not None and time.perf_counter() >= deadline
+                ):
+                    return
+                started = time.perf_counter()
+                try:
+                    ttft = await scenario.request(client, i)
+                except (ScenarioError, httpx.HTTPError, ValueError, KeyError) as exc:
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+        if sampler is not None:
+            sampler.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        rss = sampler.stop() if sampler is not None else None
+
+    for message in errors[:3]:
+        print(f"  [{scenario.name}] 错误示例: {message}", file=sys.stderr)
+    return summarize(latencies, ttfts, len(errors), elapsed, rss)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="后端压测（模拟 LLM + 本地数据库）")
+    parser.add_argument("--scenarios", default=",".join(SCENARIO_NAMES), help="逗号分隔的场景")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--duration", type=float, help="每个场景的持续秒数（指定时忽略 --requests）")
+    parser.add_argument("--warmup", type=int, default=10, help="每个场景不计入结果的预热请求数")
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="模拟 LLM 首 token 延迟（秒）")
+    parser.add_argument("--llm-tps", type=float, default=50, help="模拟 LLM 生成速度（token/s）")
+    parser.add_argument("--llm-tokens", type=int, default=100, help="模拟 LLM 每次回复的 token 数")
+    parser.add_argument("--database-url", help="默认为临时 SQLite 库")
+    parser.add_argument("--moi-rows", type=int, default=20000, help="MOI 查询样例表行数")
+    parser.add_argument("--corpus", help="/api/files/parse 使用的文档目录（默认生成样例文档）")
+    parser.add_argument("--corpus-scale", type=int, default=1, help="生成样例文档的规模倍数")
+    parser.add_argument("--log-level", default="WARNING", help="后端日志级别")
+    parser.add_argument("--output", help="结果写入 JSON 文件（可作为后续对比的基线）")
+    parser.add_argument("--baseline", help="对比的基线 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="判定退化的相对阈值")
+    parser.add_argument("--fail-on-regression", action="store_true", help="出现退化时以非零状态退出")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    database_url = args.database_url or f"sqlite+aiosqlite:///{workdir}/bench.db"
+    if args.corpus:
+        corpus = sorted(
+            str(p) for p in Path(args.corpus).iterdir() if p.suffix.lstrip(".") in DOCUMENT_TYPES
+        )
+    else:
+        corpus = build_corpus(os.path.join(workdir, "corpus"), args.corpus_scale)
+    scenarios = build_scenarios(names, corpus)
+
+    os.environ["DATABASE_URL"] = database_url
+    asyncio.run(prepare_database(database_url, args.moi_rows))
+
+    llm_port, api_port = free_port(), free_port()
+    llm_url = f"http://127.0.0.1:{llm_port}/v1"
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "LLM_BASE_URL": llm_url,
+        "LLM_API_KEY": "bench",
+        "LLM_DEFAULT_MODEL": "fake-llm",
+        "LLM_STREAM": "true",
+        "EMBEDDING_BASE_URL": llm_url,
+        "EMBEDDING_API_KEY": "bench",
+        "LOG_LEVEL": args.log_level,
+        "TRACING_EXPORTER": "",
+    }
+    processes = []
+    try:
+        llm = start_process(
+            [
+                "-m", "benchmarks.load.fake_llm", "--port", str(llm_port),
+                "--ttft", str(args.llm_ttft), "--tps", str(args.llm_tps),
+                "--tokens", str(args.llm_tokens),
+            ],
+            env,
+        )
+        processes.append(llm)
+        api = start_process(
+            [
+                "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(api_port),
+                "--log-level", "warning", "--no-access-log",
+            ],
+            env,
+        )
+        processes.append(api)
+        wait_ready(f"{llm_url}/models", llm)
+        base_url = f"http://127.0.0.1:{api_port}"
+        wait_ready(f"{base_url}/health", api)
+
+        sampler = RssSampler(api.pid)
+        results: Dict[str, Any] = {}
+        for name, scenario in scenarios.items():
+            print(f"运行场景 {name}: {scenario.description}", file=sys.stderr)
+            results[name] = asyncio.run(
+                run_scenario(
+                    base_url,
+                    scenario,
+                    concurrency=args.concurrency,
+                    requests=args.requests,
+                    duration=args.duration,
+                    warmup=args.warmup,
+                    sampler=sampler,
+                )
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split(":", 1)[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "llm": {"ttft": args.llm_ttft, "tps": args.llm_tps, "tokens": args.llm_tokens},
+            "corpus": [os.path.basename(p) for p in corpus],
+        },
+        "scenarios": results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print(format_comparison(rows), file=sys.stderr)
+        regressions = [r for r in rows if r["regressed"]]
+        if regressions:
+            print(f"{len(regressions)} 项指标超过基线 {args.tolerance:.0%}", file=sys.stderr)
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+OpenAI 兼容的模拟 LLM 服务
+按配置的首 token 延迟（TTFT）与生成速度（token/s）流式返回固定文本，不消耗真实模型额度，
+压测结果只反映后端自身的开销。
+
+用法（单独启动，供手工调试）：
+    python -m benchmarks.load.fake_llm --port 9100 --ttft 0.5 --tps 40 --tokens 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOKENS = ("根据", "历史", "采购", "数据", "，", "该", "产品", "的", "参考", "单价", "约为", "1200", "元", "。")
+EMBEDDING_DIM = 1024
+
+
+def create_app(ttft: float, tps: float, tokens: int, reasoning_tokens: int = 0) -> FastAPI:
+    app = FastAPI(title="fake-llm")
+    interval = 1.0 / tps if tps > 0 else 0.0
+
+    def chunk(model: str, completion_id: str, delta: Dict[str, Any], finish: Any = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def stream(model: str, count: int) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        await asyncio.sleep(ttft)
+        yield chunk(model, completion_id, {"role": "assistant", "content": ""})
+        for i in range(reasoning_tokens):
+            yield chunk(model, completion_id, {"reasoning_content": TOKENS[i % len(TOKENS)]})
+            await asyncio.sleep(interval)
+        for i in range(count):
+            yield chunk(model, completion_id, {"content": TOKENS[i % len(TOKENS)]})
+            await asyncio.sleep(interval)
+        yield chunk(model, completion_id, {}, finish="stop")
+        yield "data: [DONE]\n\n"
+
+    @app.get("/v1/models")
+    async def models() -> Dict[str, Any]:
+        return {"object": "list", "data": [{"id": "fake-llm", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model") or "fake-llm"
+        count = min(tokens, int(body.get("max_tokens") or tokens))
+        if body.get("stream"):
+            return StreamingResponse(stream(model, count), media_type="text/event-stream")
+        await asyncio.sleep(ttft + count * interval)
+        content = "".join(TOKENS[i % len(TOKENS)] for i in range(count))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": count, "total_tokens": count},
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for i, text in enumerate(inputs):
+            # 按文本哈希生成确定性向量，相同文本得到相同向量
+            seed = hashlib.sha256(str(text).encode("utf-8")).digest()
+            vector = [(seed[j % len(seed)] - 128) / 128 for j in range(EMBEDDING_DIM)]
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        return {"object": "list", "data": data, "model": body.get("model") or "fake-embedding"}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模拟 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.5, help="首 token 延迟（秒）")
+    parser.add_argument("--tps", type=float, default=40, help="生成速度（token/s）")
+    parser.add_argument("--tokens", type=int, default=200, help="每次回复的 token 数")
+    parser.add_argument("--reasoning-tokens", type=int, default=0, help="回复前的深度思考 token 数")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(args.ttft, args.tps, args.tokens, args.reasoning_tokens),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
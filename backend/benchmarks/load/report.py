@@ -0,0 +1,90 @@
+"""
+压测结果汇总与基线对比
+延迟类指标（p50/p95/p99、TTFT、RSS 峰值）超过基线 (1 + tolerance) 倍、RPS 低于基线 (1 - tolerance) 倍、
+错误数增加时判定为退化。
+"""
+
+from typing import Any, Dict, List, Optional
+
+# 越大越差的指标
+LOWER_IS_BETTER = (
+    "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms", "rss_peak_mb",
+)
+# 越大越好的指标
+HIGHER_IS_BETTER = ("rps",)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(
+    latencies: List[float],
+    ttfts: List[float],
+    errors: int,
+    elapsed: float,
+    rss: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """latencies / ttfts 单位为秒，输出统一为毫秒。"""
+    summary: Dict[str, Any] = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if ttfts:
+        summary["ttft_p50_ms"] = round(percentile(ttfts, 50) * 1000, 2)
+        summary["ttft_p95_ms"] = round(percentile(ttfts, 95) * 1000, 2)
+    if rss:
+        summary.update(rss)
+    return summary
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[Dict[str, Any]]:
+    """逐场景逐指标对比，返回对比行；基线中没有的场景 / 指标跳过。"""
+    rows: List[Dict[str, Any]] = []
+    for name, result in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER + ("errors",):
+            if metric not in result or metric not in base:
+                continue
+            now, before = result[metric], base[metric]
+            if metric == "errors":
+                regressed = now > before
+            elif metric in HIGHER_IS_BETTER:
+                regressed = now < before * (1 - tolerance)
+            else:
+                regressed = now > before * (1 + tolerance)
+            change = (now - before) / before if before else 0.0
+            rows.append(
+                {
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": now,
+                    "change": round(change, 4),
+                    "regressed": regressed,
+                }
+            )
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'场景':<8}{'指标':<14}{'基线':>12}{'本次':>12}{'变化':>10}"]
+    for row in rows:
+        flag = "  <-- 退化" if row["regressed"] else ""
+        lines.append(
+            f"{row['scenario']:<8}{row['metric']:<14}{row['baseline']:>12}{row['current']:>12}"
+            f"{row['change']:>+10.1%}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+"""
+压测场景
+每个场景先 setup 准备数据，然后由多个并发 worker 反复调用 request；
+request 返回首 token 耗时（只有流式场景有）或 None，响应不符合预期时抛异常计为错误。
+"""
+
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from benchmarks.fixtures import PRODUCTS
+
+# MOI 查询场景使用的样例表（在压测库中生成）
+BENCH_TABLE = "bench_bidding_records"
+
+
+class ScenarioError(Exception):
+    """响应状态码或内容不符合预期"""
+
+
+def _check(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise ScenarioError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+async def _create_conversation(client: httpx.AsyncClient, title: str, messages: int) -> int:
+    payload = {
+        "title": title,
+        "messages": [
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"{title} 第 {i} 条：请比较{PRODUCTS[i % len(PRODUCTS)]}的历史采购价格",
+                "timestamp": int(time.time() * 1000) + i,
+            }
+            for i in range(messages)
+        ],
+    }
+    response = _check(await client.post("/api/conversations/sync", json=payload))
+    return response.json()["id"]
+
+
+class Scenario:
+    name = ""
+    description = ""
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        pass
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> Optional[float]:
+        raise NotImplementedError
+
+
+class ChatScenario(Scenario):
+    """并发 SSE 聊天：带 20 条历史的会话中发送一条消息，读完整个事件流。"""
+
+    name = "chat"
+    description = "POST /api/chat/completions（SSE）"
+
+    def __init__(self, conversations: int = 20, history: int = 20) -> None:
+        self.conversations = conversations
+        self.history = history
+        self._ids: List[int] = []
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        self._ids = [
+            await _create_conversation(client, f"压测聊天 {n}", self.history)
+            for n in range(self.conversations)
+        ]
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> Optional[float]:
+        started = time.perf_counter()
+        first_token: Optional[float] = None
+        done = False
+        payload = {
+            "message": f"{PRODUCTS[i % len(PRODUCTS)]}的参考单价是多少？",
+            "conversation_id": self._ids[i % len(self._ids)],
+        }
+        async with client.stream("POST", "/api/chat/completions", json=payload) as response:
+            if response.status_code >= 400:
+                raise ScenarioError(f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: ") :]
+                if data == "[DONE]":
+                    done = True
+                    break
+                event = json.loads(data)
+                if "error" in event:
+                    raise ScenarioError(str(event["error"])[:200])
+                if first_token is None and event["choices"][0]["delta"]:
+                    first_token = time.perf_counter() - started
+        if not done:
+            raise ScenarioError("事件流未以 [DONE] 结束")
+        return first_token
+
+
+class ParseScenario(Scenario):
+    """上传并解析文档，按语料文件轮流发送。"""
+
+    name = "parse"
+    description = "POST /api/files/parse"
+
+    def __init__(self, paths: Sequence[str]) -> None:
+        self._files = []
+        for path in paths:
+            with open(path, "rb") as f:
+                self._files.append((os.path.basename(path), f.read()))
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> Optional[float]:
+        name, data = self._files[i % len(self._files)]
+        response = _check(await client.post("/api/files/parse", files={"files": (name, data)}))
+        content = response.json()["parsed_files"][0]["content"]
+        if content.startswith("[解析失败") or content.startswith("[不支持"):
+            raise ScenarioError(f"{name}: {content[:200]}")
+        return None
+
+
+class SyncScenario(Scenario):
+    """会话同步突发：每 5 次请求新建一个带 20 条消息的会话，其余向已有会话追加消息。"""
+
+    name = "sync"
+    description = "POST /api/conversations/sync"
+
+    def __init__(self, conversations: int = 20, batch: int = 20) -> None:
+        self.conversations = conversations
+        self.batch = batch
+        self._ids: List[int] = []
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        self._ids = [
+            await _create_conversation(client, f"压测同步 {n}", 2)
+            for n in range(self.conversations)
+        ]
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> Optional[float]:
+        if i % 5 == 0:
+            await _create_conversation(client, f"压测同步新建 {i}", self.batch)
+            return None
+        payload = {
+            "id": self._ids[i % len(self._ids)],
+            "title": "压测同步",
+            "message": {
+                "role": "user",
+                "content": f"追加消息 {i}：{PRODUCTS[i % len(PRODUCTS)]}",
+                "timestamp": int(time.time() * 1000),
+            },
+        }
+        _check(await client.post("/api/conversations/sync", json=payload))
+        return None
+
+
+class MoiScenario(Scenario):
+    """MOI 查询：按细化产品的等值查询与按项目名称的模糊查询交替。"""
+
+    name = "moi"
+    description = "POST /api/moi/run_sql"
+
+    def __init__(self) -> None:
+        self._rng = random.Random(0)
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> Optional[float]:
+        product = PRODUCTS[self._rng.randrange(len(PRODUCTS))]
+        if i % 2 == 0:
+            statement = (
+                f"SELECT `项目名称`, `供应商名称`, `中标金额` FROM {BENCH_TABLE} "
+                f"WHERE `细化产品` = '{product}' ORDER BY `中标金额` DESC LIMIT 20"
+            )
+        else:
+            statement = (
+                f"SELECT `id`, `项目名称` FROM {BENCH_TABLE} "
+                f"WHERE `项目名称` LIKE '%{2020 + i % 5}年度{product}%' LIMIT 20"
+            )
+        response = _check(await client.post("/api/moi/run_sql", json={"statement": statement}))
+        body = response.json()
+        if body.get("error"):
+            raise ScenarioError(body["error"][:200])
+        return None
+
+
+SCENARIO_NAMES = ("chat", "parse", "sync", "moi")
+
+
+def build_scenarios(names: Sequence[str], corpus: Sequence[str]) -> Dict[str, Scenario]:
+    factories = {
+        "chat": ChatScenario,
+        "parse": lambda: ParseScenario(corpus),
+        "sync": SyncScenario,
+        "moi": MoiScenario,
+    }
+    unknown = set(names) - set(factories)
+    if unknown:
+        raise ValueError(f"未知场景: {', '.join(sorted(unknown))}")
+    return {name: factories[name]() for name in names}
+
@@ -0,0 +1,246 @@
+"""
+文档解析器微基准
+对 _parse_pdf / _parse_word / _parse_pptx / _parse_excel / _dataframe_to_markdown 按文档规模
+（页数、行数、表格数、表宽）分别计时并记录峰值内存，与阈值文件对比，超出时以非零状态退出（用于 CI）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.parsers                       # quick 档，对比 parser_thresholds.json
+    python -m benchmarks.parsers --tier full           # 含 200k 行 Excel 等大文档
+    python -m benchmarks.parsers --filter xlsx --repeat 5
+    python -m benchmarks.parsers --update-thresholds   # 以本次结果 × --headroom 重写阈值
+
+- 耗时取 --repeat 次的中位数；峰值内存为单独一次调用中 tracemalloc 统计的 Python 堆分配峰值
+  （含 numpy / pandas 缓冲区，不含 lxml 等 C 库直接 malloc 的内存）；
+- 样例文档由 benchmarks.fixtures 生成并缓存在 --cache-dir，大文档只在首次运行时生成；
+- 阈值与运行机器相关，优化解析器后用 --update-thresholds 收紧，使改进不被后续改动回退。
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from benchmarks.fixtures import (
+    make_csv,
+    make_docx,
+    make_pdf,
+    make_pptx,
+    make_xlsx,
+    sample_rows,
+    wide_columns,
+)
+from src.utils.parse_file_utils import (
+    _dataframe_to_markdown,
+    _parse_excel,
+    _parse_pdf,
+    _parse_pptx,
+    _parse_word,
+)
+
+THRESHOLDS_PATH = Path(__file__).with_name("parser_thresholds.json")
+TIERS = ("quick", "full")
+# 重写阈值时的下限，避免极小用例因抖动误报
+MIN_THRESHOLD_MS = 50.0
+MIN_THRESHOLD_MB = 5.0
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    # pdf / docx / pptx / xlsx / csv / markdown
+    parser: str
+    build: Callable[[], Any]
+    tier: str = "quick"
+
+
+def _frame(rows: int, width: int) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(sample_rows(rows))
+    extra = {
+        name: frame["单价"] * (k + 1) / 10
+        for k, name in enumerate(wide_columns(width)[len(frame.columns) :])
+    }
+    return pd.concat([frame, pd.DataFrame(extra)], axis=1) if extra else frame
+
+
+CASES: List[Case] = [
+    Case("pdf-1p", "pdf", lambda: make_pdf(1)),
+    Case("pdf-50p", "pdf", lambda: make_pdf(50)),
+    Case("pdf-500p", "pdf", lambda: make_pdf(500)),
+    Case("docx-100para", "docx", lambda: make_docx(100, table_rows=0, tables=0)),
+    Case("docx-5000para", "docx", lambda: make_docx(5000, table_rows=0, tables=0)),
+    Case("docx-50tables", "docx", lambda: make_docx(20, table_rows=20, tables=50)),
+    Case("docx-200tables", "docx", lambda: make_docx(20, table_rows=20, tables=200), "full"),
+    Case("pptx-10slides", "pptx", lambda: make_pptx(10)),
+    Case("pptx-100slides", "pptx", lambda: make_pptx(100)),
+    Case("pptx-500slides", "pptx", lambda: make_pptx(500), "full"),
+    Case("xlsx-10rows", "xlsx", lambda: make_xlsx(10)),
+    Case("xlsx-20krows", "xlsx", lambda: make_xlsx(20_000)),
+    Case("xlsx-200krows", "xlsx", lambda: make_xlsx(200_000), "full"),
+    Case("xlsx-1krows-100cols", "xlsx", lambda: make_xlsx(1000, width=100)),
+    Case("xlsx-20sheets", "xlsx", lambda: make_xlsx(500, sheets=20)),
+    Case("csv-10rows", "csv", lambda: make_csv(10)),
+    Case("csv-200krows", "csv", lambda: make_csv(200_000)),
+    Case("csv-10krows-200cols", "csv", lambda: make_csv(10_000, width=200), "full"),
+    Case("markdown-100x7", "markdown", lambda: _frame(100, 7)),
+    Case("markdown-100x200", "markdown", lambda: _frame(100, 200)),
+    Case("markdown-200kx7", "markdown", lambda: _frame(200_000, 7)),
+]
+
+
+def load_payload(case: Case, cache_dir: Path) -> Any:
+    """文档按用例名缓存到磁盘；DataFrame 每次现场构造。"""
+    if case.parser == "markdown":
+        return case.build()
+    path = cache_dir / f"{case.name}.{case.parser}"
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(case.build())
+        os.replace(tmp, path)
+    return path.read_bytes()
+
+
+def invoke(case: Case, payload: Any) -> str:
+    match case.parser:
+        case "pdf":
+            return _parse_pdf(io.BytesIO(payload))
+        case "docx":
+            return _parse_word(io.BytesIO(payload))
+        case "pptx":
+            return _parse_pptx(io.BytesIO(payload))
+        case "xlsx" | "csv":
+            return _parse_excel(io.BytesIO(payload), case.parser)
+        case "markdown":
+            return _dataframe_to_markdown(payload, "Sheet1")
+    raise ValueError(f"未知解析器: {case.parser}")
+
+
+def measure(case: Case, payload: Any, repeat: int) -> Dict[str, Any]:
+    # 预热一次不计时，排除首次调用的导入与缓存开销
+    invoke(case, payload)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = invoke(case, payload)
+        timings.append(time.perf_counter() - started)
+    # 内存单独测一次，tracemalloc 的开销不计入耗时
+    tracemalloc.start()
+    try:
+        invoke(case, payload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    size = len(payload) if isinstance(payload, bytes) else int(payload.memory_usage(deep=True).sum())
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "min_ms": round(min(timings) * 1000, 2),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "input_kb": round(size / 1024, 1),
+        "output_chars": len(output),
+    }
+
+
+def check(results: Dict[str, Dict[str, Any]], thresholds: Dict[str, Any]) -> List[str]:
+    failures = []
+    limits = thresholds.get("cases", {})
+    for name, result in results.items():
+        limit = limits.get(name)
+        if limit is None:
+            continue
+        if result["median_ms"] > limit["max_ms"]:
+            failures.append(f"{name}: 耗时 {result['median_ms']}ms > 阈值 {limit['max_ms']}ms")
+        if result["peak_mb"] > limit["max_peak_mb"]:
+            failures.append(f"{name}: 峰值内存 {result['peak_mb']}MB > 阈值 {limit['max_peak_mb']}MB")
+    return failures
+
+
+def updated_thresholds(
+    results: Dict[str, Dict[str, Any]], thresholds: Dict[str, Any], headroom: float
+) -> Dict[str, Any]:
+    """只重写本次运行过的用例，其余保留。"""
+    cases = dict(thresholds.get("cases", {}))
+    for name, result in results.items():
+        cases[name] = {
+            "max_ms": round(max(result["median_ms"] * headroom, MIN_THRESHOLD_MS), 1),
+            "max_peak_mb": round(max(result["peak_mb"] * headroom, MIN_THRESHOLD_MB), 1),
+        }
+    return {"headroom": headroom, "cases": dict(sorted(cases.items()))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="文档解析器微基准")
+    parser.add_argument("--tier", choices=TIERS, default="quick", help="full 额外包含大文档用例")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(tempfile.gettempdir(), "parser-bench-fixtures"),
+        help="样例文档缓存目录",
+    )
+    parser.add_argument("--thresholds", default=str(THRESHOLDS_PATH))
+    parser.add_argument("--update-thresholds", action="store_true", help="以本次结果重写阈值")
+    parser.add_argument("--headroom", type=float, default=3.0, help="重写阈值时的倍数")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    tiers = TIERS[: TIERS.index(args.tier) + 1]
+    cases = [
+        c for c in CASES if c.tier in tiers and (not args.filter or args.filter in c.name)
+    ]
+    cache_dir = Path(args.cache_dir)
+    thresholds_path = Path(args.thresholds)
+    thresholds = (
+        json.loads(thresholds_path.read_text(encoding="utf-8")) if thresholds_path.exists() else {}
+    )
+    limits = thresholds.get("cases", {})
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(
+        f"{'用例':<24}{'中位数ms':>12}{'最小ms':>12}{'峰值MB':>10}{'输入KB':>10}{'阈值ms':>10}{'阈值MB':>10}",
+        file=sys.stderr,
+    )
+    for case in cases:
+        payload = load_payload(case, cache_dir)
+        result = measure(case, payload, args.repeat)
+        results[case.name] = result
+        limit = limits.get(case.name, {})
+        print(
+            f"{case.name:<24}{result['median_ms']:>12}{result['min_ms']:>12}{result['peak_mb']:>10}"
+            f"{result['input_kb']:>10}{limit.get('max_ms', '-'):>10}{limit.get('max_peak_mb', '-'):>10}",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_thresholds:
+        new = updated_thresholds(results, thresholds, args.headroom)
+        thresholds_path.write_text(
+            json.dumps(new, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"阈值已写入 {thresholds_path}", file=sys.stderr)
+        return
+
+    missing = [c.name for c in cases if c.name not in limits]
+    if missing:
+        print(f"以下用例没有阈值，未做检查: {', '.join(missing)}", file=sys.stderr)
+    failures = check(results, thresholds)
+    for failure in failures:
+        print(f"超出阈值 {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+离线检索效果基准
+对比 关键词 / 向量 / 混合(RRF) 三种检索方式的 recall@k 与延迟
+
+用法（在 backend 目录下）：
+    python -m benchmarks.retrieval_relevance --judgments judgments.jsonl --k 10
+    python -m benchmarks.retrieval_relevance --sample 50 --k 10 --embed
+
+judgments.jsonl 每行一个标注：
+    {"query": "服务器", "corpus": "bidding", "relevant_ids": [12, 35, 98]}
+
+--sample N 时从 bidding_records_1 随机抽取 N 条记录，以其 `细化产品` 为查询，
+同一 `细化产品` 的记录视为相关（银标准标注，适合回归对比而非绝对效果评估）。
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from src.services.keyword_search import escape_term
+from src.services.llm_client import embed_texts
+from src.services.matrixone_client import get_matrixone_client
+from src.services.retrieval import BIDDING_CORPUS, CORPORA, hybrid_search
+
+MODES = {
+    "keyword": {"use_keyword": True, "use_vector": False},
+    "vector": {"use_keyword": False, "use_vector": True},
+    "hybrid": {"use_keyword": True, "use_vector": True},
+}
+
+
+def load_judgments(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def sample_judgments(n: int) -> List[Dict[str, Any]]:
+    """随机抽样生成银标准标注：同一细化产品的记录互为相关。"""
+    client = get_matrixone_client()
+    sampled = await client.run_sql(
+        f"SELECT DISTINCT `细化产品` FROM {BIDDING_CORPUS.table} "
+        f"WHERE `细化产品` IS NOT NULL AND `细化产品` != '' ORDER BY RAND() LIMIT {int(n)};"
+    )
+    judgments = []
+    for row in sampled.get("rows", []):
+        product = row["细化产品"]
+        relevant = await client.run_sql(
+            f"SELECT `id` FROM {BIDDING_CORPUS.table} "
+            f"WHERE `细化产品` = '{escape_term(product)}' LIMIT 1000;"
+        )
+        judgments.append(
+            {
+                "query": product,
+                "corpus": "bidding",
+                "relevant_ids": [r["id"] for r in relevant.get("rows", [])],
+            }
+        )
+    return judgments
+
+
+def recall_at_k(retrieved: List[Any], relevant: set, k: int) -> float:
+    if not relevant:
+        return 0.0
+    hit = len(set(retrieved[:k]) & relevant)
+    return hit / min(len(relevant), k)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run(judgments: List[Dict[str, Any]], k: int, embed: bool) -> Dict[str, Any]:
+    embeddings: List[Optional[List[float]]] = [None] * len(judgments)
+    if embed:
+        embeddings = await embed_texts([j["query"] for j in judgments])
+
+    report: Dict[str, Any] = {}
+    for mode, flags in MODES.items():
+        if flags["use_vector"] and not embed:
+            continue
+        recalls: List[float] = []
+        latencies: List[float] = []
+        for judgment, embedding in zip(judgments, embeddings):
+            corpus = CORPORA[judgment.get("corpus", "bidding")]
+            started = time.perf_counter()
+            hits = await hybrid_search(
+                corpus,
+                judgment["query"],
+                embedding=embedding,
+                top_k=k,
+                select="`细化产品`",
+                **flags,
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(
+                recall_at_k([h.id for h in hits], set(judgment["relevant_ids"]), k)
+            )
+        report[mode] = {
+            f"recall@{k}": round(statistics.mean(recalls), 4) if recalls else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "queries": len(recalls),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="检索效果离线基准")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--judgments", help="标注文件（JSON Lines）")
+    source.add_argument("--sample", type=int, help="随机抽样生成银标准标注的查询数")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embed", action="store_true", help="为查询生成向量，启用向量/混合检索")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    async def _main() -> Dict[str, Any]:
+        judgments = (
+            load_judgments(args.judgments)
+            if args.judgments
+            else await sample_judgments(args.sample)
+        )
+        return await run(judgments, args.k, args.embed)
+
+    report = asyncio.run(_main())
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
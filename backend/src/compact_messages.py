@@ -0,0 +1,88 @@
+"""
+存量消息压缩命令
+将已有消息中超过 MESSAGE_BLOB_THRESHOLD 的 content / deep_thinking 移出行外（新写入的消息自动处理）
+
+用法（在 backend 目录下）：
+    python -m src.compact_messages --batch-size 500
+
+按主键分批处理，每批一个事务，可随时中断后重复执行。
+"""
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import bindparam, select, update
+
+from src.crud.crud_message_blobs import crud_message_blobs
+from src.db.models import Message
+from src.db.session import AsyncSessionLocal
+from src.utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def compact(batch_size: int) -> int:
+    last_id = 0
+    compacted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Message.id, Message.content, Message.deep_thinking)
+                .where(
+                    Message.id > last_id,
+                    Message.content_ref.is_(None),
+                    Message.thinking_ref.is_(None),
+                )
+                .order_by(Message.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            offloaded = await crud_message_blobs.offload(
+                db,
+                [
+                    {"_id": r.id, "content": r.content, "deep_thinking": r.deep_thinking}
+                    for r in rows
+                ],
+            )
+            # 绑定参数名不能与列名相同，统一加下划线前缀
+            changed = [
+                {f"_{k}" if k != "_id" else k: v for k, v in r.items()}
+                for r in offloaded
+                if r["content_ref"] or r["thinking_ref"]
+            ]
+            if changed:
+                # 使用 Core 表对象做 executemany，避免走 ORM 按主键批量更新
+                table = Message.__table__
+                await db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("_id"))
+                    .values(
+                        content=bindparam("_content"),
+                        deep_thinking=bindparam("_deep_thinking"),
+                        content_ref=bindparam("_content_ref"),
+                        thinking_ref=bindparam("_thinking_ref"),
+                    ),
+                    changed,
+                )
+            await db.commit()
+            compacted += len(changed)
+            logger.info(f"已处理至 id={last_id}，累计移出 {compacted} 条")
+    return compacted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="存量消息大字段压缩移出行外")
+    parser.add_argument("--batch-size", type=int, default=500, help="每个事务处理的消息数")
+    args = parser.parse_args()
+    setup_logging()
+    total = asyncio.run(compact(args.batch_size))
+    logger.info(f"完成，共移出 {total} 条消息的大字段")
+
+
+if __name__ == "__main__":
+    main()
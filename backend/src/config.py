@@ -31,6 +31,11 @@ class Settings(BaseModel):
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.7"))
     LLM_STREAM: bool = os.getenv("LLM_STREAM", "true").lower() == "true"
 
+    # 向量嵌入（OpenAI 兼容 /embeddings 接口），未单独配置时复用 LLM 的地址与密钥
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "BAAI/bge-large-zh-v1.5")
+    EMBEDDING_BASE_URL: str = os.getenv("EMBEDDING_BASE_URL", "")
+    EMBEDDING_API_KEY: str = os.getenv("EMBEDDING_API_KEY", "")
+
     # 外部搜索
     WEB_SEARCH_API_URL: str = os.getenv(
         "WEB_SEARCH_API_URL", "https://api.bocha.cn/v1/web-search"
@@ -46,6 +51,96 @@ class Settings(BaseModel):
         "MOI_API_KEY",
         "aAVwjAZB4RG_JcPaFR0ZVR4r5yitSjHeKimpdSFKsDaBEt4QzZGZk35D2dEIBmXXbJKG7XHTsTzq-GyC"
     )
+    # 批量查询时同时处理的标的物数量（每个标的物最多并发 6 条 SQL）
+    MOI_BATCH_CONCURRENCY: int = int(os.getenv("MOI_BATCH_CONCURRENCY", "8"))
+    # 比价计算：每个标的物参考的二采价格库记录数；报价与同一标的物报价中位数之比超过该倍数（或低于其倒数）时标记异常
+    PRICE_HISTORY_TOP_K: int = int(os.getenv("PRICE_HISTORY_TOP_K", "3"))
+    PRICE_OUTLIER_RATIO: float = float(os.getenv("PRICE_OUTLIER_RATIO", "1.5"))
+    # 供应商历史表现物化：两次增量检查之间的最小间隔（秒）
+    SUPPLIER_STATS_REFRESH_SECONDS: int = int(
+        os.getenv("SUPPLIER_STATS_REFRESH_SECONDS", "300")
+    )
+
+    # 消息异步落库：同步接口写入本地 WAL 即返回，后台按批次合并提交到数据库
+    MESSAGE_WRITE_BEHIND: bool = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() == "true"
+    WRITE_BEHIND_DIR: str = os.getenv("WRITE_BEHIND_DIR", "data/write_behind")
+    WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+    # 队列未满一批时的最长等待（秒）
+    WRITE_BEHIND_FLUSH_INTERVAL: float = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.2"))
+    WRITE_BEHIND_MAX_RETRIES: int = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+
+    # 上传文件解析：每个文件进入聊天上下文的最大字符数；PDF 提取达到该字符数即停止
+    FILE_CONTENT_MAX_CHARS: int = int(os.getenv("FILE_CONTENT_MAX_CHARS", "15000"))
+    # PDF 提取：最多处理的页数、进程池大小（0 表示在线程中顺序提取，单核机器默认为 0）与启用进程池的最小页数
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "200"))
+    PDF_WORKERS: int = int(
+        os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1) if (os.cpu_count() or 1) > 1 else 0))
+    )
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+
+    # 报价表结构化提取：外币对人民币汇率（形如 "USD=7.1,EUR=7.7"），识别为报价表的工作表在解析文本中
+    # 输出最多 TABLE_SUMMARY_GROUPS 组比价统计与前 TABLE_PREVIEW_ROWS 行明细（完整数据以类型化列存储）
+    FX_RATES: str = os.getenv("FX_RATES", "USD=7.1,EUR=7.7,HKD=0.91,JPY=0.047")
+    TABLE_SUMMARY_GROUPS: int = int(os.getenv("TABLE_SUMMARY_GROUPS", "30"))
+    TABLE_PREVIEW_ROWS: int = int(os.getenv("TABLE_PREVIEW_ROWS", "20"))
+
+    # 上传文件工件：指定会话上传的文件按 sha256 去重存储原文件与解析文本，超过该字节数的文件不存储
+    FILE_ARTIFACT_MAX_BYTES: int = int(os.getenv("FILE_ARTIFACT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+    # 会话文件检索：/api/files/parse 指定 conversation_id 时，文件按结构切块（每块最多 DOC_CHUNK_MAX_CHARS 字符，
+    # 每个文件最多 DOC_MAX_CHUNKS 块）并写入会话的本地向量索引；每轮聊天检索 top-k 片段，总字符数不超过 DOC_CONTEXT_MAX_CHARS
+    DOC_INDEX_DIR: str = os.getenv("DOC_INDEX_DIR", "data/doc_index")
+    DOC_INDEX_CACHE_MAX_BYTES: int = int(
+        os.getenv("DOC_INDEX_CACHE_MAX_BYTES", str(128 * 1024 * 1024))
+    )
+    DOC_CHUNK_MAX_CHARS: int = int(os.getenv("DOC_CHUNK_MAX_CHARS", "1500"))
+    DOC_MAX_CHUNKS: int = int(os.getenv("DOC_MAX_CHUNKS", "2000"))
+    DOC_RETRIEVAL_TOP_K: int = int(os.getenv("DOC_RETRIEVAL_TOP_K", "6"))
+    DOC_CONTEXT_MAX_CHARS: int = int(os.getenv("DOC_CONTEXT_MAX_CHARS", "6000"))
+
+    # 会话消息热缓存：内存预算（字节，0 表示关闭）与每个会话缓存的消息条数上限
+    CONVERSATION_CACHE_MAX_BYTES: int = int(
+        os.getenv("CONVERSATION_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+    )
+    CONVERSATION_CACHE_MAX_MESSAGES: int = int(
+        os.getenv("CONVERSATION_CACHE_MAX_MESSAGES", "500")
+    )
+
+    # 会话清理 / 归档：每个短事务删除的消息条数与归档文件目录
+    PURGE_CHUNK_SIZE: int = int(os.getenv("PURGE_CHUNK_SIZE", "1000"))
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "data/archive")
+    # 保留策略：归档超过该天数未更新的非置顶会话（0 表示关闭），以及执行间隔与单次上限
+    RETENTION_DAYS: int = int(os.getenv("RETENTION_DAYS", "0"))
+    RETENTION_INTERVAL_SECONDS: int = int(os.getenv("RETENTION_INTERVAL_SECONDS", "86400"))
+    RETENTION_BATCH_LIMIT: int = int(os.getenv("RETENTION_BATCH_LIMIT", "10000"))
+
+    # 消息大字段行外存储：content / deep_thinking 超过该字节数时压缩存入 message_blobs
+    # （按内容去重，0 表示关闭），消息行内只保留前 MESSAGE_PREVIEW_CHARS 个字符的预览
+    MESSAGE_BLOB_THRESHOLD: int = int(os.getenv("MESSAGE_BLOB_THRESHOLD", "8192"))
+    MESSAGE_PREVIEW_CHARS: int = int(os.getenv("MESSAGE_PREVIEW_CHARS", "500"))
+
+    # 日志：LOG_FORMAT 取 text / json；LOG_RATE_LIMITS 形如 "src.routers.moi=50,src.services.matrixone_client=20"
+    # （每秒条数，按 logger 名前缀匹配，只限制 WARNING 以下）；LOG_MAX_VALUE_CHARS 为 truncated() 参数的默认长度
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_RATE_LIMITS: str = os.getenv("LOG_RATE_LIMITS", "")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_MAX_VALUE_CHARS: int = int(os.getenv("LOG_MAX_VALUE_CHARS", "2000"))
+
+    # 事件循环监控：每 LOOP_MONITOR_INTERVAL 秒采样调度延迟（0 关闭），阻塞超过 LOOP_BLOCK_THRESHOLD 秒时
+    # 记录事件循环线程的调用栈；LOOP_MONITOR_DEV 开启 asyncio 调试模式并报告事件循环线程上的同步 I/O
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+    LOOP_BLOCK_THRESHOLD: float = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+    LOOP_MONITOR_DEV: bool = os.getenv("LOOP_MONITOR_DEV", "false").lower() == "true"
+
+    # 链路追踪（OpenTelemetry，需安装可选依赖 tracing）：
+    # TRACING_EXPORTER 取 otlp / file / console，留空关闭；采样率作用于无上游 traceparent 的请求
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "").lower()
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "0.1"))
+    TRACING_OTLP_ENDPOINT: str = os.getenv(
+        "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+    )
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "logs/traces.jsonl")
 
 
 settings = Settings()
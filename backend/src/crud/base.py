@@ -1,9 +1,11 @@
+import inspect
 from typing import Any, Dict, Generic, Optional, Type, TypeVar
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.models import Base
+from src.utils.tracing import traced
 
 ModelType = TypeVar("ModelType", bound=Base)
 
@@ -11,12 +13,29 @@ ModelType = TypeVar("ModelType", bound=Base)
 class CRUDBase(Generic[ModelType]):
     """通用 CRUD 基类，提供基础的 get/create/update 能力。"""
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # 公开的协程方法（含继承的基类方法）自动建立 span：crud.<类名>.<方法名>
+        for name in dir(cls):
+            if name.startswith("_"):
+                continue
+            attr = getattr(cls, name)
+            if inspect.iscoroutinefunction(attr) and not hasattr(attr, "__wrapped__"):
+                setattr(cls, name, traced(f"crud.{cls.__name__}.{name}")(attr))
+
     def __init__(self, model: Type[ModelType]) -> None:
         self.model = model
 
     async def get(self, db: AsyncSession, obj_id: int) -> Optional[ModelType]:
         return await db.get(self.model, obj_id)
 
+    async def exists(self, db: AsyncSession, obj_id: int) -> bool:
+        """只查主键判断记录是否存在，避免加载整行。"""
+        result = await db.execute(
+            select(self.model.id).where(self.model.id == obj_id)
+        )
+        return result.scalar_one_or_none() is not None
+
     async def create(
         self, db: AsyncSession, *, obj_in: Dict[str, Any]
     ) -> ModelType:
@@ -1,6 +1,7 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Row, and_, insert, literal, or_, select, update
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.crud.base import CRUDBase
@@ -8,17 +9,161 @@ from src.db.models import Conversation
 from datetime import datetime
 
 
+# 会话状态：删除 / 归档先打标记立即从列表隐藏，再由后台任务分批清理
+STATUS_ACTIVE = "active"
+STATUS_DELETING = "deleting"
+STATUS_ARCHIVING = "archiving"
+REMOVAL_STATUSES = (STATUS_DELETING, STATUS_ARCHIVING)
+
+# 列表只需要的列：不加载 first_user_message 等大字段，也不构造 ORM 实体
+CONVERSATION_LIST_COLUMNS = (
+    Conversation.id,
+    Conversation.name,
+    Conversation.pinned,
+    Conversation.created_at,
+    Conversation.updated_at,
+)
+
+
+class ConversationUnavailable(Exception):
+    """同步目标会话不存在（status 为 None）或正在删除 / 归档。"""
+
+    def __init__(self, conversation_id: int, status: Optional[str]) -> None:
+        super().__init__(f"conversation {conversation_id} is {status or 'missing'}")
+        self.conversation_id = conversation_id
+        self.status = status
+
+
 class CRUDConversations(CRUDBase[Conversation]):
     async def list_conversations(
         self, db: AsyncSession, limit: int = 50, offset: int = 0
-    ) -> List[Conversation]:
+    ) -> List[Row]:
         result = await db.execute(
-            select(Conversation)
+            select(*CONVERSATION_LIST_COLUMNS)
+            .where(Conversation.status.notin_(REMOVAL_STATUSES))
             .order_by(Conversation.pinned.desc(), Conversation.updated_at.desc())
             .offset(offset)
             .limit(limit)
         )
-        return list(result.scalars().all())
+        return list(result.all())
+
+    async def search_by_name(
+        self, db: AsyncSession, *, term: str, limit: int, fulltext: bool = True
+    ) -> List[Row]:
+        """按会话名称检索：fulltext 时按全文索引相关度排序，否则 LIKE 匹配按更新时间排序。"""
+        if fulltext:
+            score = match(Conversation.name, against=term)
+            condition = score > 0
+            order = (score.desc(), Conversation.id.desc())
+        else:
+            score = literal(0.0)
+            condition = Conversation.name.contains(term, autoescape=True)
+            order = (Conversation.updated_at.desc(), Conversation.id.desc())
+        result = await db.execute(
+            select(*CONVERSATION_LIST_COLUMNS, score.label("score"))
+            .where(condition, Conversation.status.notin_(REMOVAL_STATUSES))
+            .order_by(*order)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def list_conversations_page(
+        self,
+        db: AsyncSession,
+        *,
+        limit: int = 50,
+        after: Optional[Tuple[bool, datetime, int]] = None,
+    ) -> List[Row]:
+        """keyset 分页：按 (pinned, updated_at, id) 降序，取游标之后的 limit 条。
+
+        谓词展开为 OR 形式而非行值比较，以便各数据库都能走复合索引的范围扫描。
+        """
+        stmt = select(*CONVERSATION_LIST_COLUMNS).where(
+            Conversation.status.notin_(REMOVAL_STATUSES)
+        )
+        if after is not None:
+            pinned, updated_at, conv_id = after
+            same_pinned = and_(
+                Conversation.pinned == bool(pinned),
+                or_(
+                    Conversation.updated_at < updated_at,
+                    and_(
+                        Conversation.updated_at == updated_at,
+                        Conversation.id < conv_id,
+                    ),
+                ),
+            )
+            # 降序下置顶会话在前：游标位于置顶段时，非置顶会话整体排在其后
+            stmt = stmt.where(
+                or_(Conversation.pinned == False, same_pinned)  # noqa: E712
+                if pinned
+                else same_pinned
+            )
+        result = await db.execute(
+            stmt.order_by(
+                Conversation.pinned.desc(),
+                Conversation.updated_at.desc(),
+                Conversation.id.desc(),
+            ).limit(limit)
+        )
+        return list(result.all())
+
+    async def upsert_for_sync(
+        self,
+        db: AsyncSession,
+        *,
+        conversation_id: Optional[int],
+        name: str,
+        created_at: datetime,
+        updated_at: datetime,
+    ) -> Tuple[int, bool]:
+        """同步用的会话 upsert，返回 (会话 id, 是否新建)。
+
+        带 id 时只刷新 active 会话的 updated_at（单条 UPDATE，以影响行数判断是否命中），
+        未命中说明会话不存在或正在删除 / 归档，抛出 ConversationUnavailable，
+        避免清理任务删除会话时新消息的外键阻塞删除；
+        不带 id 时用 Core INSERT 新建，主键取自 lastrowid，不再 flush / refresh 实体。
+        """
+        if conversation_id is not None:
+            result = await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id, Conversation.status == STATUS_ACTIVE)
+                .values(updated_at=updated_at)
+            )
+            if result.rowcount:
+                return conversation_id, False
+            raise ConversationUnavailable(
+                conversation_id, await self.get_status(db, conversation_id)
+            )
+
+        result = await db.execute(
+            insert(Conversation).values(
+                name=name,
+                first_user_message=name,
+                status=STATUS_ACTIVE,
+                created_at=created_at,
+                updated_at=updated_at,
+            )
+        )
+        return result.inserted_primary_key[0], True
+
+    async def get_status(self, db: AsyncSession, conversation_id: int) -> Optional[str]:
+        result = await db.execute(
+            select(Conversation.status).where(Conversation.id == conversation_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def is_active(self, db: AsyncSession, conversation_id: int) -> bool:
+        """会话存在且未被标记删除 / 归档。"""
+        return await self.get_status(db, conversation_id) == STATUS_ACTIVE
+
+    async def get_created_at(
+        self, db: AsyncSession, conversation_id: int
+    ) -> Optional[datetime]:
+        result = await db.execute(
+            select(Conversation.created_at).where(Conversation.id == conversation_id)
+        )
+        return result.scalar_one_or_none()
 
     async def update_name(
         self, db: AsyncSession, conversation_id: int, name: str
@@ -36,6 +181,48 @@ class CRUDConversations(CRUDBase[Conversation]):
             db, conversation_id, {"updated_at": datetime.utcnow()}
         )
 
+    async def mark_for_removal(
+        self,
+        db: AsyncSession,
+        *,
+        new_status: str,
+        ids: Optional[Sequence[int]] = None,
+        updated_before: Optional[datetime] = None,
+        status: Optional[str] = None,
+        include_pinned: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """按 id 或条件（最后更新时间、状态）选出会话并打上删除 / 归档标记，返回会话 id。"""
+        stmt = select(Conversation.id).where(Conversation.status.notin_(REMOVAL_STATUSES))
+        if ids:
+            stmt = stmt.where(Conversation.id.in_(ids))
+        if updated_before is not None:
+            stmt = stmt.where(Conversation.updated_at < updated_before)
+        if status is not None:
+            stmt = stmt.where(Conversation.status == status)
+        if not include_pinned:
+            stmt = stmt.where(Conversation.pinned == False)  # noqa: E712
+        if limit is not None:
+            stmt = stmt.order_by(Conversation.updated_at).limit(limit)
+
+        conv_ids = list((await db.execute(stmt)).scalars().all())
+        for start in range(0, len(conv_ids), 1000):
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id.in_(conv_ids[start : start + 1000]))
+                # 保留原更新时间（否则会触发 onupdate），归档记录需要真实的最后活跃时间
+                .values(status=new_status, updated_at=Conversation.updated_at)
+            )
+        return conv_ids
+
+    async def list_pending_removal(self, db: AsyncSession) -> List[int]:
+        result = await db.execute(
+            select(Conversation.id)
+            .where(Conversation.status.in_(REMOVAL_STATUSES))
+            .order_by(Conversation.id)
+        )
+        return list(result.scalars().all())
+
     async def delete_conversation(self, db: AsyncSession, conversation_id: int) -> None:
         await self.delete_by_id(db, conversation_id)
 
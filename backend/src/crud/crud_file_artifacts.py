@@ -0,0 +1,220 @@
+import asyncio
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from sqlalchemy import Row, delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.crud.base import CRUDBase
+from src.crud.crud_message_blobs import GC_GRACE, THREAD_THRESHOLD_BYTES
+from src.db.models import ConversationArtifact, FileArtifact, now_shanghai
+from src.utils.compression import compress, decompress
+
+# 不读取 data / parsed 大字段的元数据列
+ARTIFACT_META_COLUMNS = (
+    FileArtifact.id,
+    FileArtifact.sha256,
+    FileArtifact.name,
+    FileArtifact.ext,
+    FileArtifact.size,
+    FileArtifact.parsed_size,
+)
+
+
+async def _maybe_thread(size: int, fn, *args):
+    if size > THREAD_THRESHOLD_BYTES:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def _encode(data: bytes, parsed: str) -> Dict[str, Any]:
+    codec, payload = compress(data)
+    parsed_bytes = parsed.encode("utf-8")
+    parsed_codec, parsed_payload = compress(parsed_bytes)
+    return {
+        "codec": codec,
+        "data": payload,
+        "parsed_codec": parsed_codec,
+        "parsed_size": len(parsed_bytes),
+        "parsed": parsed_payload,
+    }
+
+
+def _decode_parsed(rows: Sequence[Any]) -> Dict[str, str]:
+    return {r.sha256: decompress(r.parsed_codec, r.parsed).decode("utf-8") for r in rows}
+
+
+class CRUDFileArtifacts(CRUDBase[FileArtifact]):
+    async def get_meta(self, db: AsyncSession, digests: Iterable[str]) -> Dict[str, Row]:
+        """按 sha256 批量查询已存储文件的元数据。"""
+        digests = list(set(digests))
+        if not digests:
+            return {}
+        result = await db.execute(
+            select(*ARTIFACT_META_COLUMNS).where(FileArtifact.sha256.in_(digests))
+        )
+        return {row.sha256: row for row in result.all()}
+
+    async def store(
+        self,
+        db: AsyncSession,
+        *,
+        sha256: str,
+        name: str,
+        ext: str,
+        data: bytes,
+        parsed: str,
+        tables: Optional[bytes] = None,
+    ) -> int:
+        """压缩后写入（内容已存在时跳过），返回记录 id；tables 为已压缩的 npz，原样存储。"""
+        encoded = await _maybe_thread(len(data) + len(parsed), _encode, data, parsed)
+        # 并发上传同一内容时依赖唯一索引去重
+        await db.execute(
+            insert(FileArtifact)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .values(sha256=sha256, name=name, ext=ext, size=len(data), tables=tables, **encoded)
+        )
+        result = await db.execute(select(FileArtifact.id).where(FileArtifact.sha256 == sha256))
+        return result.scalar_one()
+
+    async def load_parsed(self, db: AsyncSession, digests: Iterable[str]) -> Dict[str, str]:
+        """批量读取解析文本：sha256 -> 文本。"""
+        digests = list(set(digests))
+        if not digests:
+            return {}
+        result = await db.execute(
+            select(FileArtifact.sha256, FileArtifact.parsed_codec, FileArtifact.parsed).where(
+                FileArtifact.sha256.in_(digests)
+            )
+        )
+        rows = result.all()
+        return await _maybe_thread(sum(len(r.parsed) for r in rows), _decode_parsed, rows)
+
+    async def load_data(self, db: AsyncSession, sha256: str) -> Optional[bytes]:
+        """读取原文件（重新切块建立索引时使用）。"""
+        result = await db.execute(
+            select(FileArtifact.codec, FileArtifact.data).where(FileArtifact.sha256 == sha256)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        return await _maybe_thread(len(row.data), decompress, row.codec, row.data)
+
+    async def load_tables(self, db: AsyncSession, sha256: str) -> Optional[bytes]:
+        """读取报价表提取结果（npz）；未提取或未识别出报价表时为 None。"""
+        result = await db.execute(select(FileArtifact.tables).where(FileArtifact.sha256 == sha256))
+        return result.scalar_one_or_none()
+
+    async def set_tables(self, db: AsyncSession, sha256: str, tables: bytes) -> None:
+        """回填报价表提取结果（历史文件首次查询时）。"""
+        await db.execute(
+            update(FileArtifact).where(FileArtifact.sha256 == sha256).values(tables=tables)
+        )
+
+    # ------------------------------------------------------------------
+    # 会话关联
+    # ------------------------------------------------------------------
+
+    async def list_links(
+        self, db: AsyncSession, conversation_id: int, digests: Optional[Iterable[str]] = None
+    ) -> Dict[str, Row]:
+        """会话关联的文件：sha256 -> (artifact_id, sha256, name, size, chunks, created_at)，按上传时间排序。"""
+        stmt = (
+            select(
+                ConversationArtifact.artifact_id,
+                FileArtifact.sha256,
+                ConversationArtifact.name,
+                FileArtifact.size,
+                ConversationArtifact.chunks,
+                ConversationArtifact.created_at,
+            )
+            .join(FileArtifact, FileArtifact.id == ConversationArtifact.artifact_id)
+            .where(ConversationArtifact.conversation_id == conversation_id)
+            .order_by(ConversationArtifact.created_at, ConversationArtifact.id)
+        )
+        if digests is not None:
+            digests = list(set(digests))
+            if not digests:
+                return {}
+            stmt = stmt.where(FileArtifact.sha256.in_(digests))
+        result = await db.execute(stmt)
+        return {row.sha256: row for row in result.all()}
+
+    async def link(
+        self, db: AsyncSession, *, conversation_id: int, artifact_id: int, name: str, chunks: int
+    ) -> None:
+        """关联文件到会话；已关联时更新文件名与片段数。文件已被回收时抛出 LookupError。"""
+        # 刷新文件的 updated_at：行锁与宽限期保证其在本事务提交前不会被并发的会话清理回收
+        touched = await db.execute(
+            update(FileArtifact)
+            .where(FileArtifact.id == artifact_id)
+            .values(updated_at=now_shanghai())
+        )
+        if not touched.rowcount:
+            raise LookupError(f"file artifact {artifact_id} no longer exists")
+        result = await db.execute(
+            update(ConversationArtifact)
+            .where(
+                ConversationArtifact.conversation_id == conversation_id,
+                ConversationArtifact.artifact_id == artifact_id,
+            )
+            .values(name=name, chunks=chunks)
+        )
+        if result.rowcount:
+            return
+        # 不加 IGNORE：外键失败须报错，否则调用方会把未建立的关联当作成功
+        await db.execute(
+            insert(ConversationArtifact).values(
+                conversation_id=conversation_id,
+                artifact_id=artifact_id,
+                name=name,
+                chunks=chunks,
+            )
+        )
+
+    async def unlink_conversation(self, db: AsyncSession, conversation_id: int) -> None:
+        """删除会话的文件关联，并回收不再被任何会话引用的文件（会话清理时调用）。"""
+        result = await db.execute(
+            select(ConversationArtifact.artifact_id).where(
+                ConversationArtifact.conversation_id == conversation_id
+            )
+        )
+        artifact_ids = list(result.scalars().all())
+        if not artifact_ids:
+            return
+        await db.execute(
+            delete(ConversationArtifact).where(
+                ConversationArtifact.conversation_id == conversation_id
+            )
+        )
+        await self._collect(db, artifact_ids)
+
+    async def collect_orphans(self, db: AsyncSession, limit: int) -> int:
+        """回收最多 limit 个无关联且超过宽限期的文件，返回删除个数。
+
+        unlink_conversation 会跳过宽限期内的文件，由清理任务定期调用本方法最终回收。
+        """
+        result = await db.execute(
+            select(FileArtifact.id)
+            .where(
+                FileArtifact.updated_at < now_shanghai() - GC_GRACE,
+                ~exists().where(ConversationArtifact.artifact_id == FileArtifact.id),
+            )
+            .limit(limit)
+        )
+        artifact_ids = list(result.scalars().all())
+        if artifact_ids:
+            await self._collect(db, artifact_ids)
+        return len(artifact_ids)
+
+    async def _collect(self, db: AsyncSession, artifact_ids: Sequence[int]) -> None:
+        await db.execute(
+            delete(FileArtifact).where(
+                FileArtifact.id.in_(artifact_ids),
+                FileArtifact.updated_at < now_shanghai() - GC_GRACE,
+                ~exists().where(ConversationArtifact.artifact_id == FileArtifact.id),
+            )
+        )
+
+
+crud_file_artifacts = CRUDFileArtifacts(FileArtifact)
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import logging
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Sequence, Set
+
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.base import CRUDBase
+from src.db.models import Message, MessageBlob, now_shanghai
+from src.utils.compression import compress, decompress
+
+# 可移出行外的字段 -> 引用列
+OFFLOAD_FIELDS = (("content", "content_ref"), ("deep_thinking", "thinking_ref"))
+
+# 超过该字节数时在线程中压缩 / 解压，避免阻塞事件循环
+THREAD_THRESHOLD_BYTES = 256 * 1024
+
+# 只回收超过该时长未被写入引用的内容：写入消息时会在同一事务中刷新内容的 updated_at，
+# 并发的清理不会删除正在被新消息引用、但该消息尚未提交的内容
+GC_GRACE = timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+
+class CRUDMessageBlobs(CRUDBase[MessageBlob]):
+    async def offload(
+        self, db: AsyncSession, rows: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """将超过阈值的 content / deep_thinking 压缩后存入 message_blobs。
+
+        返回新的行：原字段替换为预览，引用列填入内容 sha256；相同内容只存一份。
+        """
+        threshold = settings.MESSAGE_BLOB_THRESHOLD
+        preview_chars = settings.MESSAGE_PREVIEW_CHARS
+        blobs: Dict[str, bytes] = {}
+        out: List[Dict[str, Any]] = []
+        for row in rows:
+            row = {**row, "content_ref": None, "thinking_ref": None}
+            for field, ref_field in OFFLOAD_FIELDS:
+                value = row.get(field)
+                if threshold <= 0 or not value:
+                    continue
+                data = value.encode("utf-8")
+                if len(data) < threshold:
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                blobs.setdefault(digest, data)
+                row[field] = value[:preview_chars]
+                row[ref_field] = digest
+            out.append(row)
+        if blobs:
+            await self._store(db, blobs)
+        return out
+
+    async def _store(self, db: AsyncSession, blobs: Dict[str, bytes]) -> None:
+        # 已存在的内容刷新 updated_at：行锁与宽限期保证其在本事务提交前不会被 collect_garbage 删除
+        await db.execute(
+            update(MessageBlob)
+            .where(MessageBlob.sha256.in_(list(blobs)))
+            .values(updated_at=now_shanghai())
+        )
+        result = await db.execute(
+            select(MessageBlob.sha256).where(MessageBlob.sha256.in_(list(blobs)))
+        )
+        existing = set(result.scalars().all())
+        missing = {k: v for k, v in blobs.items() if k not in existing}
+        if not missing:
+            return
+        if sum(len(v) for v in missing.values()) > THREAD_THRESHOLD_BYTES:
+            encoded = await asyncio.to_thread(_compress_all, missing)
+        else:
+            encoded = _compress_all(missing)
+        # 并发写入同一内容时依赖唯一索引去重
+        await db.execute(
+            insert(MessageBlob)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .values(encoded)
+        )
+
+    async def hydrate(self, db: AsyncSession, rows: Sequence[Any]) -> List[Any]:
+        """批量还原行外字段：一次查询取回本批引用的全部内容。"""
+        refs: Set[str] = set()
+        for row in rows:
+            for _, ref_field in OFFLOAD_FIELDS:
+                ref = getattr(row, ref_field, None)
+                if ref:
+                    refs.add(ref)
+        if not refs:
+            return list(rows)
+
+        result = await db.execute(
+            select(MessageBlob.sha256, MessageBlob.codec, MessageBlob.data).where(
+                MessageBlob.sha256.in_(refs)
+            )
+        )
+        stored = result.all()
+        if sum(len(b.data) for b in stored) > THREAD_THRESHOLD_BYTES:
+            texts = await asyncio.to_thread(_decompress_all, stored)
+        else:
+            texts = _decompress_all(stored)
+        lost = refs - texts.keys()
+        if lost:
+            logger.error(
+                f"Message blobs missing, returning previews instead: {sorted(lost)}"
+            )
+
+        hydrated: List[Any] = []
+        for row in rows:
+            replaced = {
+                field: texts[getattr(row, ref_field)]
+                for field, ref_field in OFFLOAD_FIELDS
+                if getattr(row, ref_field, None) in texts
+            }
+            hydrated.append(
+                SimpleNamespace(**{**row._asdict(), **replaced}) if replaced else row
+            )
+        return hydrated
+
+    async def collect_garbage(self, db: AsyncSession, refs: Iterable[str]) -> None:
+        """删除不再被任何消息引用、且超过 GC_GRACE 未被写入引用的内容（消息删除后调用）。"""
+        refs = [r for r in set(refs) if r]
+        if not refs:
+            return
+        await db.execute(
+            delete(MessageBlob).where(
+                MessageBlob.sha256.in_(refs),
+                MessageBlob.updated_at < now_shanghai() - GC_GRACE,
+                ~exists().where(Message.content_ref == MessageBlob.sha256),
+                ~exists().where(Message.thinking_ref == MessageBlob.sha256),
+            )
+        )
+
+    async def collect_orphans(self, db: AsyncSession, limit: int) -> int:
+        """回收最多 limit 条无引用且超过宽限期的内容，返回删除条数。
+
+        collect_garbage 会跳过宽限期内的内容，由清理任务定期调用本方法最终回收。
+        """
+        result = await db.execute(
+            select(MessageBlob.sha256)
+            .where(
+                MessageBlob.updated_at < now_shanghai() - GC_GRACE,
+                ~exists().where(Message.content_ref == MessageBlob.sha256),
+                ~exists().where(Message.thinking_ref == MessageBlob.sha256),
+            )
+            .limit(limit)
+        )
+        refs = list(result.scalars().all())
+        await self.collect_garbage(db, refs)
+        return len(refs)
+
+
+def _compress_all(blobs: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    rows = []
+    for digest, data in blobs.items():
+        codec, payload = compress(data)
+        rows.append({"sha256": digest, "codec": codec, "raw_size": len(data), "data": payload})
+    return rows
+
+
+def _decompress_all(stored: Sequence[Any]) -> Dict[str, str]:
+    return {b.sha256: decompress(b.codec, b.data).decode("utf-8") for b in stored}
+
+
+crud_message_blobs = CRUDMessageBlobs(MessageBlob)
@@ -1,10 +1,49 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy import delete, select
+from sqlalchemy import Row, and_, delete, insert, literal, or_, select
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.crud.base import CRUDBase
-from src.db.models import Message
+from src.crud.crud_conversations import REMOVAL_STATUSES
+from src.crud.crud_message_blobs import crud_message_blobs
+from src.db.models import Conversation, Message
+
+
+# 是否有思考过程：只判断空值，不读取大字段本身
+MESSAGE_HAS_THINKING = or_(
+    Message.deep_thinking.is_not(None), Message.thinking_ref.is_not(None)
+).label("has_thinking")
+
+# 接口字段 -> 需要查询的列；引用列用于还原行外大字段
+MESSAGE_FIELD_COLUMNS = {
+    "id": (Message.id,),
+    "role": (Message.role,),
+    "content": (Message.content, Message.content_ref),
+    "timestamp": (Message.created_at,),
+    "deep_thinking": (Message.deep_thinking, Message.thinking_ref),
+    "model": (Message.model,),
+    "has_thinking": (MESSAGE_HAS_THINKING,),
+}
+MESSAGE_FIELDS = tuple(MESSAGE_FIELD_COLUMNS)
+# 历史列表默认不返回 deep_thinking（通常比回答本身更大），按需单独获取
+DEFAULT_MESSAGE_FIELDS = ("id", "role", "content", "timestamp", "model", "has_thinking")
+
+
+def message_columns(fields: Sequence[str]) -> Tuple[Any, ...]:
+    """按接口字段生成查询列，始终包含 keyset 分页所需的 id 与 created_at。"""
+    columns: Dict[str, Any] = {"id": Message.id, "created_at": Message.created_at}
+    for name in fields:
+        for column in MESSAGE_FIELD_COLUMNS[name]:
+            columns.setdefault(column.key, column)
+    return tuple(columns.values())
+
+
+# 历史列表接口所需的列（不含 conversation_id、updated_at）
+MESSAGE_LIST_COLUMNS = message_columns(MESSAGE_FIELDS)
+# 构造聊天上下文与热缓存所需的列，不读取 deep_thinking
+MESSAGE_CONTEXT_COLUMNS = message_columns(DEFAULT_MESSAGE_FIELDS)
 
 
 class CRUDMessages(CRUDBase[Message]):
@@ -29,6 +68,19 @@ class CRUDMessages(CRUDBase[Message]):
             },
         )
 
+    async def insert_many(
+        self, db: AsyncSession, rows: Sequence[Dict[str, Any]]
+    ) -> int:
+        """多行 VALUES 一条 INSERT 写入多条消息，不构造 ORM 实体。
+
+        各行须包含相同的键；超过阈值的大字段先压缩移出行外。返回写入条数。
+        """
+        if not rows:
+            return 0
+        rows = await crud_message_blobs.offload(db, rows)
+        await db.execute(insert(Message).values(rows))
+        return len(rows)
+
     async def list_messages(
         self,
         db: AsyncSession,
@@ -36,15 +88,115 @@ class CRUDMessages(CRUDBase[Message]):
         conversation_id: int,
         limit: int = 50,
         offset: int = 0,
-    ) -> List[Message]:
+        columns: Sequence[Any] = MESSAGE_LIST_COLUMNS,
+    ) -> List[Row]:
         result = await db.execute(
-            select(Message)
+            select(*columns)
             .where(Message.conversation_id == conversation_id)
             .order_by(Message.created_at)
             .offset(offset)
             .limit(limit)
         )
-        return list(result.scalars().all())
+        return await crud_message_blobs.hydrate(db, result.all())
+
+    async def list_messages_page(
+        self,
+        db: AsyncSession,
+        *,
+        conversation_id: int,
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        backward: bool = False,
+        columns: Sequence[Any] = MESSAGE_LIST_COLUMNS,
+    ) -> List[Row]:
+        """keyset 分页，结果始终按 (created_at, id) 升序返回。
+
+        backward=False：从最早的消息（或游标之后）向后翻页；
+        backward=True：从最新的消息（或游标之前）向前翻页，适合打开会话时先取最近消息。
+        """
+        stmt = select(*columns).where(Message.conversation_id == conversation_id)
+        if cursor is not None:
+            created_at, msg_id = cursor
+            if backward:
+                stmt = stmt.where(
+                    or_(
+                        Message.created_at < created_at,
+                        and_(Message.created_at == created_at, Message.id < msg_id),
+                    )
+                )
+            else:
+                stmt = stmt.where(
+                    or_(
+                        Message.created_at > created_at,
+                        and_(Message.created_at == created_at, Message.id > msg_id),
+                    )
+                )
+        if backward:
+            stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+        else:
+            stmt = stmt.order_by(Message.created_at, Message.id)
+
+        result = await db.execute(stmt.limit(limit))
+        rows = await crud_message_blobs.hydrate(db, result.all())
+        return rows[::-1] if backward else rows
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        term: str,
+        limit: int,
+        offset: int = 0,
+        fulltext: bool = True,
+    ) -> List[Row]:
+        """按消息内容检索，排除待删除 / 归档的会话。
+
+        fulltext 时按全文索引相关度排序，否则 LIKE 匹配按时间倒序。
+        行外存储的大字段只索引了预览部分，content 返回的也是预览。
+        """
+        if fulltext:
+            score = match(Message.content, against=term)
+            condition = score > 0
+            order = (score.desc(), Message.id.desc())
+        else:
+            score = literal(0.0)
+            condition = Message.content.contains(term, autoescape=True)
+            order = (Message.created_at.desc(), Message.id.desc())
+        result = await db.execute(
+            select(
+                Message.id,
+                Message.conversation_id,
+                Message.role,
+                Message.content,
+                Message.created_at,
+                Conversation.name.label("title"),
+                score.label("score"),
+            )
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(condition, Conversation.status.notin_(REMOVAL_STATUSES))
+            .order_by(*order)
+            .offset(offset)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def get_thinking(
+        self, db: AsyncSession, *, conversation_id: int, message_id: int
+    ) -> Optional[Any]:
+        """单独读取一条消息的思考过程，消息不存在或会话正在删除 / 归档时返回 None。"""
+        result = await db.execute(
+            select(Message.id, Message.deep_thinking, Message.thinking_ref)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(
+                Message.id == message_id,
+                Message.conversation_id == conversation_id,
+                Conversation.status.notin_(REMOVAL_STATUSES),
+            )
+        )
+        row = result.first()
+        if row is None:
+            return None
+        return (await crud_message_blobs.hydrate(db, [row]))[0]
 
     async def list_recent_for_context(
         self, db: AsyncSession, *, conversation_id: int, limit: int = 10
@@ -57,12 +209,54 @@ class CRUDMessages(CRUDBase[Message]):
         )
         return list(result.scalars().all())[::-1]
 
+    async def delete_chunk(
+        self, db: AsyncSession, conversation_id: int, chunk_size: int
+    ) -> int:
+        """删除会话中最多 chunk_size 条消息，返回删除条数；短事务避免长时间持锁。"""
+        result = await db.execute(
+            select(Message.id, Message.content_ref, Message.thinking_ref)
+            .where(Message.conversation_id == conversation_id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if rows:
+            await db.execute(delete(Message).where(Message.id.in_([r.id for r in rows])))
+            await crud_message_blobs.collect_garbage(
+                db, [ref for r in rows for ref in (r.content_ref, r.thinking_ref)]
+            )
+        return len(rows)
+
+    async def iter_chunks(
+        self, db: AsyncSession, conversation_id: int, chunk_size: int
+    ) -> AsyncIterator[List[Any]]:
+        """按主键 keyset 分批读取会话的全部消息（用于归档），大字段已还原，不构造实体。"""
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(*Message.__table__.columns)
+                .where(Message.conversation_id == conversation_id, Message.id > last_id)
+                .order_by(Message.id)
+                .limit(chunk_size)
+            )
+            chunk = list(result.all())
+            if not chunk:
+                return
+            yield await crud_message_blobs.hydrate(db, chunk)
+            last_id = chunk[-1].id
+
     async def delete_by_conversation(
         self, db: AsyncSession, conversation_id: int
     ) -> None:
+        refs = await db.execute(
+            select(Message.content_ref, Message.thinking_ref).where(
+                Message.conversation_id == conversation_id,
+                or_(Message.content_ref.is_not(None), Message.thinking_ref.is_not(None)),
+            )
+        )
         await db.execute(
             delete(Message).where(Message.conversation_id == conversation_id)
         )
+        await crud_message_blobs.collect_garbage(db, [ref for r in refs for ref in r])
 
 
 crud_messages = CRUDMessages(Message)
@@ -1,7 +1,18 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -29,6 +40,12 @@ class Conversation(Base):
     """会话表：记录会话名称、首条用户问题等。"""
 
     __tablename__ = "conversations"
+    # 与列表排序 (pinned DESC, updated_at DESC, id DESC) 一致，支撑 keyset 分页
+    __table_args__ = (
+        Index("idx_conversations_pinned_updated", "pinned", "updated_at", "id"),
+        # 保留策略按 (status, updated_at) 扫描长期未更新的会话
+        Index("idx_conversations_status_updated", "status", "updated_at"),
+    )
 
     name: Mapped[str] = mapped_column(String(255))
     first_user_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -45,13 +62,70 @@ class Message(Base):
     """消息表：会话内的历史对话记录。"""
 
     __tablename__ = "messages"
-
-    conversation_id: Mapped[int] = mapped_column(
-        ForeignKey("conversations.id"), index=True
+    # 会话内按 (created_at, id) 排序的 keyset 分页，同时满足外键索引
+    __table_args__ = (
+        Index("idx_messages_conversation_created", "conversation_id", "created_at", "id"),
+        # 清理消息后回收不再被引用的大字段
+        Index("idx_messages_content_ref", "content_ref"),
+        Index("idx_messages_thinking_ref", "thinking_ref"),
     )
+
+    conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id"))
     role: Mapped[str] = mapped_column(String(20))  # user / assistant / system
     content: Mapped[str] = mapped_column(Text)
-    deep_thinking: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # 思考过程通常比回答更大，加载实体时延迟读取，需要时单独查询
+    deep_thinking: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
     model: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    # 大字段移出行外时指向 message_blobs.sha256，content / deep_thinking 只保留预览
+    content_ref: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    thinking_ref: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     conversation: Mapped[Conversation] = relationship(back_populates="messages")
+
+
+class MessageBlob(Base):
+    """消息大字段：按内容 sha256 去重，压缩后存储。"""
+
+    __tablename__ = "message_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), unique=True)
+    codec: Mapped[str] = mapped_column(String(16))
+    raw_size: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary().with_variant(LONGBLOB, "mysql"))
+
+
+class FileArtifact(Base):
+    """上传文件及其解析结果：按文件内容 sha256 去重，原文件与解析文本分别压缩存储。"""
+
+    __tablename__ = "file_artifacts"
+
+    sha256: Mapped[str] = mapped_column(String(64), unique=True)
+    name: Mapped[str] = mapped_column(String(255))
+    ext: Mapped[str] = mapped_column(String(16))
+    size: Mapped[int] = mapped_column(Integer)
+    codec: Mapped[str] = mapped_column(String(16))
+    data: Mapped[bytes] = mapped_column(LargeBinary().with_variant(LONGBLOB, "mysql"))
+    parsed_codec: Mapped[str] = mapped_column(String(16))
+    parsed_size: Mapped[int] = mapped_column(Integer)
+    parsed: Mapped[bytes] = mapped_column(LargeBinary().with_variant(LONGBLOB, "mysql"))
+    # 表格文件中识别出的报价表（table_extractor.dump_tables 生成的 npz），未识别或非表格文件为空
+    tables: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True, deferred=True
+    )
+
+
+class ConversationArtifact(Base):
+    """会话与上传文件的关联；chunks 为该文件写入会话检索索引的片段数（0 表示未建立索引）。"""
+
+    __tablename__ = "conversation_artifacts"
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "artifact_id", name="uk_conversation_artifacts"),
+        # 清理会话后回收不再被任何会话引用的文件
+        Index("idx_conversation_artifacts_artifact", "artifact_id"),
+    )
+
+    conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id"))
+    artifact_id: Mapped[int] = mapped_column(ForeignKey("file_artifacts.id"))
+    # 在该会话中上传时的文件名（同一内容可能以不同文件名上传）
+    name: Mapped[str] = mapped_column(String(255))
+    chunks: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,17 +1,33 @@
+import time
+
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.config import settings
+from src.utils.metrics import DB_POOL_CHECKOUT_WAIT, SQL_DURATION, query_shape
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """记录每次 checkout 的等待时间，连接池耗尽时可从指标直接看出。"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
 
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
     future=True,
+    poolclass=TimedQueuePool,
     pool_size=200,
     max_overflow=100,
     pool_timeout=65,
@@ -19,12 +35,37 @@ engine = create_async_engine(
 )
 
 
-# 确保 MySQL 连接使用上海时区（UTC+8）
+# 确保 MySQL 连接使用上海时区（UTC+8）；SQLite 仅用于本地开发与压测，开启 WAL 以支持并发读写
 @event.listens_for(engine.sync_engine, "connect")
 def _set_timezone(dbapi_connection, connection_record):  # pragma: no cover - 连接钩子
+    if engine.dialect.name == "sqlite":
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+        return
     with dbapi_connection.cursor() as cursor:
         cursor.execute("SET time_zone = '+08:00'")
 
+
+# SQL 耗时按查询形态记录；连接级栈兼容同一连接上的嵌套执行
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    SQL_DURATION.labels(query_shape(statement)).observe(time.perf_counter() - start)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     expire_on_commit=False,
@@ -0,0 +1,115 @@
+"""
+MOI 数据导入命令行
+
+用法（在 backend 目录下）：
+    # 导入投标记录（CSV / Excel），导入时同步生成向量
+    python -m src.ingest load bidding data/bidding_2024.csv data/bidding_2025.xlsx
+    # 导入价格库，先不生成向量，稍后回填
+    python -m src.ingest load price data/price.csv --no-embed
+    # 为已有记录回填缺失向量
+    python -m src.ingest backfill price
+
+中断后重复执行同一命令即可从检查点续跑。
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+import httpx
+
+from src.services.bulk_loader import (
+    TABLE_SPECS,
+    LoadOptions,
+    TableSpec,
+    backfill_embeddings,
+    load_file,
+    rebuild_vector_indexes,
+)
+from src.services.keyword_search import ensure_fulltext_indexes
+from src.utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def _finalize(spec: TableSpec, lists: int, api_base: Optional[str]) -> None:
+    """导入结束：补建全文索引、重建向量索引，并通知服务刷新供应商表现物化。"""
+    await ensure_fulltext_indexes()
+    if lists > 0:
+        await rebuild_vector_indexes(spec, lists)
+    if api_base and spec.name == "bidding":
+        async with httpx.AsyncClient(base_url=api_base, timeout=600) as client:
+            resp = await client.post("/api/moi/supplier-performance/refresh")
+            logger.info(f"供应商表现刷新: {resp.status_code} {resp.text}")
+
+
+async def _load(spec: TableSpec, paths: List[str], options: LoadOptions, args) -> None:
+    total = 0
+    for path in paths:
+        total += await load_file(spec, path, options)
+    logger.info(f"{spec.name}: 导入完成，共写入 {total} 行")
+    await _finalize(spec, args.ivf_lists, args.api_base)
+
+
+async def _backfill(spec: TableSpec, options: LoadOptions, args) -> None:
+    updated = await backfill_embeddings(spec, options)
+    logger.info(f"{spec.name}: 向量回填完成，共 {updated} 行")
+    if args.ivf_lists > 0:
+        await rebuild_vector_indexes(spec, args.ivf_lists)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MOI 数据批量导入")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p: argparse.ArgumentParser) -> None:
+        p.add_argument("table", choices=sorted(TABLE_SPECS))
+        p.add_argument("--batch-size", type=int, default=2000, help="每批读取与生成向量的行数")
+        p.add_argument(
+            "--max-statement-mb",
+            type=float,
+            default=8,
+            help="单条 INSERT 的大小上限（MB），超过时拆分批次",
+        )
+        p.add_argument("--embed-batch-size", type=int, default=32, help="每次嵌入请求的文本数")
+        p.add_argument("--embed-concurrency", type=int, default=8, help="并发嵌入请求数")
+        p.add_argument("--checkpoint", help="检查点文件路径")
+        p.add_argument(
+            "--ivf-lists",
+            type=int,
+            default=0,
+            help="完成后以该 LISTS 重建 IVF 向量索引（0 表示不重建）",
+        )
+
+    load = sub.add_parser("load", help="导入 CSV / Excel 文件")
+    add_common(load)
+    load.add_argument("paths", nargs="+")
+    load.add_argument("--no-embed", action="store_true", help="导入时不生成向量")
+    load.add_argument("--api-base", help="后端地址，导入投标记录后通知刷新供应商表现")
+
+    backfill = sub.add_parser("backfill", help="回填缺失的向量列")
+    add_common(backfill)
+
+    args = parser.parse_args()
+    setup_logging()
+
+    spec = TABLE_SPECS[args.table]
+    options = LoadOptions(
+        batch_size=args.batch_size,
+        max_statement_bytes=int(args.max_statement_mb * 1024 * 1024),
+        embed=not getattr(args, "no_embed", False),
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        checkpoint_path=args.checkpoint,
+    )
+    if args.command == "load":
+        if args.checkpoint and len(args.paths) > 1:
+            parser.error("--checkpoint 只能与单个文件一起使用")
+        asyncio.run(_load(spec, args.paths, options, args))
+    else:
+        asyncio.run(_backfill(spec, options, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,57 @@
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from src.config import settings
 from src.routers import ai, moi
+from src.services.conversation_retention import get_conversation_purger
+from src.services.keyword_search import ensure_fulltext_indexes
+from src.services.loop_monitor import get_loop_monitor
+from src.services.supplier_performance import get_supplier_performance_store
+from src.services.write_behind import get_write_behind_queue
 from src.utils.logger import setup_logging
+from src.utils.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from src.utils.pdf_extractor import shutdown_pdf_pool, start_pdf_pool
+from src.utils.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 
-# 初始化日志系统
+# 初始化日志系统与链路追踪
 setup_logging()
+setup_tracing()
 logger = logging.getLogger(__name__)
 
+async def _warmup() -> None:
+    """启动预热：确保 MOI 全文索引存在，加载供应商表现物化结构。"""
+    try:
+        await ensure_fulltext_indexes()
+        await get_supplier_performance_store().refresh()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"Warmup failed: {exc}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application starting up...")
+    await get_loop_monitor().start()
+    if settings.MESSAGE_WRITE_BEHIND:
+        # 先重放 WAL，保证对外服务时未提交的消息已可读
+        await get_write_behind_queue().start()
+    await get_conversation_purger().start()
+    start_pdf_pool(settings.PDF_WORKERS)
+    # 后台预热，不阻塞启动
+    warmup = asyncio.create_task(_warmup())
     yield
+    warmup.cancel()
+    await get_conversation_purger().stop()
+    if settings.MESSAGE_WRITE_BEHIND:
+        await get_write_behind_queue().stop()
+    await get_loop_monitor().stop()
+    shutdown_pdf_pool()
+    shutdown_tracing()
     logger.info("Application shutting down...")
 
 tags_metadata = [
@@ -63,6 +97,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 最后添加的中间件在最外层，耗时包含 CORS 处理；追踪在最外层，X-Trace-Id 覆盖所有响应
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 @app.get("/health", tags=["system"])
@@ -70,6 +107,18 @@ async def health_check() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/health/loop", tags=["system"])
+async def loop_health() -> dict:
+    """事件循环调度延迟分位数（秒）与阻塞次数。"""
+    return get_loop_monitor().stats()
+
+
+@app.get("/metrics", tags=["system"], include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus 文本格式的进程内指标。"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 app.include_router(ai.router, tags=["ai"])
 app.include_router(moi.router, tags=["moi"])
 
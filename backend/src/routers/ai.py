@@ -1,27 +1,82 @@
 import json
 import logging
-from typing import Any, AsyncGenerator, Dict, List, Optional
+import time
+from typing import Any, AsyncGenerator, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Path, Query, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from src.config import settings
 from src.prompt import SYSTEM_PROMPT
-from src.services.llm_client import _get_client
+from src.services.conversation_cache import get_conversation_cache
+from src.services.conversation_retention import get_conversation_purger
+from src.services.conversation_search import (
+    make_snippet,
+    query_terms,
+    search_conversations,
+)
+from src.services.document_index import format_retrieved, get_document_index
+from src.services.file_artifacts import (
+    ARTIFACT_MARKER_RE,
+    artifact_marker,
+    attach_known,
+    expand_artifact_refs,
+    get_tables,
+    ingest_upload,
+)
+from src.services.llm_client import _get_client, create_chat_completion
+from src.services.write_behind import get_write_behind_queue
 from src.db.session import get_db
-from src.crud.crud_conversations import crud_conversations
-from src.crud.crud_messages import crud_messages
-from src.db.models import Conversation, Message
+from src.crud.crud_conversations import (
+    STATUS_ACTIVE,
+    ConversationUnavailable,
+    crud_conversations,
+)
+from src.crud.crud_file_artifacts import crud_file_artifacts
+from src.crud.crud_messages import (
+    DEFAULT_MESSAGE_FIELDS,
+    MESSAGE_CONTEXT_COLUMNS,
+    MESSAGE_FIELDS,
+    crud_messages,
+    message_columns,
+)
 from src.schemas.ai import (
+    CONVERSATION_LIST_ADAPTER,
+    CONVERSATION_PAGE_ADAPTER,
+    MESSAGE_LIST_ADAPTER,
+    MESSAGE_PAGE_ADAPTER,
     ChatCompletionRequest,
+    ConversationArtifactOut,
+    ConversationBulkRequest,
     ConversationOut,
+    ConversationPage,
+    ConversationRow,
+    ConversationSearchMessageHit,
+    ConversationSearchPage,
+    ConversationSearchTitleHit,
     ConversationSyncRequest,
     ExtractRequest,
+    FileLookupRequest,
     MessageOut,
+    MessagePage,
+    MessageRow,
+    MessageThinkingOut,
+)
+from src.utils.cursor import InvalidCursor, decode_cursor, encode_cursor
+from src.utils.logger import truncated
+from src.utils.metrics import (
+    LLM_DURATION,
+    LLM_ERRORS,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS_PER_SECOND,
+    SSE_STREAMS_IN_FLIGHT,
 )
-from src.utils.parse_file_utils import parse_file_content
+from src.utils.tracing import end_span, mark_error, span, start_span
+from src.utils.table_extractor import summarize, to_records
 
 logger = logging.getLogger(__name__)
 
@@ -37,8 +92,8 @@ def _format_parsed_files(parsed: List[Dict[str, str]]) -> str:
     for idx, pf in enumerate(parsed, start=1):
         header = f"=== 文件 {idx}: {pf.get('name', 'file')} ==="
         content = pf.get("content", "") or "[解析为空]"
-        if len(content) > 15000:
-            content = content[:15000] + "\n...[内容过长，已截断]"
+        if len(content) > settings.FILE_CONTENT_MAX_CHARS:
+            content = content[: settings.FILE_CONTENT_MAX_CHARS] + "\n...[内容过长，已截断]"
         parts.append(f"{header}\n{content}")
 
     return (
@@ -47,10 +102,53 @@ def _format_parsed_files(parsed: List[Dict[str, str]]) -> str:
     )
 
 
+async def _require_conversation(db: AsyncSession, conversation_id: int) -> None:
+    """会话须存在且未被标记删除 / 归档；异步落库模式下有未提交记录的会话视为可用。"""
+    if settings.MESSAGE_WRITE_BEHIND and get_write_behind_queue().has_pending(conversation_id):
+        return
+    if not await crud_conversations.is_active(db, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+
+def _unavailable(conversation_id: int, status: Optional[str]) -> HTTPException:
+    if status is None:
+        return HTTPException(status_code=404, detail="Conversation not found")
+    return HTTPException(
+        status_code=409, detail=f"Conversation {conversation_id} is {status}"
+    )
+
+
+def _format_uploads(entries: List[Dict[str, Any]]) -> str:
+    """已存储的文件输出引用标记，由聊天接口按需展开；其余文件按原格式输出内容。"""
+    markers = "".join(f"{artifact_marker(e['sha256'])}\n" for e in entries if e["linked"])
+    inline = [
+        {
+            "name": e["name"],
+            "content": f"[已建立检索索引（{e['chunks']} 个片段），回答时将按问题检索相关内容]",
+        }
+        if e["chunks"]
+        else e
+        for e in entries
+        if not e["linked"]
+    ]
+    return markers + _format_parsed_files(inline)
+
+
 @router.post("/files/parse")
-async def parse_files(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
-    """解析上传文件并返回拼接后的上下文文本。"""
-    parsed_files: List[Dict[str, str]] = []
+async def parse_files(
+    files: List[UploadFile] = File(...),
+    conversation_id: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """解析上传文件并返回拼接后的上下文文本。
+
+    相同内容的文件只解析一次。指定 conversation_id 时文件存储为会话工件并建立检索索引，
+    formatted 中以 [[artifact:<sha256>]] 引用代替全文，聊天时按需展开。
+    """
+    if conversation_id is not None:
+        await _require_conversation(db, conversation_id)
+
+    parsed_files: List[Dict[str, Any]] = []
     
     logger.info(f"Parsing {len(files)} files")
 
@@ -59,45 +157,165 @@ async def parse_files(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
         try:
             logger.info(f"Processing file: {name}")
             # 使用解析服务对文件进行解析，支持多种文件格式，并返回解析后的文本
-            result = await parse_file_content(file)
-            parsed_files.append({"name": result["name"], "content": result["content"]})
+            parsed_files.append(await ingest_upload(db, file, conversation_id))
         except Exception as exc:  # noqa: BLE001
             logger.error(f"Failed to parse file {name}: {exc}", exc_info=True)
+            await db.rollback()
             parsed_files.append(
-                {"name": name, "content": f"[解析失败: {exc}]"}
+                {
+                    "name": name, "sha256": None, "content": f"[解析失败: {exc}]",
+                    "chunks": 0, "reused": False, "linked": False,
+                }
             )
+        else:
+            await db.commit()
 
-    formatted = _format_parsed_files(parsed_files)
+    formatted = _format_uploads(parsed_files)
     return {"parsed_files": parsed_files, "formatted": formatted}
 
 
+@router.post("/files/lookup")
+async def lookup_files(req: FileLookupRequest, db: AsyncSession = Depends(get_db)) -> Dict[str, Any]:
+    """按 sha256 关联服务端已有的文件，返回 missing 中的文件需要经 /files/parse 上传。"""
+    await _require_conversation(db, req.conversation_id)
+    attached, missing = await attach_known(
+        db, req.conversation_id, [(f.sha256, f.name or "") for f in req.files]
+    )
+    await db.commit()
+    return {
+        "attached": attached,
+        "missing": missing,
+        "formatted": "".join(f"{artifact_marker(a['sha256'])}\n" for a in attached),
+    }
+
+
+@router.get(
+    "/conversations/{conversation_id}/artifacts",
+    response_model=List[ConversationArtifactOut],
+)
+async def list_conversation_artifacts(
+    conversation_id: int, db: AsyncSession = Depends(get_db)
+) -> List[ConversationArtifactOut]:
+    links = await crud_file_artifacts.list_links(db, conversation_id)
+    return [
+        ConversationArtifactOut(
+            sha256=link.sha256,
+            name=link.name,
+            size=link.size,
+            chunks=link.chunks,
+            created_at=int(link.created_at.timestamp() * 1000),
+        )
+        for link in links.values()
+    ]
+
+
+@router.get("/files/{sha256}/tables")
+async def get_file_tables(
+    sha256: str = Path(pattern=r"^[0-9a-f]{64}$"),
+    rows: int = Query(0, ge=0, le=5000, description="每个报价表返回的明细行数"),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """表格文件中识别出的报价表：列映射、按 产品 / 型号 / 单位 分组的单价统计与可选明细行。
+
+    单价已换算为人民币 / 标准计量单位。
+    """
+    tables = await get_tables(db, sha256)
+    if tables is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    await db.commit()
+    return {
+        "sha256": sha256,
+        "tables": [
+            {
+                "sheet": table.sheet,
+                "columns": table.columns,
+                "count": len(table),
+                "summary": to_records(summarize(table)),
+                "rows": to_records(table.frame.head(rows)),
+            }
+            for table in tables
+        ],
+    }
+
+
+@router.get("/files/index/stats")
+async def document_index_stats() -> Dict[str, Any]:
+    return get_document_index().stats()
+
+
 async def _stream_chat(params: Dict[str, Any]) -> AsyncGenerator[str, None]:
     client = _get_client()
+    model = params.get("model") or ""
+    SSE_STREAMS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    first_token_at: Optional[float] = None
+    # OpenAI 兼容服务通常每个 chunk 一个 token，按 chunk 数估算生成速度
+    chunks = 0
+    # 生成器跨 yield 执行，span 不绑定为当前上下文，手动结束
+    stream_span = start_span("llm.stream", **{"llm.model": model})
     try:
-        stream = await client.chat.completions.create(stream=True, **params)
-    except Exception as exc:  # noqa: BLE001
-        # 将错误作为 SSE 事件返回，避免已开始的响应再次抛异常
-        err_payload = {"error": str(exc)}
-        yield f"data: {json.dumps(err_payload, ensure_ascii=False)}\n\n"
-        return
-
-    async for chunk in stream:
-        if not chunk.choices:
-            continue
-        delta = chunk.choices[0].delta
-        delta_payload: Dict[str, Any] = {}
-        content = getattr(delta, "content", None)
-        if content:
-            delta_payload["content"] = content
-        reasoning = getattr(delta, "reasoning_content", None)
-        if reasoning:
-            delta_payload["reasoning_content"] = reasoning
+        connect_span = start_span("llm.connect", parent=stream_span)
+        try:
+            stream = await client.chat.completions.create(stream=True, **params)
+        except Exception as exc:  # noqa: BLE001
+            LLM_ERRORS.labels(model).inc()
+            mark_error(connect_span, str(exc))
+            mark_error(stream_span, str(exc))
+            end_span(connect_span)
+            # 将错误作为 SSE 事件返回，避免已开始的响应再次抛异常
+            err_payload = {"error": str(exc)}
+            yield f"data: {json.dumps(err_payload, ensure_ascii=False)}\n\n"
+            return
+        end_span(connect_span)
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            delta_payload: Dict[str, Any] = {}
+            content = getattr(delta, "content", None)
+            if content:
+                delta_payload["content"] = content
+            reasoning = getattr(delta, "reasoning_content", None)
+            if reasoning:
+                delta_payload["reasoning_content"] = reasoning
+            if delta_payload:
+                chunks += 1
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    LLM_TIME_TO_FIRST_TOKEN.labels(model).observe(first_token_at - started)
+                    if stream_span is not None:
+                        stream_span.add_event("first_token")
+
+            payload = {"choices": [{"delta": delta_payload, "finish_reason": None}]}
+            yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        # 结束标记
+        yield "data: [DONE]\n\n"
+    finally:
+        SSE_STREAMS_IN_FLIGHT.dec()
+        if stream_span is not None:
+            stream_span.set_attribute("llm.chunks", chunks)
+        end_span(stream_span)
+        finished = time.perf_counter()
+        LLM_DURATION.labels(model, "stream").observe(finished - started)
+        if first_token_at is not None and chunks > 1 and finished > first_token_at:
+            LLM_TOKENS_PER_SECOND.labels(model).observe(
+                (chunks - 1) / (finished - first_token_at)
+            )
 
-        payload = {"choices": [{"delta": delta_payload, "finish_reason": None}]}
-        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-    # 结束标记
-    yield "data: [DONE]\n\n"
+async def _retrieve_file_context(conversation_id: int, question: str) -> str:
+    """检索会话已上传文件中与问题相关的片段；没有索引或检索失败时返回空字符串，不影响聊天。"""
+    try:
+        with span("chat.retrieve_files"):
+            chunks = await get_document_index().search(
+                conversation_id, ARTIFACT_MARKER_RE.sub("", question)
+            )
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"File retrieval failed for conversation {conversation_id}: {exc}")
+        return ""
+    return format_retrieved(chunks) if chunks else ""
 
 
 @router.post("/chat/completions")
@@ -117,15 +335,21 @@ async def chat_completions(
     # 构造历史 + 当前消息：后端从 DB 取
     history: List[Dict[str, str]] = [{"role": "system", "content": SYSTEM_PROMPT}]
 
-    if req.conversation_id:
-        history_msgs = await crud_messages.list_messages(
-            db=db, conversation_id=req.conversation_id, limit=200
-        )
-        for m in history_msgs:
-            history.append({"role": m.role, "content": m.content})
-
-    # 追加本次传入的消息（通常只有当前 user 消息）
-    history.append({"role": "user", "content": req.message})
+    with span("chat.build_context"):
+        if req.conversation_id:
+            history_msgs = await _load_history(db, req.conversation_id, limit=200)
+            for m in history_msgs:
+                history.append({"role": m.role, "content": m.content})
+
+        if req.conversation_id:
+            retrieved = await _retrieve_file_context(req.conversation_id, req.message)
+            if retrieved:
+                history.append({"role": "system", "content": retrieved})
+
+        # 追加本次传入的消息（通常只有当前 user 消息）
+        history.append({"role": "user", "content": req.message})
+        # 展开文件引用：未建立索引的文件在最近一次引用处展开解析文本
+        await expand_artifact_refs(db, req.conversation_id, history)
     params["messages"] = history
     params["max_tokens"] = settings.LLM_MAX_TOKENS
     params["temperature"] = settings.LLM_TEMPERATURE
@@ -139,9 +363,8 @@ async def chat_completions(
             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
 
-    client = _get_client()
     try:
-        resp = await client.chat.completions.create(**params)
+        resp = await create_chat_completion(params)
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
@@ -158,9 +381,7 @@ async def extract_items(req: ExtractRequest, db: AsyncSession = Depends(get_db))
     logger.info(f"Extracting items for conversation_id={req.conversation_id}, model={req.model}")
     
     # 1. 从 DB 获取历史消息
-    history_msgs = await crud_messages.list_messages(
-        db=db, conversation_id=req.conversation_id, limit=200
-    )
+    history_msgs = await _load_history(db, req.conversation_id, limit=200)
     
     conversation_summary = "\n\n".join(
         [
@@ -184,11 +405,10 @@ async def extract_items(req: ExtractRequest, db: AsyncSession = Depends(get_db))
         "temperature": 0.1,
     }
 
-    client = _get_client()
     try:
-        resp = await client.chat.completions.create(**params)
+        resp = await create_chat_completion(params)
         content = resp.choices[0].message.content or "[]"
-        logger.info(f"Extracted items: {content}")
+        logger.info("Extracted items: %s", truncated(content))
     except Exception as exc:  # noqa: BLE001
         logger.error(f"Error extracting items: {exc}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -196,6 +416,52 @@ async def extract_items(req: ExtractRequest, db: AsyncSession = Depends(get_db))
     return JSONResponse({"choices": [{"message": {"content": content}}]})
 
 
+def _with_pending(conversation_id: int, rows: List[Any]) -> List[Any]:
+    """追加 write-behind 队列中尚未落库的消息，使读取能看到已确认的写入。
+
+    待提交的消息通常只有最近一两轮，直接附加在末尾，不计入分页 limit。
+    """
+    if not settings.MESSAGE_WRITE_BEHIND:
+        return rows
+    return list(rows) + get_write_behind_queue().pending_messages(conversation_id)
+
+
+async def _load_history(
+    db: AsyncSession, conversation_id: int, limit: int, need_ids: bool = False
+) -> List[Any]:
+    """读取会话最早的 limit 条消息：优先命中热缓存，未命中时回源并填充缓存。"""
+    cache = get_conversation_cache()
+    if not cache.enabled or limit > cache.max_messages:
+        rows = await crud_messages.list_messages(
+            db,
+            conversation_id=conversation_id,
+            limit=limit,
+            columns=MESSAGE_CONTEXT_COLUMNS,
+        )
+        return _with_pending(conversation_id, rows)
+
+    cached = cache.get(conversation_id, limit, need_ids=need_ids)
+    if cached is not None:
+        return cached
+
+    token = cache.begin_load(conversation_id)
+    try:
+        # 多取一条以判断会话是否超出缓存窗口
+        rows = await crud_messages.list_messages(
+            db,
+            conversation_id=conversation_id,
+            limit=cache.max_messages + 1,
+            columns=MESSAGE_CONTEXT_COLUMNS,
+        )
+        # 未落库的消息只有临时 id，窗口须标记为不可用于需要 id 的读取
+        pending = _with_pending(conversation_id, [])
+        rows = list(rows) + pending
+        cache.fill(conversation_id, rows, token, has_ids=not pending)
+    finally:
+        cache.end_load(conversation_id)
+    return rows[:limit]
+
+
 def _ts_to_dt(ts: Optional[int]) -> datetime:
     if ts is None:
         return datetime.utcnow()
@@ -206,100 +472,350 @@ def _ts_to_dt(ts: Optional[int]) -> datetime:
 async def sync_conversation(
     req: ConversationSyncRequest, db: AsyncSession = Depends(get_db)
 ):
-    """按 id 同步会话及消息。"""
-    logger.info(f"Syncing conversation: id={req.id}, title={req.title}")
-    conv: Conversation | None = None
-    if req.id:
-        conv = await crud_conversations.get(db, req.id)
-    if conv is None:
-        logger.info(f"Creating new conversation: title={req.title}")
-        conv = await crud_conversations.create(
-            db,
-            obj_in={
-                "name": req.title or "新对话",
-                "first_user_message": req.title or "",
-                "status": "active",
-                "created_at": _ts_to_dt(req.created_at),
-                "updated_at": _ts_to_dt(req.updated_at),
-            },
+    """按 id 同步会话及消息。
+
+    一个事务内完成：会话 upsert（一条 UPDATE，未命中时一条 INSERT）+ 消息多行 INSERT。
+    返回值由请求参数构造，仅当已有会话且请求未带 created_at 时才回查一次创建时间。
+    开启 MESSAGE_WRITE_BEHIND 时，已有 id 的同步只写本地 WAL，新建会话仍同步写库以分配 id。
+    带 id 但会话不存在时返回 404，正在删除 / 归档时返回 409。
+    """
+    messages = ([req.message] if req.message else []) + req.messages
+    logger.info(
+        f"Syncing conversation: id={req.id}, title={req.title}, messages={len(messages)}"
+    )
+    name = req.title or "新对话"
+    created_at = _ts_to_dt(req.created_at)
+    updated_at = _ts_to_dt(req.updated_at)
+
+    message_rows = [
+        {
+            "role": m.role,
+            "content": m.content,
+            "created_at": _ts_to_dt(m.timestamp),
+            "deep_thinking": m.deep_thinking,
+            "model": m.model,
+        }
+        for m in messages
+    ]
+
+    if settings.MESSAGE_WRITE_BEHIND and req.id is not None:
+        # 异步落库：WAL 持久化后即返回，会话与消息由后台批量提交。
+        # 先确认会话可写（已有未落库记录的会话入队时校验过），否则任意 id 都会被确认
+        queue = get_write_behind_queue()
+        if not queue.has_pending(req.id):
+            status = await crud_conversations.get_status(db, req.id)
+            if status != STATUS_ACTIVE:
+                raise _unavailable(req.id, status)
+        await queue.submit(
+            conversation_id=req.id,
+            name=name,
+            created_at=created_at,
+            updated_at=updated_at,
+            messages=message_rows,
         )
-        await db.flush()
-    else:
-        logger.info(f"Updating existing conversation: id={conv.id}")
-        await crud_conversations.update_by_id(
-            db,
-            conv.id,
-            {
-                "updated_at": _ts_to_dt(req.updated_at) if req.updated_at else datetime.utcnow(),
-            },
+        get_conversation_cache().append(req.id, message_rows)
+        return ConversationOut(
+            id=req.id,
+            title=name,
+            created_at=int(created_at.timestamp() * 1000),
+            updated_at=int(updated_at.timestamp() * 1000),
         )
 
-    # 同步单条消息（用户提问或大模型回答）
-    if req.message:
-        logger.info(f"Syncing message: role={req.message.role}, content={req.message.content[:100]}")
-        await crud_messages.create(
+    try:
+        conv_id, created = await crud_conversations.upsert_for_sync(
             db,
-            obj_in={
-                "conversation_id": conv.id,
-                "role": req.message.role,
-                "content": req.message.content,
-                "created_at": _ts_to_dt(req.message.timestamp),
-                "deep_thinking": req.message.deep_thinking,
-                "model": req.message.model,
-            },
+            conversation_id=req.id,
+            name=name,
+            created_at=created_at,
+            updated_at=updated_at,
         )
+    except ConversationUnavailable as exc:
+        raise _unavailable(exc.conversation_id, exc.status) from exc
+    if created:
+        logger.info(f"Created new conversation: id={conv_id}")
+    elif req.created_at is None:
+        created_at = await crud_conversations.get_created_at(db, conv_id) or created_at
+
+    # 同步消息（用户提问或大模型回答，或离线期间的多条消息）
+    await crud_messages.insert_many(
+        db, [{"conversation_id": conv_id, **row} for row in message_rows]
+    )
 
     await db.commit()
-    await db.refresh(conv)
+
+    # 写穿热缓存：新会话直接建立窗口，已缓存的会话追加消息
+    cache = get_conversation_cache()
+    if created:
+        cache.put_new(conv_id, message_rows)
+    else:
+        cache.append(conv_id, message_rows)
 
     return ConversationOut(
-        id=conv.id,
-        title=conv.name,
-        created_at=int(conv.created_at.timestamp() * 1000),
-        updated_at=int(conv.updated_at.timestamp() * 1000),
+        id=conv_id,
+        title=name,
+        created_at=int(created_at.timestamp() * 1000),
+        updated_at=int(updated_at.timestamp() * 1000),
     )
 
 
+def _conversation_row(c: Row) -> ConversationRow:
+    return {
+        "id": c.id,
+        "title": c.name,
+        "created_at": int(c.created_at.timestamp() * 1000),
+        "updated_at": int(c.updated_at.timestamp() * 1000),
+    }
+
+
+def _parse_fields(fields: Optional[str]) -> tuple[str, ...]:
+    """解析逗号分隔的 fields 参数，未传时使用默认字段；id 总会返回。"""
+    if not fields:
+        return DEFAULT_MESSAGE_FIELDS
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in MESSAGE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知字段: {unknown}，可选: {list(MESSAGE_FIELDS)}",
+        )
+    return names if "id" in names else ("id",) + names
+
+
+def _message_row(m: Row, fields: tuple[str, ...] = DEFAULT_MESSAGE_FIELDS) -> MessageRow:
+    row: MessageRow = {"id": str(m.id)}
+    if "role" in fields:
+        row["role"] = m.role
+    if "content" in fields:
+        row["content"] = m.content
+    if "timestamp" in fields:
+        row["timestamp"] = int(m.created_at.timestamp() * 1000)
+    if "deep_thinking" in fields:
+        row["deep_thinking"] = m.deep_thinking
+    if "model" in fields:
+        row["model"] = m.model
+    if "has_thinking" in fields:
+        # 缓存与未落库的消息没有 has_thinking 列，按已有字段推断
+        flag = getattr(m, "has_thinking", None)
+        row["has_thinking"] = (
+            bool(flag) if flag is not None else bool(getattr(m, "deep_thinking", None))
+        )
+    return row
+
+
+def _json_response(adapter: TypeAdapter, payload: Any) -> Response:
+    """用预编译的 TypeAdapter 直接序列化，绕过 response_model 的逐条校验。"""
+    return Response(content=adapter.dump_json(payload), media_type="application/json")
+
+
 @router.get("/conversations", response_model=List[ConversationOut])
-async def list_conversations(db: AsyncSession = Depends(get_db)):
-    convs = await crud_conversations.list_conversations(db, limit=200, offset=0)
-    return [
-        ConversationOut(
-            id=c.id,
-            title=c.name,
-            created_at=int(c.created_at.timestamp() * 1000),
-            updated_at=int(c.updated_at.timestamp() * 1000),
+async def list_conversations(
+    limit: int = Query(200, ge=1, le=500), db: AsyncSession = Depends(get_db)
+):
+    convs = await crud_conversations.list_conversations(db, limit=limit, offset=0)
+    return _json_response(
+        CONVERSATION_LIST_ADAPTER, [_conversation_row(c) for c in convs]
+    )
+
+
+@router.get("/conversations/cache/stats")
+async def conversation_cache_stats() -> Dict[str, Any]:
+    """会话消息热缓存的命中率、占用与淘汰统计。"""
+    return get_conversation_cache().stats()
+
+
+@router.get("/conversations/page", response_model=ConversationPage)
+async def list_conversations_page(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """会话列表 keyset 分页：按置顶、更新时间倒序，next_cursor 为空表示到底。"""
+    try:
+        after = decode_cursor(cursor, (bool, datetime, int)) if cursor else None
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # 多取一条判断是否还有下一页
+    convs = await crud_conversations.list_conversations_page(
+        db, limit=limit + 1, after=after
+    )
+    has_more = len(convs) > limit
+    convs = convs[:limit]
+    next_cursor = None
+    if has_more:
+        last = convs[-1]
+        next_cursor = encode_cursor([bool(last.pinned), last.updated_at, last.id])
+    return _json_response(
+        CONVERSATION_PAGE_ADAPTER,
+        {"items": [_conversation_row(c) for c in convs], "next_cursor": next_cursor},
+    )
+
+
+@router.get("/conversations/search", response_model=ConversationSearchPage)
+async def search_conversation_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """检索历史会话标题与消息内容，按相关度排序并返回命中片段。
+
+    conversations 为标题命中（只在第一页返回），items 为消息命中，next_cursor 继续翻页。
+    """
+    try:
+        offset = decode_cursor(cursor, (int,))[0] if cursor else 0
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if offset < 0:
+        raise HTTPException(status_code=400, detail=f"invalid cursor: {cursor}")
+
+    result = await search_conversations(db, q, limit=limit, offset=offset)
+    terms = query_terms(q)
+    items = []
+    for m in result.messages:
+        snippet, highlights = make_snippet(m.content, terms)
+        items.append(
+            ConversationSearchMessageHit(
+                conversation_id=m.conversation_id,
+                title=m.title,
+                message_id=str(m.id),
+                role=m.role,
+                timestamp=int(m.created_at.timestamp() * 1000),
+                snippet=snippet,
+                highlights=highlights,
+                score=float(m.score or 0),
+            )
         )
-        for c in convs
-    ]
+    return ConversationSearchPage(
+        conversations=[
+            ConversationSearchTitleHit(
+                id=c.id,
+                title=c.name,
+                updated_at=int(c.updated_at.timestamp() * 1000),
+                score=float(c.score or 0),
+            )
+            for c in result.titles
+        ],
+        items=items,
+        next_cursor=encode_cursor([offset + len(items)]) if result.has_more else None,
+    )
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageOut])
-async def list_conversation_messages(conversation_id: int, db: AsyncSession = Depends(get_db)):
-    conv = await crud_conversations.get(db, conversation_id)
-    if not conv:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    msgs = await crud_messages.list_messages(db, conversation_id=conv.id, limit=500)
-    return [
-        MessageOut(
-            id=str(m.id),
-            role=m.role,
-            content=m.content,
-            timestamp=int(m.created_at.timestamp() * 1000),
-            deep_thinking=m.deep_thinking,
-            model=m.model,
+async def list_conversation_messages(
+    conversation_id: int,
+    limit: int = Query(500, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段"),
+    db: AsyncSession = Depends(get_db),
+):
+    """会话消息历史；默认不返回 deep_thinking，只返回 has_thinking 标记。"""
+    await _require_conversation(db, conversation_id)
+    selected = _parse_fields(fields)
+    if "deep_thinking" in selected:
+        # 热缓存不保存思考过程，显式请求时直接回源
+        msgs = await crud_messages.list_messages(
+            db,
+            conversation_id=conversation_id,
+            limit=limit,
+            columns=message_columns(selected),
         )
-        for m in msgs
-    ]
+        msgs = _with_pending(conversation_id, msgs)
+    else:
+        msgs = await _load_history(db, conversation_id, limit, need_ids=True)
+    return _json_response(
+        MESSAGE_LIST_ADAPTER, [_message_row(m, selected) for m in msgs]
+    )
+
+
+@router.get(
+    "/conversations/{conversation_id}/messages/page", response_model=MessagePage
+)
+async def list_conversation_messages_page(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    direction: Literal["forward", "backward"] = "backward",
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段"),
+    db: AsyncSession = Depends(get_db),
+):
+    """消息 keyset 分页，items 按时间升序。
+
+    backward（默认）：从最新消息开始，next_cursor 用于继续加载更早的消息；
+    forward：从最早消息开始，next_cursor 用于继续加载更新的消息。
+    """
+    try:
+        position = decode_cursor(cursor, (datetime, int)) if cursor else None
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    selected = _parse_fields(fields)
+    await _require_conversation(db, conversation_id)
+
+    backward = direction == "backward"
+    msgs = await crud_messages.list_messages_page(
+        db,
+        conversation_id=conversation_id,
+        limit=limit + 1,
+        cursor=position,
+        backward=backward,
+        columns=message_columns(selected),
+    )
+    has_more = len(msgs) > limit
+    if has_more:
+        msgs = msgs[1:] if backward else msgs[:limit]
+    next_cursor = None
+    if has_more:
+        edge = msgs[0] if backward else msgs[-1]
+        next_cursor = encode_cursor([edge.created_at, edge.id])
+    # 未落库的消息总在最新一端：backward 首页或 forward 末页时额外追加（不占 limit）
+    if (backward and position is None) or (not backward and not has_more):
+        msgs = _with_pending(conversation_id, msgs)
+    return _json_response(
+        MESSAGE_PAGE_ADAPTER,
+        {"items": [_message_row(m, selected) for m in msgs], "next_cursor": next_cursor},
+    )
+
+
+@router.get(
+    "/conversations/{conversation_id}/messages/{message_id}/thinking",
+    response_model=MessageThinkingOut,
+)
+async def get_message_thinking(
+    conversation_id: int, message_id: int, db: AsyncSession = Depends(get_db)
+):
+    """按需读取单条消息的思考过程（历史列表默认不返回）。"""
+    row = await crud_messages.get_thinking(
+        db, conversation_id=conversation_id, message_id=message_id
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return MessageThinkingOut(id=str(row.id), deep_thinking=row.deep_thinking)
 
 
 @router.delete("/conversations/{conversation_id}")
-async def delete_conversation(conversation_id: int, db: AsyncSession = Depends(get_db)):
-    conv = await crud_conversations.get(db, conversation_id)
-    if not conv:
-        return {"success": True}
-    await crud_messages.delete_by_conversation(db, conv.id)
-    await crud_conversations.delete_by_id(db, conv.id)
-    await db.commit()
+async def delete_conversation(conversation_id: int):
+    """标记删除后立即返回，消息由后台任务分批清理。"""
+    await get_conversation_purger().schedule(
+        archive=False, ids=[conversation_id], include_pinned=True
+    )
     return {"success": True}
 
+
+@router.post("/conversations/bulk")
+async def bulk_remove_conversations(req: ConversationBulkRequest) -> Dict[str, Any]:
+    """按 id 或最后更新时间批量删除 / 归档会话，默认跳过置顶会话。"""
+    if not req.ids and req.older_than_days is None:
+        raise HTTPException(status_code=400, detail="需指定 ids 或 older_than_days")
+    conv_ids = await get_conversation_purger().schedule(
+        archive=req.action == "archive",
+        ids=req.ids or None,
+        older_than_days=req.older_than_days,
+        status=req.status,
+        include_pinned=req.include_pinned,
+    )
+    return {"success": True, "scheduled": len(conv_ids)}
+
+
+@router.get("/conversations/bulk/stats")
+async def bulk_remove_stats() -> Dict[str, Any]:
+    return get_conversation_purger().stats()
+
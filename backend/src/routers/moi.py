@@ -3,12 +3,40 @@ MOI数据库路由
 提供内部数据源查询接口
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from dataclasses import asdict
+from typing import AsyncGenerator, Dict, Any, List, Optional
+import numpy as np
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from src.config import settings
+from src.utils.metrics import sql_label
+from src.utils.table_extractor import to_records
 
 from src.services.matrixone_client import get_matrixone_client
+from src.services.price_comparison import (
+    ComparisonItem,
+    Quote,
+    compare_quotes,
+    fetch_references,
+    format_comparison,
+    summarize_items,
+)
+from src.services.retrieval import (
+    BIDDING_CORPUS,
+    CORPORA,
+    PRICE_CORPUS,
+    SearchHit,
+    hybrid_search,
+)
+from src.services.supplier_performance import (
+    PERFORMANCE_COLUMNS,
+    SupplierPerformanceStore,
+    get_supplier_performance_store,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +64,8 @@ async def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
     """
     try:
         client = get_matrixone_client()
-        result = await client.run_sql(request.statement)
+        with sql_label("moi.run_sql"):
+            result = await client.run_sql(request.statement)
         
         return SQLQueryResponse(
             columns=result.get("columns", []),
@@ -51,40 +80,25 @@ async def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
 class QueryProcurementProjectsRequest(BaseModel):
     """查询采购项目请求"""
     item_name: str
+    embedding: Optional[list[float]] = None
+
+
+def _hits_response(columns: tuple[str, ...], hits: List[SearchHit]) -> SQLQueryResponse:
+    return SQLQueryResponse(columns=list(columns), rows=[hit.row for hit in hits])
 
 
 @router.post("/query/procurement-projects", response_model=SQLQueryResponse)
 async def query_procurement_projects(request: QueryProcurementProjectsRequest) -> SQLQueryResponse:
     """
     查询采购项目数据
-    从 xunyuan_agent.bidding_records_1 表中查询采购项目信息
+    从 xunyuan_agent.bidding_records_1 表中查询采购项目信息，关键词与向量混合检索
     """
     try:
-        escaped_item = request.item_name.replace("'", "''")
-        
-        sql = f"""
-SELECT
-  `项目名称`,
-  `单位` AS `采购单位`,
-  `细化产品`,
-  `供应商名称`,
-  `中标金额_万元` AS `中标金额（万元）`,
-  `参与状态`
-FROM `xunyuan_agent`.`bidding_records_1`
-WHERE `项目名称` LIKE '%{escaped_item}%'
-   OR `细化产品` LIKE '%{escaped_item}%'
-ORDER BY `项目名称` DESC, `中标金额_万元` DESC
-LIMIT 20;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(sql)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
-        )
+        with sql_label("moi.procurement_projects"):
+            hits = await hybrid_search(
+                BIDDING_CORPUS, request.item_name, embedding=request.embedding, top_k=20
+            )
+        return _hits_response(BIDDING_CORPUS.columns, hits)
     except Exception as e:
         logger.exception(f"查询采购项目失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
@@ -100,173 +114,54 @@ class QueryHistoricalPerformanceRequest(BaseModel):
 async def query_historical_performance(request: QueryHistoricalPerformanceRequest) -> SQLQueryResponse:
     """
     查询潜在供应商历史表现
-    支持向量查询优先，LIKE查询为退化方案
-    从 xunyuan_agent.bidding_records_1 表中查询供应商历史表现数据
+    混合检索取候选记录的 (供应商名称, 细化产品)，统计值从预聚合的供应商表现物化结构中读取
     """
     try:
         logger.info(f"收到历史表现查询请求: item_name='{request.item_name}', has_embedding={request.embedding is not None}")
 
-        client = get_matrixone_client()
-
-        # 优先使用向量查询
-        if request.embedding:
-            logger.info(f"检测到embedding字段，长度: {len(request.embedding)}，开始执行向量查询")
-            try:
-                vector_str = "[" + ",".join(map(str, request.embedding)) + "]"
-                logger.debug(f"向量字符串: {vector_str[:100]}...")
-
-                # 同时查询两个向量字段，取最好的结果
-                vector_results = []
-
-                # 查询项目名称向量
-                try:
-                    logger.info("开始执行项目名称向量查询")
-                    project_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        ORDER BY l2_distance(`project_name_embedding`, '{vector_str}') ASC
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-                    """.strip()
-
-                    project_result = await client.run_sql(project_sql)
-                    logger.info(f"项目名称向量查询完成，结果行数: {len(project_result.get('rows', []))}")
-                    if project_result.get("rows") and len(project_result["rows"]) > 0:
-                        vector_results.append(("project", project_result))
-                        logger.info(f"项目名称向量查询成功，添加到结果列表")
-                    else:
-                        logger.warning("项目名称向量查询返回空结果")
-                except Exception as e:
-                    logger.warning(f"项目名称向量查询失败: {e}")
-
-                # 查询产品向量
-                try:
-                    logger.info("开始执行产品向量查询")
-                    product_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        ORDER BY l2_distance(`product_embedding`, '{vector_str}') ASC
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-                    """.strip()
-
-                    product_result = await client.run_sql(product_sql)
-                    logger.info(f"产品向量查询完成，结果行数: {len(product_result.get('rows', []))}")
-                    if product_result.get("rows") and len(product_result["rows"]) > 0:
-                        vector_results.append(("product", product_result))
-                        logger.info(f"产品向量查询成功，添加到结果列表")
-                    else:
-                        logger.warning("产品向量查询返回空结果")
-                except Exception as e:
-                    logger.warning(f"产品向量查询失败: {e}")
-
-                # 如果有向量查询结果，选择最好的一个返回
-                logger.info(f"向量查询统计: 成功查询数 {len(vector_results)}，详情: {[(name, len(result.get('rows', []))) for name, result in vector_results]}")
-
-                if vector_results:
-                    # 优先选择结果更多的查询
-                    best_result = max(vector_results, key=lambda x: len(x[1]["rows"]))
-                    logger.info(f"向量查询成功: 选择 {best_result[0]} 向量查询，返回 {len(best_result[1]['rows'])} 条结果")
-                    return SQLQueryResponse(
-                        columns=best_result[1].get("columns", []),
-                        rows=best_result[1].get("rows", []),
-                        error=best_result[1].get("error")
-                    )
-
-                logger.warning("所有向量查询均无结果，将退化到LIKE查询。可能原因: 1)向量数据不存在 2)相似度阈值过高 3)数据库中无匹配记录")
-            except Exception as e:
-                logger.error(f"向量查询整体失败，将退化到LIKE查询。异常信息: {str(e)}", exc_info=True)
-                # 继续执行LIKE查询，不抛出异常
-
-        # 向量查询无结果、失败或未提供向量，使用 LIKE 查询作为退化方案
-        if not request.embedding:
-            logger.info("未提供embedding参数，直接使用LIKE查询")
-        else:
-            logger.info("向量查询无结果或失败，开始执行LIKE查询作为退化方案")
-
-        escaped_item = request.item_name.replace("'", "''")
-        logger.debug(f"LIKE查询关键词: '{escaped_item}'")
-
-        fallback_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        WHERE
-            `项目名称` LIKE '%{escaped_item}%'
-            OR `细化产品` LIKE '%{escaped_item}%'
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(fallback_sql)
-        
+        store = get_supplier_performance_store()
+        await store.ensure_fresh()
+
+        with sql_label("moi.historical_performance"):
+            hits = await hybrid_search(
+                BIDDING_CORPUS,
+                request.item_name,
+                embedding=request.embedding,
+                top_k=50,
+                select="`供应商名称`, `细化产品`",
+            )
         return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
+            columns=PERFORMANCE_COLUMNS,
+            rows=await _performance_rows(store, hits),
         )
     except Exception as e:
         logger.exception(f"查询历史表现失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 
+async def _performance_rows(
+    store: SupplierPerformanceStore, hits: List[SearchHit]
+) -> list[Dict[str, Any]]:
+    """将候选记录的 (供应商名称, 细化产品) 映射为供应商表现行（物化结构未加载时实时聚合）。"""
+    keys = [
+        (hit.row["供应商名称"], hit.row.get("细化产品"))
+        for hit in hits
+        if hit.row.get("供应商名称")
+    ]
+    return await store.query(keys, limit=10)
+
+
+@router.post("/supplier-performance/refresh")
+async def refresh_supplier_performance(full: bool = False) -> Dict[str, Any]:
+    """
+    刷新供应商表现物化结构
+    bidding_records_1 导入新数据后调用；full=true 时全量重建
+    """
+    store = get_supplier_performance_store()
+    processed = await (store.rebuild() if full else store.refresh())
+    return {"success": True, "processed_rows": processed}
+
+
 class QuerySecondaryPriceRequest(BaseModel):
     """查询二采价格请求"""
     item_name: str
@@ -277,125 +172,322 @@ class QuerySecondaryPriceRequest(BaseModel):
 async def query_secondary_price(request: QuerySecondaryPriceRequest) -> SQLQueryResponse:
     """
     查询二采产品价格库
-    支持向量查询优先，LIKE查询为退化方案
-    从 xunyuan_agent.product_price 表中查询价格数据
+    从 xunyuan_agent.product_price 表中查询价格数据，关键词与向量混合检索
     """
     try:
         logger.info(f"收到二采价格查询请求: item_name='{request.item_name}', has_embedding={request.embedding is not None}")
+        with sql_label("moi.secondary_price"):
+            hits = await hybrid_search(
+                PRICE_CORPUS, request.item_name, embedding=request.embedding, top_k=10
+            )
+        return _hits_response(PRICE_CORPUS.columns, hits)
+    except Exception as e:
+        logger.exception(f"查询二采价格失败: {e}")
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
-        client = get_matrixone_client()
 
-        # 优先使用向量查询
-        if request.embedding:
-            logger.info(f"检测到embedding字段，长度: {len(request.embedding)}，开始执行向量查询")
-            try:
-                vector_str = "[" + ",".join(map(str, request.embedding)) + "]"
-                logger.debug(f"向量字符串: {vector_str[:100]}...")
-
-                # 同时查询两个向量字段，取最好的结果
-                vector_results = []
-
-                # 查询项目名称向量
-                try:
-                    logger.info("开始执行项目名称向量查询 (二采价格)")
-                    project_sql = f"""
-SELECT
-    `项目名称`,
-    `物料短描述`,
-    `物料单位`,
-    `平均单价（元）`,
-    `最高价（元）`,
-    `最低价（元）`,
-    l2_distance(`project_name_embedding`, '{vector_str}') AS similarity_score
-FROM `xunyuan_agent`.`product_price`
-ORDER BY similarity_score ASC
-LIMIT 3;
-                    """.strip()
-
-                    project_result = await client.run_sql(project_sql)
-                    logger.info(f"项目名称向量查询完成 (二采价格)，结果行数: {len(project_result.get('rows', []))}")
-                    if project_result.get("rows") and len(project_result["rows"]) > 0:
-                        vector_results.append(("project", project_result))
-                        logger.info(f"项目名称向量查询成功 (二采价格)，添加到结果列表")
-                    else:
-                        logger.warning("项目名称向量查询返回空结果 (二采价格)")
-                except Exception as e:
-                    logger.warning(f"项目名称向量查询失败 (二采价格): {e}")
-
-                # 查询产品向量（物料短描述）
-                try:
-                    logger.info("开始执行产品向量查询 (二采价格)")
-                    product_sql = f"""
-SELECT
-    `项目名称`,
-    `物料短描述`,
-    `物料单位`,
-    `平均单价（元）`,
-    `最高价（元）`,
-    `最低价（元）`,
-    l2_distance(`product_embedding`, '{vector_str}') AS similarity_score
-FROM `xunyuan_agent`.`product_price`
-ORDER BY similarity_score ASC
-LIMIT 3;
-                    """.strip()
-
-                    product_result = await client.run_sql(product_sql)
-                    logger.info(f"产品向量查询完成 (二采价格)，结果行数: {len(product_result.get('rows', []))}")
-                    if product_result.get("rows") and len(product_result["rows"]) > 0:
-                        vector_results.append(("product", product_result))
-                        logger.info(f"产品向量查询成功 (二采价格)，添加到结果列表")
-                    else:
-                        logger.warning("产品向量查询返回空结果 (二采价格)")
-                except Exception as e:
-                    logger.warning(f"产品向量查询失败 (二采价格): {e}")
-
-                # 如果有向量查询结果，选择最好的一个返回
-                logger.info(f"向量查询统计 (二采价格): 成功查询数 {len(vector_results)}，详情: {[(name, len(result.get('rows', []))) for name, result in vector_results]}")
-
-                if vector_results:
-                    # 优先选择结果更多的查询，如果结果数量相同，选择第一个
-                    best_result = max(vector_results, key=lambda x: len(x[1]["rows"]))
-                    logger.info(f"向量查询成功 (二采价格): 选择 {best_result[0]} 向量查询，返回 {len(best_result[1]['rows'])} 条结果")
-                    return SQLQueryResponse(
-                        columns=best_result[1].get("columns", []),
-                        rows=best_result[1].get("rows", []),
-                        error=best_result[1].get("error")
-                    )
-
-                logger.warning("所有向量查询均无结果 (二采价格)，将退化到LIKE查询。可能原因: 1)向量数据不存在 2)相似度阈值过高 3)数据库中无匹配记录")
-            except Exception as e:
-                logger.error(f"向量查询整体失败 (二采价格)，将退化到LIKE查询。异常信息: {str(e)}", exc_info=True)
-                # 继续执行LIKE查询，不抛出异常
-
-        # 向量查询无结果、失败或未提供向量，使用 LIKE 查询作为退化方案
-        if not request.embedding:
-            logger.info("未提供embedding参数 (二采价格)，直接使用LIKE查询")
-        else:
-            logger.info("向量查询无结果或失败 (二采价格)，开始执行LIKE查询作为退化方案")
-        escaped_item = request.item_name.replace("'", "''")
-
-        fallback_sql = f"""
-SELECT
-  `项目名称`,
-  `物料短描述`,
-  `物料单位`,
-  `平均单价（元）`,
-  `最高价（元）`,
-  `最低价（元）`
-FROM `xunyuan_agent`.`product_price`
-WHERE `物料短描述` LIKE '%{escaped_item}%'
-   OR `项目名称` LIKE '%{escaped_item}%'
-LIMIT 10;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(fallback_sql)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
+class PriceComparisonItem(BaseModel):
+    item_name: str
+    # 数量按 unit 计，用于计算报价总价
+    quantity: Optional[float] = Field(None, ge=0)
+    unit: Optional[str] = None
+    embedding: Optional[list[float]] = None
+
+
+class SupplierQuote(BaseModel):
+    """供应商报价：item_name 对应 items 中的标的物，单位缺省时沿用标的物单位"""
+    item_name: str
+    supplier: str
+    unit_price: float = Field(..., gt=0)
+    unit: Optional[str] = None
+    currency: str = "CNY"
+
+
+class PriceComparisonRequest(BaseModel):
+    """比价请求：标的物（可由 /api/items/extract 提取）与各供应商报价"""
+    items: list[PriceComparisonItem] = Field(..., min_length=1, max_length=100)
+    quotes: list[SupplierQuote] = Field(default_factory=list, max_length=10000)
+
+
+class PriceReferenceOut(BaseModel):
+    description: str
+    unit: str
+    average: float
+    minimum: float
+    maximum: float
+    samples: int
+
+
+class QuoteComparisonOut(BaseModel):
+    supplier: str
+    unit_price: float
+    currency: str
+    unit: str
+    unit_price_cny: Optional[float] = None
+    delta_avg: Optional[float] = None
+    delta_avg_pct: Optional[float] = None
+    delta_min: Optional[float] = None
+    delta_max: Optional[float] = None
+    position: Optional[float] = None
+    peer_ratio: Optional[float] = None
+    total: Optional[float] = None
+    flags: list[str] = []
+    rank: int
+
+
+class ItemComparisonOut(BaseModel):
+    item_name: str
+    quantity: Optional[float] = None
+    reference: Optional[PriceReferenceOut] = None
+    quotes: list[QuoteComparisonOut] = []
+    best_supplier: Optional[str] = None
+    best_unit_price: Optional[float] = None
+    # 正常报价（不含可疑报价）最高与最低单价之差相对最低单价的百分比
+    spread_pct: Optional[float] = None
+
+
+class PriceComparisonResponse(BaseModel):
+    items: list[ItemComparisonOut]
+    # 供大模型解读的 markdown 摘要
+    formatted: str
+
+
+@router.post("/price-comparison", response_model=PriceComparisonResponse)
+async def price_comparison(request: PriceComparisonRequest) -> PriceComparisonResponse:
+    """
+    比价计算
+    检索每个标的物在二采价格库中的历史价格，所有报价一次向量化计算与历史均价 / 最低价 / 最高价的差额、
+    异常标记与组内排名，返回结构化结果与供大模型解读的摘要
+    """
+    index: Dict[str, int] = {}
+    for i, item in enumerate(request.items):
+        index.setdefault(item.item_name, i)
+    unknown = sorted({q.item_name for q in request.quotes} - index.keys())
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"报价中的标的物不在 items 中: {unknown}")
+
+    items = [
+        ComparisonItem(
+            name=item.item_name, quantity=item.quantity, unit=item.unit, embedding=item.embedding
         )
-    except Exception as e:
-        logger.exception(f"查询二采价格失败: {e}")
-        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
\ No newline at end of file
+        for item in request.items
+    ]
+    quotes = [
+        Quote(
+            item=index[q.item_name],
+            supplier=q.supplier,
+            unit_price=q.unit_price,
+            unit=q.unit,
+            currency=q.currency,
+        )
+        for q in request.quotes
+    ]
+    logger.info(f"收到比价请求: {len(items)} 个标的物, {len(quotes)} 条报价")
+
+    references = await fetch_references(items)
+    frame = compare_quotes(items, quotes, references, outlier_ratio=settings.PRICE_OUTLIER_RATIO)
+
+    summary = summarize_items(len(items), frame)
+    # frame 按标的物、排名排序，按各标的物报价数切分
+    quote_rows = to_records(frame.drop(columns=["item", "suspect"]))
+    offsets = np.concatenate(([0], np.cumsum(summary["quotes"].to_numpy())))
+    results = [
+        ItemComparisonOut(
+            item_name=item.item_name,
+            quantity=item.quantity,
+            reference=PriceReferenceOut(**asdict(references[i])) if references[i] is not None else None,
+            quotes=[QuoteComparisonOut(**row) for row in quote_rows[offsets[i] : offsets[i + 1]]],
+            **row,
+        )
+        for i, (item, row) in enumerate(
+            zip(request.items, to_records(summary[["best_supplier", "best_unit_price", "spread_pct"]]))
+        )
+    ]
+    return PriceComparisonResponse(
+        items=results, formatted=format_comparison(items, references, frame, summary)
+    )
+
+
+class SearchRequest(BaseModel):
+    """混合检索请求"""
+    query: str
+    corpus: str = "bidding"
+    embedding: Optional[list[float]] = None
+    # 过滤条件，例如 {"unit": "某省公司", "status": "中标"}
+    filters: Dict[str, Optional[str]] = {}
+    top_k: int = Field(20, ge=1, le=200)
+
+
+class SearchHitOut(BaseModel):
+    id: Any
+    score: float
+    sources: list[str]
+    row: Dict[str, Any]
+
+
+class SearchResponse(BaseModel):
+    corpus: str
+    columns: list[str]
+    hits: list[SearchHitOut]
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest) -> SearchResponse:
+    """
+    混合检索
+    关键词（全文索引）与向量检索并发执行，RRF 融合、去重后返回带分数的命中
+    """
+    corpus = CORPORA.get(request.corpus)
+    if corpus is None:
+        raise HTTPException(status_code=400, detail=f"未知的数据集: {request.corpus}")
+    try:
+        with sql_label("moi.search"):
+            hits = await hybrid_search(
+                corpus,
+                request.query,
+                embedding=request.embedding,
+                filters=request.filters,
+                top_k=request.top_k,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(
+        corpus=corpus.name,
+        columns=list(corpus.columns),
+        hits=[
+            SearchHitOut(id=h.id, score=h.score, sources=h.sources, row=h.row)
+            for h in hits
+        ],
+    )
+
+
+BATCH_LOOKUPS = ("procurement_projects", "historical_performance", "secondary_price")
+
+
+class BatchQueryItem(BaseModel):
+    item_name: str
+    embedding: Optional[list[float]] = None
+
+
+class BatchQueryRequest(BaseModel):
+    """批量查询请求：一次提交多个标的物，执行三类查询"""
+    items: list[BatchQueryItem] = Field(..., min_length=1, max_length=100)
+    lookups: list[str] = list(BATCH_LOOKUPS)
+    # true 时以 NDJSON 逐条返回（每个标的物完成即推送一行）
+    stream: bool = False
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    item_name: str
+    procurement_projects: Optional[SQLQueryResponse] = None
+    historical_performance: Optional[SQLQueryResponse] = None
+    secondary_price: Optional[SQLQueryResponse] = None
+    # 该标的物查询意外失败时的错误信息
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    results: list[BatchItemResult]
+
+
+async def _lookup_item(
+    index: int,
+    item: BatchQueryItem,
+    lookups: set[str],
+    store: SupplierPerformanceStore,
+) -> BatchItemResult:
+    """单个标的物的三类查询。
+
+    采购项目与历史表现检索的是同一数据集、同一查询，合并为一次混合检索：
+    前 20 条作为采购项目，全部 50 条候选用于供应商表现聚合。
+    """
+    result = BatchItemResult(index=index, item_name=item.item_name)
+    tasks = {}
+    if lookups & {"procurement_projects", "historical_performance"}:
+        tasks["bidding"] = hybrid_search(
+            BIDDING_CORPUS, item.item_name, embedding=item.embedding, top_k=50
+        )
+    if "secondary_price" in lookups:
+        tasks["price"] = hybrid_search(
+            PRICE_CORPUS, item.item_name, embedding=item.embedding, top_k=10
+        )
+
+    outcomes = dict(
+        zip(tasks.keys(), await asyncio.gather(*tasks.values(), return_exceptions=True))
+    )
+
+    bidding = outcomes.get("bidding")
+    if isinstance(bidding, Exception):
+        logger.warning(f"批量查询失败 (采购项目): item='{item.item_name}', {bidding}")
+        error = SQLQueryResponse(error=f"查询失败: {bidding}")
+        if "procurement_projects" in lookups:
+            result.procurement_projects = error
+        if "historical_performance" in lookups:
+            result.historical_performance = error
+    elif bidding is not None:
+        if "procurement_projects" in lookups:
+            result.procurement_projects = _hits_response(BIDDING_CORPUS.columns, bidding[:20])
+        if "historical_performance" in lookups:
+            try:
+                result.historical_performance = SQLQueryResponse(
+                    columns=PERFORMANCE_COLUMNS, rows=await _performance_rows(store, bidding)
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"批量查询失败 (历史表现): item='{item.item_name}', {exc}")
+                result.historical_performance = SQLQueryResponse(error=f"查询失败: {exc}")
+
+    price = outcomes.get("price")
+    if isinstance(price, Exception):
+        logger.warning(f"批量查询失败 (二采价格): item='{item.item_name}', {price}")
+        result.secondary_price = SQLQueryResponse(error=f"查询失败: {price}")
+    elif price is not None:
+        result.secondary_price = _hits_response(PRICE_CORPUS.columns, price)
+
+    return result
+
+
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(request: BatchQueryRequest):
+    """
+    批量查询多个标的物的采购项目、历史表现与二采价格
+    各标的物并发执行（并发数由 MOI_BATCH_CONCURRENCY 限制），共享连接池；
+    stream=true 时按完成顺序以 NDJSON 推送每个标的物的结果
+    """
+    lookups = set(request.lookups)
+    unknown = lookups - set(BATCH_LOOKUPS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的查询类型: {sorted(unknown)}")
+
+    logger.info(f"收到批量查询请求: {len(request.items)} 个标的物, lookups={sorted(lookups)}")
+    store = get_supplier_performance_store()
+    if "historical_performance" in lookups:
+        await store.ensure_fresh()
+
+    semaphore = asyncio.Semaphore(settings.MOI_BATCH_CONCURRENCY)
+
+    async def run(index: int, item: BatchQueryItem) -> BatchItemResult:
+        try:
+            async with semaphore:
+                with sql_label("moi.batch"):
+                    return await _lookup_item(index, item, lookups, store)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f"批量查询失败: item='{item.item_name}', {exc}")
+            return BatchItemResult(index=index, item_name=item.item_name, error=f"查询失败: {exc}")
+
+    if request.stream:
+        async def ndjson() -> AsyncGenerator[str, None]:
+            # 任务在开始迭代时创建；客户端断开或响应关闭时取消未完成的查询，释放信号量与连接
+            tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(request.items)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    item_result = await next_done
+                    yield item_result.model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*(run(i, item) for i, item in enumerate(request.items)))
+    return BatchQueryResponse(results=list(results))
@@ -1,6 +1,7 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class ChatMessage(BaseModel):
@@ -33,10 +34,42 @@ class ConversationSyncRequest(BaseModel):
     id: Optional[int] = None
     title: str
     message: Optional[ConversationMessageIn] = None
+    # 批量消息（例如离线期间的整段会话），与 message 一并按顺序写入
+    messages: List[ConversationMessageIn] = Field(default_factory=list, max_length=1000)
     created_at: Optional[int] = None
     updated_at: Optional[int] = None
 
 
+class FileRef(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-f]{64}$")
+    name: Optional[str] = None
+
+
+class FileLookupRequest(BaseModel):
+    """按内容 sha256 把服务端已有的文件关联到会话，未命中的再上传。"""
+
+    conversation_id: int
+    files: List[FileRef] = Field(min_length=1, max_length=100)
+
+
+class ConversationArtifactOut(BaseModel):
+    sha256: str
+    name: str
+    size: int
+    chunks: int
+    created_at: int
+
+
+class ConversationBulkRequest(BaseModel):
+    """批量删除 / 归档：按 id 或最后更新时间筛选，至少指定其一。"""
+
+    action: Literal["delete", "archive"]
+    ids: List[int] = Field(default_factory=list, max_length=10000)
+    older_than_days: Optional[int] = Field(None, ge=0)
+    status: Optional[str] = None
+    include_pinned: bool = False
+
+
 class ConversationOut(BaseModel):
     id: int
     title: str
@@ -45,11 +78,94 @@ class ConversationOut(BaseModel):
 
 
 class MessageOut(BaseModel):
+    # 历史接口支持 fields 选择返回字段，未选择的字段不出现在响应中
     id: str
     role: str
     content: str
     timestamp: int
     deep_thinking: Optional[str] = None
     model: Optional[str] = None
+    has_thinking: Optional[bool] = None
+
+
+class MessageThinkingOut(BaseModel):
+    id: str
+    deep_thinking: Optional[str] = None
+
+
+class ConversationPage(BaseModel):
+    items: List[ConversationOut]
+    # 下一页游标，为空表示没有更多数据
+    next_cursor: Optional[str] = None
+
+
+class MessagePage(BaseModel):
+    items: List[MessageOut]
+    next_cursor: Optional[str] = None
+
+
+class ConversationSearchTitleHit(BaseModel):
+    id: int
+    title: str
+    updated_at: int
+    score: float
+
+
+class ConversationSearchMessageHit(BaseModel):
+    conversation_id: int
+    title: str
+    message_id: str
+    role: str
+    timestamp: int
+    # 围绕命中位置截取的片段，highlights 为片段内命中区间 [start, end)
+    snippet: str
+    highlights: List[Tuple[int, int]]
+    score: float
+
+
+class ConversationSearchPage(BaseModel):
+    # 标题命中只在第一页返回
+    conversations: List[ConversationSearchTitleHit]
+    items: List[ConversationSearchMessageHit]
+    next_cursor: Optional[str] = None
+
+
+# ---------------------------------------------------------------------------
+# 列表接口的快速序列化：路由直接由投影行构造 dict，经预编译的 TypeAdapter
+# 一次性序列化为 JSON（pydantic-core 实现），跳过逐条构造与校验模型实例。
+# 字段须与上面的 ConversationOut / MessageOut 保持一致。
+# ---------------------------------------------------------------------------
+
+
+class ConversationRow(TypedDict):
+    id: int
+    title: str
+    created_at: int
+    updated_at: int
+
+
+class MessageRow(TypedDict, total=False):
+    # 按 fields 只包含部分字段
+    id: str
+    role: str
+    content: str
+    timestamp: int
+    deep_thinking: Optional[str]
+    model: Optional[str]
+    has_thinking: bool
+
+
+class ConversationPageRow(TypedDict):
+    items: List[ConversationRow]
+    next_cursor: Optional[str]
+
+
+class MessagePageRow(TypedDict):
+    items: List[MessageRow]
+    next_cursor: Optional[str]
 
 
+CONVERSATION_LIST_ADAPTER = TypeAdapter(List[ConversationRow])
+CONVERSATION_PAGE_ADAPTER = TypeAdapter(ConversationPageRow)
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[MessageRow])
+MESSAGE_PAGE_ADAPTER = TypeAdapter(MessagePageRow)
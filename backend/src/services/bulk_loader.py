@@ -0,0 +1,444 @@
+"""
+MOI 数据批量导入服务
+流式读取 CSV / Excel 导出文件，规范化金额字段后以多行 INSERT 分批写入
+bidding_records_1 / product_price，并发批量补齐缺失的向量列；
+按批次写检查点，中断后可从断点续跑
+"""
+
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, bindparam, insert, text, update
+
+from src.db.session import AsyncSessionLocal
+from src.services.llm_client import embed_texts
+from src.services.matrixone_client import get_matrixone_client
+from src.utils.number_utils import parse_amount
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData(schema="xunyuan_agent")
+
+# 向量列以 '[x,y,...]' 字符串写入，由 MatrixOne 转换为 vecf64
+bidding_records = Table(
+    "bidding_records_1",
+    _metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("细化产品", String),
+    Column("单位", String),
+    Column("项目名称", String),
+    Column("供应商名称", String),
+    Column("参与状态", String),
+    Column("是否参股企业", String),
+    Column("中标金额_万元", String),
+    Column("供应商联系人", String),
+    Column("电话号码", String),
+    Column("电子邮件", String),
+    Column("project_name_embedding", String),
+    Column("product_embedding", String),
+)
+
+product_price = Table(
+    "product_price",
+    _metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("项目名称", String),
+    Column("单位", String),
+    Column("物料编码", String),
+    Column("物料短描述", String),
+    Column("物料单位", String),
+    Column("平均单价（元）", String),
+    Column("最高价（元）", String),
+    Column("最低价（元）", String),
+    Column("project_name_embedding", String),
+    Column("product_embedding", String),
+)
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """一张目标表的导入规则。"""
+
+    name: str
+    table: Table
+    # 导出文件表头别名 -> 表列名
+    aliases: Dict[str, str]
+    amount_columns: Tuple[str, ...]
+    # 向量列 -> 生成向量所用的文本列
+    embedding_sources: Dict[str, str]
+    # 对应的 IVF 向量索引名
+    vector_indexes: Tuple[str, ...]
+
+    @property
+    def data_columns(self) -> List[str]:
+        return [
+            c.name
+            for c in self.table.columns
+            if c.name != "id" and c.name not in self.embedding_sources
+        ]
+
+    @property
+    def qualified_name(self) -> str:
+        return f"`{self.table.schema}`.`{self.table.name}`"
+
+
+TABLE_SPECS: Dict[str, TableSpec] = {
+    "bidding": TableSpec(
+        name="bidding",
+        table=bidding_records,
+        aliases={
+            "采购单位": "单位",
+            "中标金额（万元）": "中标金额_万元",
+            "中标金额(万元)": "中标金额_万元",
+        },
+        amount_columns=("中标金额_万元",),
+        embedding_sources={
+            "project_name_embedding": "项目名称",
+            "product_embedding": "细化产品",
+        },
+        vector_indexes=("ivf_bidding_project", "ivf_bidding_product"),
+    ),
+    "price": TableSpec(
+        name="price",
+        table=product_price,
+        aliases={
+            "平均单价(元)": "平均单价（元）",
+            "最高价(元)": "最高价（元）",
+            "最低价(元)": "最低价（元）",
+        },
+        amount_columns=("平均单价（元）", "最高价（元）", "最低价（元）"),
+        embedding_sources={
+            "project_name_embedding": "项目名称",
+            "product_embedding": "物料短描述",
+        },
+        vector_indexes=("ivf_price_project", "ivf_price_product"),
+    ),
+}
+
+
+@dataclass
+class LoadOptions:
+    batch_size: int = 2000
+    # 单条 INSERT 的字节上限：每行两列向量字面量约 40KB，按行数分批的语句可能超过 max_allowed_packet
+    max_statement_bytes: int = 8 * 1024 * 1024
+    embed: bool = True
+    embed_batch_size: int = 32
+    embed_concurrency: int = 8
+    checkpoint_path: Optional[str] = None
+
+
+# ---------------------------------------------------------------------------
+# 读取与规范化
+# ---------------------------------------------------------------------------
+
+
+def iter_source_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """流式读取 CSV / Excel，逐行产出 {表头: 值}，不整体载入内存。"""
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext == "csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+    elif ext in ("xlsx", "xlsm"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            for values in rows:
+                if values is None or all(v is None for v in values):
+                    continue
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"不支持的导入文件格式: {ext}")
+
+
+def normalize_row(spec: TableSpec, raw: Dict[str, Any]) -> Dict[str, Any]:
+    """映射表头别名、清洗空值并将金额规范化为纯数值字符串。"""
+    row: Dict[str, Any] = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        column = spec.aliases.get(key.strip(), key.strip())
+        if column not in spec.table.columns or column == "id":
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        row[column] = value
+
+    for column in spec.amount_columns:
+        amount = parse_amount(row.get(column))
+        row[column] = str(amount) if amount is not None else None
+
+    for column in spec.data_columns:
+        value = row.get(column)
+        row[column] = None if value is None else str(value)
+    return row
+
+
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# 检查点
+# ---------------------------------------------------------------------------
+
+
+class Checkpoint:
+    """以 JSON 文件记录导入进度，每个已提交批次后原子落盘。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.state: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.state.get(key, default)
+
+    def save(self, **values: Any) -> None:
+        self.state.update(values)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+# ---------------------------------------------------------------------------
+# 向量生成
+# ---------------------------------------------------------------------------
+
+
+def _vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+class EmbeddingBatcher:
+    """对去重后的文本分批并发调用嵌入接口，结果按文本缓存以复用重复名称。"""
+
+    # 每条 1024 维向量的字面量约 20KB，缓存条数需控制内存占用
+    def __init__(self, batch_size: int, concurrency: int, cache_size: int = 5_000) -> None:
+        self.batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache: Dict[str, str] = {}
+        self._cache_size = cache_size
+
+    async def _embed_chunk(self, chunk: List[str]) -> None:
+        async with self._semaphore:
+            vectors = await embed_texts(chunk)
+        for value, vector in zip(chunk, vectors):
+            self._cache[value] = _vector_literal(vector)
+
+    async def embed(self, texts: Sequence[Optional[str]]) -> List[Optional[str]]:
+        if len(self._cache) > self._cache_size:
+            self._cache.clear()
+        pending = sorted({t for t in texts if t and t not in self._cache})
+        chunks = [
+            pending[i : i + self.batch_size]
+            for i in range(0, len(pending), self.batch_size)
+        ]
+        await asyncio.gather(*(self._embed_chunk(chunk) for chunk in chunks))
+        return [self._cache.get(t) if t else None for t in texts]
+
+
+async def fill_embeddings(
+    spec: TableSpec, rows: List[Dict[str, Any]], batcher: EmbeddingBatcher
+) -> None:
+    """为一批行补齐所有向量列（各向量列并发生成）。"""
+    columns = list(spec.embedding_sources.items())
+    results = await asyncio.gather(
+        *(batcher.embed([row.get(source) for row in rows]) for _, source in columns)
+    )
+    for (column, _), vectors in zip(columns, results):
+        for row, vector in zip(rows, vectors):
+            row[column] = vector
+
+
+# ---------------------------------------------------------------------------
+# 导入与回填
+# ---------------------------------------------------------------------------
+
+
+async def _insert_batch(spec: TableSpec, rows: List[Dict[str, Any]]) -> None:
+    """单条多行 INSERT 写入一批数据。"""
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(spec.table).values(rows))
+        await session.commit()
+
+
+def _row_bytes(row: Dict[str, Any]) -> int:
+    # 估算值在 INSERT 语句中的长度：字符串按 UTF-8 字节计，另加引号与分隔符
+    return sum(len(v.encode("utf-8")) + 4 if isinstance(v, str) else 24 for v in row.values())
+
+
+def _statement_batches(rows: List[Dict[str, Any]], max_bytes: int) -> Iterator[List[Dict[str, Any]]]:
+    """按估算的语句字节数切分一批行，单行超过上限时单独成批。"""
+    batch: List[Dict[str, Any]] = []
+    size = 0
+    for row in rows:
+        row_bytes = _row_bytes(row)
+        if batch and size + row_bytes > max_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(row)
+        size += row_bytes
+    if batch:
+        yield batch
+
+
+def _read_batches(path: str, spec: TableSpec, batch_size: int, skip: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for idx, raw in enumerate(iter_source_rows(path)):
+        if idx < skip:
+            continue
+        batch.append(normalize_row(spec, raw))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def load_file(spec: TableSpec, path: str, options: LoadOptions) -> int:
+    """导入一个文件，返回本次写入的行数。
+
+    读取（线程中）、向量生成、写库三段以有界队列串联，写库按文件顺序提交并更新检查点。
+    """
+    checkpoint = Checkpoint(options.checkpoint_path or f"{path}.ckpt.json")
+    fingerprint = file_fingerprint(path)
+    if checkpoint.get("fingerprint") != fingerprint:
+        checkpoint.save(fingerprint=fingerprint, table=spec.name, rows_done=0)
+    rows_done = int(checkpoint.get("rows_done", 0))
+    if rows_done:
+        logger.info(f"从检查点续跑: {path} 已完成 {rows_done} 行")
+
+    batcher = EmbeddingBatcher(options.embed_batch_size, options.embed_concurrency)
+    reader = _read_batches(path, spec, options.batch_size, rows_done)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+    async def produce() -> None:
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, reader, None)
+                if batch is None:
+                    break
+                if options.embed:
+                    await fill_embeddings(spec, batch, batcher)
+                await queue.put(batch)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    inserted = 0
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            for rows in _statement_batches(batch, options.max_statement_bytes):
+                await _insert_batch(spec, rows)
+                inserted += len(rows)
+                checkpoint.save(rows_done=rows_done + inserted)
+            logger.info(f"{spec.name}: 已写入 {rows_done + inserted} 行")
+    finally:
+        producer.cancel()
+    await asyncio.gather(producer, return_exceptions=True)
+    # 生产端异常（读取或向量生成失败）需要透出，已提交的批次保留在检查点中
+    if producer.done() and not producer.cancelled() and producer.exception():
+        raise producer.exception()
+    return inserted
+
+
+async def backfill_embeddings(spec: TableSpec, options: LoadOptions) -> int:
+    """为已有记录补齐为空的向量列，按 id 水位线推进，可断点续跑；只为为空的列生成向量。"""
+    checkpoint = Checkpoint(
+        options.checkpoint_path or f"backfill_{spec.name}.ckpt.json"
+    )
+    last_id = int(checkpoint.get("backfill_last_id", 0))
+    batcher = EmbeddingBatcher(options.embed_batch_size, options.embed_concurrency)
+    client = get_matrixone_client()
+
+    source_columns = ", ".join(f"`{c}`" for c in set(spec.embedding_sources.values()))
+    missing_flags = ", ".join(
+        f"`{c}` IS NULL AS `_missing_{c}`" for c in spec.embedding_sources
+    )
+    null_filter = " OR ".join(f"`{c}` IS NULL" for c in spec.embedding_sources)
+    statements = {
+        c: update(spec.table)
+        .where(spec.table.c.id == bindparam("_id"))
+        .values({c: bindparam(f"_{c}")})
+        for c in spec.embedding_sources
+    }
+
+    async def embed_missing(column: str, source: str, rows: List[Dict[str, Any]]):
+        missing = [row for row in rows if row[f"_missing_{column}"]]
+        vectors = await batcher.embed([row.get(source) for row in missing])
+        return column, [
+            {"_id": row["id"], f"_{column}": vector} for row, vector in zip(missing, vectors)
+        ]
+
+    updated = 0
+    while True:
+        result = await client.run_sql(
+            f"SELECT `id`, {source_columns}, {missing_flags} FROM {spec.qualified_name} "
+            f"WHERE `id` > {last_id} AND ({null_filter}) "
+            f"ORDER BY `id` LIMIT {int(options.batch_size)};"
+        )
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        rows = result.get("rows", [])
+        if not rows:
+            break
+
+        # 各向量列只为该列为空的行生成，避免覆盖并重复计算已有的向量
+        updates = await asyncio.gather(
+            *(
+                embed_missing(column, source, rows)
+                for column, source in spec.embedding_sources.items()
+            )
+        )
+        async with AsyncSessionLocal() as session:
+            for column, params in updates:
+                if params:
+                    await session.execute(statements[column], params)
+            await session.commit()
+
+        last_id = int(rows[-1]["id"])
+        updated += len(rows)
+        checkpoint.save(backfill_last_id=last_id)
+        logger.info(f"{spec.name}: 已回填向量 {updated} 行，id 水位线 {last_id}")
+    return updated
+
+
+async def rebuild_vector_indexes(spec: TableSpec, lists: int) -> None:
+    """批量导入后重建 IVF 向量索引，使聚类中心反映新数据分布。"""
+    client = get_matrixone_client()
+    existing = await client.run_sql(f"SHOW INDEX FROM {spec.qualified_name};")
+    names = {row.get("Key_name") for row in existing.get("rows", [])}
+    for index_name in spec.vector_indexes:
+        if index_name not in names:
+            logger.info(f"向量索引不存在，跳过重建: {index_name}")
+            continue
+        async with AsyncSessionLocal() as session:
+            await session.execute(text("SET experimental_ivf_index = 1"))
+            await session.execute(
+                text(
+                    f"ALTER TABLE {spec.qualified_name} "
+                    f"ALTER REINDEX `{index_name}` IVFFLAT LISTS = {int(lists)}"
+                )
+            )
+            await session.commit()
+        logger.info(f"向量索引已重建: {index_name}")
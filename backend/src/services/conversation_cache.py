@@ -0,0 +1,215 @@
+"""
+会话消息热缓存
+进程内按会话缓存消息窗口（最早的 N 条，与 list_messages 的语义一致），
+同步接口写穿更新，按 LRU 与内存预算淘汰，聊天轮次读取历史时无需访问数据库
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 单条消息除文本外的对象开销估算（字节）
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+@dataclass(frozen=True, slots=True)
+class CachedMessage:
+    """缓存的消息，字段与聊天上下文投影行一致（不含 deep_thinking）；写穿进来的消息尚无数据库 id。"""
+
+    id: Optional[Any]
+    role: str
+    content: str
+    created_at: datetime
+    model: Optional[str]
+    has_thinking: bool
+
+
+def _estimate_bytes(message: CachedMessage) -> int:
+    # 中文按 str 的 UCS-2 存储估算为每字 2 字节
+    return MESSAGE_OVERHEAD_BYTES + 2 * len(message.content)
+
+
+@dataclass
+class _Window:
+    messages: List[CachedMessage] = field(default_factory=list)
+    size: int = 0
+    # 会话消息数超过窗口，缓存只覆盖最早的 max_messages 条
+    truncated: bool = False
+    # 写穿的消息没有数据库 id，需要 id 的读取（消息列表接口）此时回源
+    has_ids: bool = True
+
+
+class ConversationCache:
+    """LRU + 内存预算的会话消息缓存"""
+
+    def __init__(self, max_bytes: int, max_messages: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self._windows: "OrderedDict[int, _Window]" = OrderedDict()
+        self._bytes = 0
+        # 正在回源加载的会话 -> 加载期间的写入次数，用于丢弃过期的加载结果
+        self._loading: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(
+        self, conversation_id: int, limit: int, need_ids: bool = False
+    ) -> Optional[List[CachedMessage]]:
+        """命中时返回最早的 limit 条消息；未命中返回 None。"""
+        window = self._windows.get(conversation_id)
+        if (
+            window is None
+            or (need_ids and not window.has_ids)
+            or (window.truncated and limit > len(window.messages))
+        ):
+            self.misses += 1
+            return None
+        self._windows.move_to_end(conversation_id)
+        self.hits += 1
+        return window.messages[:limit]
+
+    def begin_load(self, conversation_id: int) -> int:
+        """回源前登记，返回令牌；加载期间若有写入，fill 会丢弃该次结果。"""
+        return self._loading.setdefault(conversation_id, 0)
+
+    def end_load(self, conversation_id: int) -> None:
+        """回源结束（包括失败）时注销登记；fill 已注销时为空操作。"""
+        self._loading.pop(conversation_id, None)
+
+    def fill(
+        self, conversation_id: int, rows: Iterable[Any], token: int, has_ids: bool = True
+    ) -> None:
+        """用回源读取的结果（最多 max_messages + 1 条）填充窗口。
+
+        rows 含未落库的消息（没有数据库 id）时传 has_ids=False，需要 id 的读取不命中该窗口。
+        """
+        if self._loading.pop(conversation_id, None) != token or not self.enabled:
+            return
+        messages = [_to_cached(r) for r in rows]
+        # 空结果不缓存：可能是不存在的会话 id，且空窗口不占预算、无法被淘汰
+        if not messages:
+            return
+        truncated = len(messages) > self.max_messages
+        self._store(
+            conversation_id,
+            _Window(
+                messages=messages[: self.max_messages],
+                truncated=truncated,
+                has_ids=has_ids and all(m.id is not None for m in messages),
+            ),
+        )
+
+    def put_new(self, conversation_id: int, rows: Iterable[Any]) -> None:
+        """新建的会话：消息即全部历史，直接建立窗口。"""
+        rows = list(rows)
+        if self.enabled and rows:
+            self._store(conversation_id, _Window())
+            self.append(conversation_id, rows)
+
+    def append(self, conversation_id: int, rows: Iterable[Any]) -> None:
+        """写穿：已缓存的会话追加新消息；窗口已满时只标记截断。"""
+        if conversation_id in self._loading:
+            self._loading[conversation_id] += 1
+        window = self._windows.get(conversation_id)
+        if window is None or window.truncated:
+            return
+        for row in rows:
+            if len(window.messages) >= self.max_messages:
+                window.truncated = True
+                break
+            message = _to_cached(row)
+            window.messages.append(message)
+            window.size += _estimate_bytes(message)
+            self._bytes += _estimate_bytes(message)
+            if message.id is None:
+                window.has_ids = False
+        self._windows.move_to_end(conversation_id)
+        self._evict()
+
+    def invalidate(self, conversation_id: int) -> None:
+        if conversation_id in self._loading:
+            self._loading[conversation_id] += 1
+        window = self._windows.pop(conversation_id, None)
+        if window is not None:
+            self._bytes -= window.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "conversations": len(self._windows),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _store(self, conversation_id: int, window: _Window) -> None:
+        self.invalidate(conversation_id)
+        window.size = sum(_estimate_bytes(m) for m in window.messages)
+        if window.size > self.max_bytes:
+            return
+        self._windows[conversation_id] = window
+        self._bytes += window.size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._windows:
+            _, window = self._windows.popitem(last=False)
+            self._bytes -= window.size
+            self.evictions += 1
+
+
+def _to_cached(row: Any) -> CachedMessage:
+    if isinstance(row, CachedMessage):
+        return row
+    if isinstance(row, dict):
+        return CachedMessage(
+            id=row.get("id"),
+            role=row["role"],
+            content=row["content"],
+            created_at=row["created_at"],
+            model=row.get("model"),
+            has_thinking=bool(row.get("deep_thinking")),
+        )
+    return CachedMessage(
+        id=row.id,
+        role=row.role,
+        content=row.content,
+        created_at=row.created_at,
+        model=row.model,
+        has_thinking=_has_thinking(row),
+    )
+
+
+def _has_thinking(row: Any) -> bool:
+    flag = getattr(row, "has_thinking", None)
+    if flag is not None:
+        return bool(flag)
+    return bool(getattr(row, "deep_thinking", None))
+
+
+_conversation_cache: Optional[ConversationCache] = None
+
+
+def get_conversation_cache() -> ConversationCache:
+    global _conversation_cache
+    if _conversation_cache is None:
+        _conversation_cache = ConversationCache(
+            max_bytes=settings.CONVERSATION_CACHE_MAX_BYTES,
+            max_messages=settings.CONVERSATION_CACHE_MAX_MESSAGES,
+        )
+    return _conversation_cache
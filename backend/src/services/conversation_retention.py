@@ -0,0 +1,287 @@
+"""
+会话清理与归档服务
+删除 / 归档请求只在会话上打状态标记并立即返回，后台任务逐个会话处理：
+
+- 归档：会话、消息与所引用文件的解析文本按批读取，写入 gzip 压缩的 JSONL 归档文件（每天一个文件，追加写）；
+- 删除：消息按固定批量分多个短事务删除，最后删除会话行、文件关联（回收不再被引用的文件）与文件检索索引，避免大事务长时间持锁；
+- 保留策略：按 RETENTION_DAYS 定期归档长期未更新的非置顶会话，使热表保持精简。
+
+服务重启时会继续处理仍带标记的会话；中途崩溃后重新归档可能产生重复记录，按 id 去重即可。
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from src.config import settings
+from src.crud.crud_conversations import (
+    STATUS_ARCHIVING,
+    STATUS_DELETING,
+    crud_conversations,
+)
+from src.crud.crud_file_artifacts import crud_file_artifacts
+from src.crud.crud_message_blobs import crud_message_blobs
+from src.crud.crud_messages import crud_messages
+from src.db.models import Conversation, now_shanghai
+from src.db.session import AsyncSessionLocal
+from src.services.conversation_cache import get_conversation_cache
+from src.services.document_index import get_document_index
+from src.services.write_behind import get_write_behind_queue
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"无法序列化: {type(value)}")
+
+
+class ConversationPurger:
+    """后台会话清理 / 归档任务"""
+
+    def __init__(self, chunk_size: int, archive_dir: str) -> None:
+        self.chunk_size = chunk_size
+        self.archive_dir = archive_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set[int] = set()
+        self._worker: Optional[asyncio.Task] = None
+        self._retention: Optional[asyncio.Task] = None
+        self.purged = 0
+        self.archived = 0
+
+    async def start(self) -> None:
+        """启动后台任务，并接续处理上次未完成的会话。"""
+        self._queue = asyncio.Queue()
+        self._queued.clear()
+        self._worker = asyncio.create_task(self._run())
+        if settings.RETENTION_DAYS > 0:
+            self._retention = asyncio.create_task(self._retention_loop())
+        try:
+            async with AsyncSessionLocal() as db:
+                pending = await crud_conversations.list_pending_removal(db)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"读取待清理会话失败: {exc}")
+            return
+        self.enqueue(pending)
+        if pending:
+            logger.info(f"接续清理 {len(pending)} 个会话")
+        await self._collect_orphans()
+
+    async def stop(self) -> None:
+        for task in (self._worker, self._retention):
+            if task is not None:
+                task.cancel()
+
+    def enqueue(self, conversation_ids: Sequence[int]) -> None:
+        """登记已打标记的会话；未启动时留给下次启动接续处理。"""
+        if self._queue is None:
+            return
+        for conv_id in conversation_ids:
+            if conv_id not in self._queued:
+                self._queued.add(conv_id)
+                self._queue.put_nowait(conv_id)
+
+    async def schedule(
+        self,
+        *,
+        archive: bool,
+        ids: Optional[Sequence[int]] = None,
+        older_than_days: Optional[int] = None,
+        status: Optional[str] = None,
+        include_pinned: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """选出会话、打标记（列表接口随即不可见），并交给后台任务处理。"""
+        updated_before = (
+            now_shanghai() - timedelta(days=older_than_days)
+            if older_than_days is not None
+            else None
+        )
+        async with AsyncSessionLocal() as db:
+            conv_ids = await crud_conversations.mark_for_removal(
+                db,
+                new_status=STATUS_ARCHIVING if archive else STATUS_DELETING,
+                ids=ids,
+                updated_before=updated_before,
+                status=status,
+                include_pinned=include_pinned,
+                limit=limit,
+            )
+            await db.commit()
+
+        # 显式指定的 id 可能只存在于写入队列中，同样需要丢弃
+        affected = set(conv_ids) | set(ids or ())
+        if settings.MESSAGE_WRITE_BEHIND:
+            queue = get_write_behind_queue()
+            for conv_id in affected:
+                await queue.discard(conv_id)
+        cache = get_conversation_cache()
+        for conv_id in affected:
+            cache.invalidate(conv_id)
+
+        self.enqueue(conv_ids)
+        logger.info(
+            f"已标记 {len(conv_ids)} 个会话待{'归档' if archive else '删除'}"
+        )
+        return conv_ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "purged": self.purged,
+            "archived": self.archived,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            conv_id = await self._queue.get()
+            try:
+                await self._process(conv_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                # 标记仍在，下次启动时会重试
+                logger.error(f"清理会话 {conv_id} 失败: {exc}", exc_info=True)
+            finally:
+                self._queued.discard(conv_id)
+
+    async def _process(self, conv_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(*Conversation.__table__.columns).where(Conversation.id == conv_id)
+            )
+            conv = result.first()
+        if conv is None:
+            return
+        if conv.status == STATUS_ARCHIVING:
+            await self._archive(conv)
+            self.archived += 1
+        elif conv.status != STATUS_DELETING:
+            # 标记后又被恢复，不再处理
+            return
+        await self._purge(conv_id)
+        self.purged += 1
+
+    async def _purge(self, conv_id: int) -> None:
+        """分批删除消息，每批一个短事务，最后删除会话行。"""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                deleted = await crud_messages.delete_chunk(db, conv_id, self.chunk_size)
+                if deleted == 0:
+                    await crud_file_artifacts.unlink_conversation(db, conv_id)
+                    await crud_conversations.delete_by_id(db, conv_id)
+                await db.commit()
+            if deleted == 0:
+                break
+            total += deleted
+            # 让出事件循环，避免连续删除占满连接
+            await asyncio.sleep(0)
+        await get_document_index().drop(conv_id)
+        await self._collect_orphans()
+        logger.info(f"会话 {conv_id} 已清理，删除消息 {total} 条")
+
+    async def _collect_orphans(self) -> None:
+        """回收清理会话时因处于宽限期而保留的行外内容与上传文件。"""
+        try:
+            async with AsyncSessionLocal() as db:
+                blobs = await crud_message_blobs.collect_orphans(db, self.chunk_size)
+                artifacts = await crud_file_artifacts.collect_orphans(db, self.chunk_size)
+                await db.commit()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"回收无引用的消息内容 / 上传文件失败: {exc}")
+            return
+        if blobs or artifacts:
+            logger.info(f"回收无引用的消息内容 {blobs} 条、上传文件 {artifacts} 个")
+
+    async def _archive(self, conv: Any) -> None:
+        """会话与消息逐行追加到当日的 gzip 归档文件，消息按批读取不整体载入内存。"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(
+            self.archive_dir, f"conversations-{now_shanghai():%Y%m%d}.jsonl.gz"
+        )
+        header = json.dumps(
+            {"type": "conversation", **conv._asdict()},
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        lines = [header]
+        async with AsyncSessionLocal() as db:
+            async for chunk in crud_messages.iter_chunks(db, conv.id, self.chunk_size):
+                lines.extend(
+                    json.dumps(
+                        {"type": "message", **_row_dict(row)},
+                        ensure_ascii=False,
+                        default=_json_default,
+                    )
+                    for row in chunk
+                )
+                await asyncio.to_thread(_append_gzip, path, lines)
+                lines = []
+            # 消息中的 [[artifact:<sha256>]] 引用随会话一起归档所引用文件的解析文本
+            links = await crud_file_artifacts.list_links(db, conv.id)
+            texts = await crud_file_artifacts.load_parsed(db, links)
+        lines.extend(
+            json.dumps(
+                {
+                    "type": "artifact",
+                    "sha256": digest,
+                    "name": link.name,
+                    "content": texts.get(digest, ""),
+                },
+                ensure_ascii=False,
+            )
+            for digest, link in links.items()
+        )
+        if lines:
+            await asyncio.to_thread(_append_gzip, path, lines)
+
+    async def run_retention(self) -> List[int]:
+        """归档超过保留期的非置顶会话。"""
+        return await self.schedule(
+            archive=True,
+            older_than_days=settings.RETENTION_DAYS,
+            limit=settings.RETENTION_BATCH_LIMIT,
+        )
+
+    async def _retention_loop(self) -> None:
+        while True:
+            try:
+                await self.run_retention()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"保留策略执行失败: {exc}")
+            await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+
+
+def _row_dict(row: Any) -> Dict[str, Any]:
+    # 还原过行外大字段的消息为 SimpleNamespace，其余为 Row
+    return vars(row) if isinstance(row, SimpleNamespace) else row._asdict()
+
+
+def _append_gzip(path: str, lines: List[str]) -> None:
+    # gzip 支持多成员追加，整个文件仍可用 gzip -dc / gzip.open 顺序读取
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+_conversation_purger: Optional[ConversationPurger] = None
+
+
+def get_conversation_purger() -> ConversationPurger:
+    global _conversation_purger
+    if _conversation_purger is None:
+        _conversation_purger = ConversationPurger(
+            chunk_size=settings.PURGE_CHUNK_SIZE,
+            archive_dir=settings.ARCHIVE_DIR,
+        )
+    return _conversation_purger
@@ -0,0 +1,112 @@
+"""
+会话历史检索
+基于 conversations.name / messages.content 上的全文索引（ngram 分词，中文按二元组切分）
+检索会话标题与消息内容，按相关度排序并截取命中片段；索引缺失或关键词过短时退化为 LIKE 查询
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.crud.crud_conversations import crud_conversations
+from src.crud.crud_messages import crud_messages
+from src.services.keyword_search import MIN_FULLTEXT_TERM_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# 片段长度（字符），命中位置前保留约三分之一作为上下文
+SNIPPET_CHARS = 120
+
+# 第一页附带的标题命中数
+TITLE_HITS_LIMIT = 10
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    titles: List[Any]
+    messages: List[Any]
+    # 多取一条判断是否还有下一页
+    has_more: bool
+
+
+def query_terms(query: str) -> List[str]:
+    """按空白切分查询词并去重。"""
+    return list(dict.fromkeys(t for t in query.split() if t))
+
+
+def make_snippet(
+    text: str, terms: Sequence[str], width: int = SNIPPET_CHARS
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """截取围绕首个命中的片段，返回片段与其中命中区间 [start, end)。
+
+    全文检索按二元组匹配，完整查询词不一定出现在原文中，此时改为定位其二元组。
+    """
+    lowered = text.lower()
+    needles = [t.lower() for t in terms]
+    if not any(n in lowered for n in needles):
+        needles = list(
+            dict.fromkeys(n[i : i + 2] for n in needles for i in range(len(n) - 1))
+        )
+
+    positions = [p for p in (lowered.find(n) for n in needles if n) if p >= 0]
+    first = min(positions) if positions else 0
+    start = max(0, min(first - width // 3, len(text) - width))
+    end = min(len(text), start + width)
+
+    window = lowered[start:end]
+    spans: List[Tuple[int, int]] = []
+    for needle in needles:
+        pos = window.find(needle) if needle else -1
+        while pos >= 0:
+            spans.append((pos, pos + len(needle)))
+            pos = window.find(needle, pos + len(needle))
+    snippet = text[start:end]
+    if start > 0:
+        snippet = "…" + snippet
+        spans = [(a + 1, b + 1) for a, b in spans]
+    if end < len(text):
+        snippet += "…"
+    return snippet, _merge_spans(spans)
+
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for a, b in sorted(spans):
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+async def search_conversations(
+    db: AsyncSession, query: str, *, limit: int, offset: int = 0
+) -> SearchResult:
+    """检索会话标题与消息内容；标题命中只在第一页返回，消息命中按 offset 分页。"""
+    term = query.strip()
+    if len(term) >= MIN_FULLTEXT_TERM_LENGTH:
+        try:
+            return await _search(db, term, limit=limit, offset=offset, fulltext=True)
+        except SQLAlchemyError as exc:
+            logger.warning(f"会话全文检索失败，退化为 LIKE 查询: {exc}")
+            await db.rollback()
+    return await _search(db, term, limit=limit, offset=offset, fulltext=False)
+
+
+async def _search(
+    db: AsyncSession, term: str, *, limit: int, offset: int, fulltext: bool
+) -> SearchResult:
+    titles: List[Any] = []
+    if offset == 0:
+        titles = await crud_conversations.search_by_name(
+            db, term=term, limit=TITLE_HITS_LIMIT, fulltext=fulltext
+        )
+    messages = await crud_messages.search(
+        db, term=term, limit=limit + 1, offset=offset, fulltext=fulltext
+    )
+    return SearchResult(
+        titles=titles, messages=messages[:limit], has_more=len(messages) > limit
+    )
@@ -0,0 +1,244 @@
+"""
+会话文件检索索引
+上传文件按结构切块（见 src.utils.document_chunker）后生成向量，按会话保存在本地：
+
+- 每个会话一个索引：片段元数据（JSON）+ 归一化的 float32 向量矩阵（.npy），写入临时文件后原子替换；
+- 内存中按 LRU 与内存预算缓存最近使用的会话索引，未命中时从磁盘加载；
+- 聊天轮次用问题向量与片段做内积（余弦相似度），取 top-k 并按字符上限截断，只把相关片段放入提示词；
+- 同一会话重复上传同名文件时替换旧片段；会话删除 / 归档后由清理任务删除索引。
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import settings
+from src.services.llm_client import embed_texts
+from src.utils.document_chunker import DocumentChunk
+from src.utils.metrics import DOC_RETRIEVAL_DURATION
+
+logger = logging.getLogger(__name__)
+
+# 单次向量接口调用的片段数与并发批次数
+EMBED_BATCH_SIZE = 32
+EMBED_CONCURRENCY = 4
+# 片段元数据的对象开销估算（字节）
+CHUNK_OVERHEAD_BYTES = 200
+
+
+@dataclass(slots=True)
+class _Index:
+    chunks: List[DocumentChunk]
+    # (片段数, 维度)，每行已归一化
+    vectors: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return int(self.vectors.nbytes) + sum(
+            CHUNK_OVERHEAD_BYTES + 2 * len(c.text) for c in self.chunks
+        )
+
+
+def _normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class DocumentIndex:
+    """按会话的本地向量索引（LRU + 内存预算缓存，磁盘持久化）"""
+
+    def __init__(self, directory: str, max_bytes: int, top_k: int, max_chars: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.top_k = top_k
+        self.max_chars = max_chars
+        self._indexes: "OrderedDict[int, _Index]" = OrderedDict()
+        self._bytes = 0
+        # 同一会话的写入串行执行，避免并发上传互相覆盖
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _paths(self, conversation_id: int) -> tuple[str, str]:
+        base = os.path.join(self.directory, str(conversation_id))
+        return f"{base}.json", f"{base}.npy"
+
+    # ------------------------------------------------------------------
+    # 磁盘读写（在线程中执行）
+    # ------------------------------------------------------------------
+
+    def _read(self, conversation_id: int) -> Optional[_Index]:
+        meta_path, vector_path = self._paths(conversation_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                chunks = [DocumentChunk(**c) for c in json.load(f)]
+            vectors = np.load(vector_path)
+        except FileNotFoundError:
+            return None
+        if len(chunks) != len(vectors):
+            # 两个文件分别替换，中途崩溃时可能不一致，丢弃后需重新上传
+            logger.warning(f"会话 {conversation_id} 的文件索引不完整，已忽略")
+            return None
+        return _Index(chunks, vectors)
+
+    def _write(self, conversation_id: int, index: _Index) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, vector_path = self._paths(conversation_id)
+        tmp_vectors = f"{vector_path}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, index.vectors)
+        tmp_meta = f"{meta_path}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump([asdict(c) for c in index.chunks], f, ensure_ascii=False)
+        os.replace(tmp_vectors, vector_path)
+        os.replace(tmp_meta, meta_path)
+
+    def _remove(self, conversation_id: int) -> None:
+        for path in self._paths(conversation_id):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # 内存缓存
+    # ------------------------------------------------------------------
+
+    def _put(self, conversation_id: int, index: _Index) -> None:
+        self._discard(conversation_id)
+        size = index.size
+        if size > self.max_bytes:
+            return
+        self._indexes[conversation_id] = index
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._indexes.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _discard(self, conversation_id: int) -> None:
+        index = self._indexes.pop(conversation_id, None)
+        if index is not None:
+            self._bytes -= index.size
+
+    async def _load(self, conversation_id: int) -> Optional[_Index]:
+        index = self._indexes.get(conversation_id)
+        if index is not None:
+            self._indexes.move_to_end(conversation_id)
+            self.hits += 1
+            return index
+        self.misses += 1
+        index = await asyncio.to_thread(self._read, conversation_id)
+        if index is not None:
+            self._put(conversation_id, index)
+        return index
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+        async def run(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await embed_texts(batch)
+
+        batches = [texts[i : i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        results = await asyncio.gather(*(run(b) for b in batches))
+        return _normalize([v for batch in results for v in batch])
+
+    async def add(self, conversation_id: int, source: str, chunks: List[DocumentChunk]) -> int:
+        """为文件片段生成向量并写入会话索引（替换同名文件的旧片段），返回写入的片段数。"""
+        if not chunks:
+            return 0
+        vectors = await self._embed([f"{c.source} {c.location}\n{c.text}" for c in chunks])
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            current = await self._load(conversation_id)
+            if current is not None:
+                keep = [i for i, c in enumerate(current.chunks) if c.source != source]
+                if current.vectors.shape[1] != vectors.shape[1]:
+                    # 向量模型更换后维度不同，旧片段无法比较，整体重建
+                    keep = []
+                chunks = [current.chunks[i] for i in keep] + chunks
+                vectors = np.concatenate([current.vectors[keep], vectors])
+            index = _Index(chunks, vectors)
+            await asyncio.to_thread(self._write, conversation_id, index)
+            self._put(conversation_id, index)
+        return len(chunks)
+
+    async def search(self, conversation_id: int, question: str) -> List[DocumentChunk]:
+        """返回与问题最相关的片段（按相关度降序，总字符数不超过 max_chars）；会话没有索引时返回空列表。"""
+        index = await self._load(conversation_id)
+        if index is None or not question.strip():
+            return []
+        with DOC_RETRIEVAL_DURATION.time():
+            query = (await self._embed([question]))[0]
+            if query.shape[0] != index.vectors.shape[1]:
+                logger.warning(f"会话 {conversation_id} 的文件索引向量维度与当前模型不一致，跳过检索")
+                return []
+            scores = index.vectors @ query
+            k = min(self.top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+        selected: List[DocumentChunk] = []
+        used = 0
+        for i in top:
+            chunk = index.chunks[int(i)]
+            if used + len(chunk.text) > self.max_chars:
+                if selected:
+                    break
+                chunk = DocumentChunk(chunk.source, chunk.location, chunk.text[: self.max_chars])
+            selected.append(chunk)
+            used += len(chunk.text)
+        return selected
+
+    async def drop(self, conversation_id: int) -> None:
+        self._discard(conversation_id)
+        self._locks.pop(conversation_id, None)
+        await asyncio.to_thread(self._remove, conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "conversations": len(self._indexes),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def format_retrieved(chunks: List[DocumentChunk]) -> str:
+    """检索到的片段拼为一条 system 消息，标注来源文件与位置。"""
+    parts = [f"【{c.source} · {c.location}】\n{c.text}" for c in chunks]
+    return (
+        "以下是从用户上传文件中检索到的与当前问题最相关的片段（非全文），请优先基于这些内容回答，"
+        "片段中没有的信息不要臆测：\n\n" + "\n\n".join(parts)
+    )
+
+
+_document_index: Optional[DocumentIndex] = None
+
+
+def get_document_index() -> DocumentIndex:
+    global _document_index
+    if _document_index is None:
+        _document_index = DocumentIndex(
+            directory=settings.DOC_INDEX_DIR,
+            max_bytes=settings.DOC_INDEX_CACHE_MAX_BYTES,
+            top_k=settings.DOC_RETRIEVAL_TOP_K,
+            max_chars=settings.DOC_CONTEXT_MAX_CHARS,
+        )
+    return _document_index
@@ -0,0 +1,271 @@
+"""
+上传文件工件
+上传文件与解析结果按内容 sha256 去重存入 file_artifacts，并关联到会话：
+
+- 同一内容只解析一次：再次上传（或其他会话上传）相同文件时直接复用已存储的解析文本；
+- 客户端可先用 sha256 查询（/api/files/lookup），服务端已有的文件无需重新上传；
+- 消息中以 [[artifact:<sha256>]] 引用文件，不再粘贴全文，消息行与请求体保持精简；
+- 构造聊天上下文时按需展开引用：已建立检索索引的文件由检索提供相关片段，只留一行说明；
+  未建立索引的文件只在最近一次引用处展开解析文本（截断到 FILE_CONTENT_MAX_CHARS），更早的引用只留说明；
+- 表格文件中识别出的报价表以类型化列随工件存储（file_artifacts.tables），空字节表示已提取但没有报价表。
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.crud_file_artifacts import crud_file_artifacts
+from src.services.document_index import get_document_index
+from src.utils.document_chunker import chunk_document
+from src.utils.metrics import DOC_INDEX_CHUNKS, FILE_ARTIFACTS
+from src.utils.parse_file_utils import TABLE_EXTS, extract_file_tables, parse_file_content
+from src.utils.pdf_extractor import PdfPage, extract_pdf_pages
+from src.utils.table_extractor import ExtractedTable, dump_tables, load_tables
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_MARKER_RE = re.compile(r"\[\[artifact:([0-9a-f]{64})\]\]")
+
+# 超过该字节数时在线程中计算 sha256
+HASH_THREAD_THRESHOLD = 1024 * 1024
+
+
+def artifact_marker(sha256: str) -> str:
+    return f"[[artifact:{sha256}]]"
+
+
+def _ext(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+async def _sha256(data: bytes) -> str:
+    if len(data) > HASH_THREAD_THRESHOLD:
+        return await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+    return hashlib.sha256(data).hexdigest()
+
+
+async def index_file(
+    conversation_id: int, name: str, data: bytes, pages: Optional[List[PdfPage]] = None
+) -> int:
+    """切块并写入会话检索索引，返回片段数；无法切块或向量生成失败时返回 0。
+
+    pages 为解析时已提取的 PDF 各页；未提供时 PDF 经进程池重新提取（不设字符上限）。
+    """
+    try:
+        if pages is None and _ext(name) == "pdf":
+            pages, _ = await extract_pdf_pages(
+                data,
+                max_pages=settings.PDF_MAX_PAGES,
+                workers=settings.PDF_WORKERS,
+                min_parallel_pages=settings.PDF_PARALLEL_MIN_PAGES,
+            )
+        chunks = await asyncio.to_thread(
+            chunk_document,
+            name,
+            data,
+            max_chars=settings.DOC_CHUNK_MAX_CHARS,
+            max_chunks=settings.DOC_MAX_CHUNKS,
+            max_pages=settings.PDF_MAX_PAGES,
+            pages=pages,
+        )
+        with span("doc_index.add", **{"file.name": name, "doc.chunks": len(chunks)}):
+            indexed = await get_document_index().add(conversation_id, name, chunks)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Failed to index file {name}: {exc}", exc_info=True)
+        return 0
+    DOC_INDEX_CHUNKS.labels(_ext(name) or "other").inc(len(chunks))
+    logger.info(
+        f"Indexed file {name} into conversation {conversation_id}: {len(chunks)} chunks, {indexed} total"
+    )
+    return len(chunks)
+
+
+async def _dump_tables(ext: str, tables: List[ExtractedTable]) -> Optional[bytes]:
+    if ext not in TABLE_EXTS:
+        return None
+    if not tables:
+        return b""
+    return await asyncio.to_thread(dump_tables, tables)
+
+
+async def get_tables(db: AsyncSession, sha256: str) -> Optional[List[ExtractedTable]]:
+    """读取文件的报价表提取结果；文件不存在时返回 None。
+
+    历史文件（提取功能上线前存储）首次查询时由原文件重新提取并回填，调用方负责提交事务。
+    """
+    meta = (await crud_file_artifacts.get_meta(db, [sha256])).get(sha256)
+    if meta is None:
+        return None
+    if meta.ext not in TABLE_EXTS:
+        return []
+    blob = await crud_file_artifacts.load_tables(db, sha256)
+    if blob is None:
+        data = await crud_file_artifacts.load_data(db, sha256)
+        try:
+            tables = await asyncio.to_thread(extract_file_tables, data or b"", meta.ext)
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Failed to extract tables from {meta.name}: {exc}", exc_info=True)
+            return []
+        await crud_file_artifacts.set_tables(db, sha256, await _dump_tables(meta.ext, tables))
+        return tables
+    if not blob:
+        return []
+    return await asyncio.to_thread(load_tables, blob)
+
+
+async def ingest_upload(
+    db: AsyncSession, file: UploadFile, conversation_id: Optional[int]
+) -> Dict[str, Any]:
+    """解析上传文件；内容已存储时复用解析结果。指定会话时存储文件、关联会话并建立检索索引。
+
+    返回 {"name", "sha256", "content", "chunks", "reused", "linked"}；linked 为真时消息可用
+    artifact_marker(sha256) 引用该文件。调用方负责提交事务。
+    """
+    name = file.filename or "file"
+    data = await file.read()
+    await file.seek(0)
+    digest = await _sha256(data)
+
+    known = (await crud_file_artifacts.get_meta(db, [digest])).get(digest)
+    pages = None
+    if known is not None:
+        content = (await crud_file_artifacts.load_parsed(db, [digest]))[digest]
+        await file.close()
+        FILE_ARTIFACTS.labels("reused").inc()
+        logger.info(f"Reusing parsed artifact for {name} ({digest[:12]})")
+    else:
+        # 需要建立检索索引时 PDF 一次提取全部页，解析文本与切块共用
+        result = await parse_file_content(file, keep_pages=conversation_id is not None)
+        content = result["content"]
+        tables = result["tables"]
+        pages = result["pages"]
+        FILE_ARTIFACTS.labels("parsed").inc()
+        if result["error"] is not None:
+            # 解析失败不存储，下次上传重新解析
+            return {
+                "name": name, "sha256": digest, "content": content,
+                "chunks": 0, "reused": False, "linked": False,
+            }
+
+    entry = {
+        "name": name, "sha256": digest, "content": content,
+        "chunks": 0, "reused": known is not None, "linked": False,
+    }
+    if conversation_id is None:
+        return entry
+    if known is None and len(data) > settings.FILE_ARTIFACT_MAX_BYTES:
+        # 超大文件不存储，仍为本会话建立检索索引
+        logger.warning(f"File {name} exceeds FILE_ARTIFACT_MAX_BYTES, not stored")
+        entry["chunks"] = await index_file(conversation_id, name, data, pages)
+        return entry
+
+    link = (await crud_file_artifacts.list_links(db, conversation_id, [digest])).get(digest)
+    if link is not None and link.chunks:
+        # 该会话已为这份内容建立过索引
+        entry["chunks"] = link.chunks
+        artifact_id = link.artifact_id
+    else:
+        if known is None:
+            artifact_id = await crud_file_artifacts.store(
+                db,
+                sha256=digest,
+                name=name,
+                ext=_ext(name),
+                data=data,
+                parsed=content,
+                tables=await _dump_tables(_ext(name), tables),
+            )
+        else:
+            artifact_id = known.id
+        entry["chunks"] = await index_file(conversation_id, name, data, pages)
+    await crud_file_artifacts.link(
+        db,
+        conversation_id=conversation_id,
+        artifact_id=artifact_id,
+        name=name,
+        chunks=entry["chunks"],
+    )
+    entry["linked"] = True
+    return entry
+
+
+async def attach_known(
+    db: AsyncSession, conversation_id: int, files: Sequence[Tuple[str, str]]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """按 (sha256, 文件名) 把服务端已有的文件关联到会话，免去重新上传。
+
+    返回 (已关联的文件, 服务端没有、需要上传的 sha256)；调用方负责提交事务。
+    """
+    digests = [d for d, _ in files]
+    known = await crud_file_artifacts.get_meta(db, digests)
+    links = await crud_file_artifacts.list_links(db, conversation_id, known)
+    attached: List[Dict[str, Any]] = []
+    missing: List[str] = []
+    for digest, name in files:
+        meta = known.get(digest)
+        if meta is None:
+            missing.append(digest)
+            continue
+        name = name or meta.name
+        link = links.get(digest)
+        chunks = link.chunks if link is not None else 0
+        if not chunks:
+            data = await crud_file_artifacts.load_data(db, digest)
+            chunks = await index_file(conversation_id, name, data or b"")
+        await crud_file_artifacts.link(
+            db, conversation_id=conversation_id, artifact_id=meta.id, name=name, chunks=chunks
+        )
+        FILE_ARTIFACTS.labels("reused").inc()
+        attached.append(
+            {"name": name, "sha256": digest, "chunks": chunks, "reused": True, "linked": True}
+        )
+    return attached, missing
+
+
+async def expand_artifact_refs(
+    db: AsyncSession, conversation_id: Optional[int], messages: List[Dict[str, str]]
+) -> None:
+    """就地替换消息中的文件引用（见模块说明）；只查询实际出现的引用。"""
+    last_seen: Dict[str, int] = {}
+    for i, message in enumerate(messages):
+        for digest in ARTIFACT_MARKER_RE.findall(message["content"]):
+            last_seen[digest] = i
+    if not last_seen:
+        return
+
+    links = (
+        await crud_file_artifacts.list_links(db, conversation_id, last_seen)
+        if conversation_id is not None
+        else {}
+    )
+    expand = [d for d, link in links.items() if not link.chunks]
+    texts = await crud_file_artifacts.load_parsed(db, expand)
+    limit = settings.FILE_CONTENT_MAX_CHARS
+    expanded: set[str] = set()
+
+    def render(digest: str, index: int) -> str:
+        link = links.get(digest)
+        if link is None:
+            return "[附件不可用]"
+        if link.chunks:
+            return f"[附件: {link.name}，内容按问题检索相关片段]"
+        text = texts.get(digest)
+        if text is None or last_seen[digest] != index or digest in expanded:
+            return f"[附件: {link.name}]"
+        expanded.add(digest)
+        if len(text) > limit:
+            text = text[:limit] + "\n...[内容过长，已截断]"
+        return f"=== 文件: {link.name} ===\n{text}"
+
+    for i, message in enumerate(messages):
+        if "[[artifact:" in message["content"]:
+            message["content"] = ARTIFACT_MARKER_RE.sub(
+                lambda m, i=i: render(m.group(1), i), message["content"]
+            )
@@ -0,0 +1,164 @@
+"""
+关键词检索服务
+基于 MatrixOne 全文索引（ngram 分词，中文按二元组切分）替代前导通配 LIKE，
+按相关度排序返回；索引缺失或关键词过短时退化为 LIKE 查询
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from src.db.session import AsyncSessionLocal
+from src.services.matrixone_client import get_matrixone_client
+
+logger = logging.getLogger(__name__)
+
+# ngram 默认 token 长度为 2，单字关键词无法命中全文索引
+MIN_FULLTEXT_TERM_LENGTH = 2
+
+SCORE_COLUMN = "relevance_score"
+
+
+@dataclass(frozen=True)
+class FulltextIndex:
+    """一张表上的全文索引定义，columns 顺序须与建索引时一致。"""
+
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+
+    @property
+    def column_list(self) -> str:
+        return ", ".join(f"`{c}`" for c in self.columns)
+
+
+BIDDING_FULLTEXT = FulltextIndex(
+    table="`xunyuan_agent`.`bidding_records_1`",
+    name="ftidx_bidding_item",
+    columns=("项目名称", "细化产品"),
+)
+
+PRICE_FULLTEXT = FulltextIndex(
+    table="`xunyuan_agent`.`product_price`",
+    name="ftidx_price_item",
+    columns=("物料短描述", "项目名称"),
+)
+
+# 会话历史检索：建在应用库上，随消息同步写入由数据库增量维护
+CONVERSATION_NAME_FULLTEXT = FulltextIndex(
+    table="`conversations`",
+    name="ftidx_conversations_name",
+    columns=("name",),
+)
+
+MESSAGE_CONTENT_FULLTEXT = FulltextIndex(
+    table="`messages`",
+    name="ftidx_messages_content",
+    columns=("content",),
+)
+
+ALL_FULLTEXT_INDEXES = (
+    BIDDING_FULLTEXT,
+    PRICE_FULLTEXT,
+    CONVERSATION_NAME_FULLTEXT,
+    MESSAGE_CONTENT_FULLTEXT,
+)
+
+
+def escape_term(term: str) -> str:
+    """转义 SQL 字符串字面量中的引号与反斜杠。"""
+    return term.replace("\\", "\\\\").replace("'", "''")
+
+
+def match_expr(index: FulltextIndex, term: str) -> str:
+    return (
+        f"MATCH({index.column_list}) "
+        f"AGAINST('{escape_term(term)}' IN NATURAL LANGUAGE MODE)"
+    )
+
+
+def like_expr(index: FulltextIndex, term: str) -> str:
+    escaped = escape_term(term)
+    return " OR ".join(f"`{c}` LIKE '%{escaped}%'" for c in index.columns)
+
+
+async def keyword_search(
+    index: FulltextIndex,
+    select_columns: str,
+    term: str,
+    limit: int,
+    where: Optional[str] = None,
+) -> Dict[str, Any]:
+    """按关键词检索并按相关度排序，返回 run_sql 结构（columns/rows/error）。
+
+    select_columns: SELECT 子句中的列表达式；where: 额外的过滤条件（AND 连接）。
+    """
+    client = get_matrixone_client()
+    term = term.strip()
+    extra = f" AND ({where})" if where else ""
+
+    if len(term) >= MIN_FULLTEXT_TERM_LENGTH:
+        match = match_expr(index, term)
+        sql = f"""
+SELECT
+    {select_columns},
+    {match} AS `{SCORE_COLUMN}`
+FROM {index.table}
+WHERE {match}{extra}
+ORDER BY `{SCORE_COLUMN}` DESC
+LIMIT {int(limit)};
+        """.strip()
+        result = await client.run_sql(sql)
+        if not result.get("error"):
+            return _strip_score(result)
+        logger.warning(f"全文检索失败，退化为 LIKE 查询: {index.name}, {result['error']}")
+
+    sql = f"""
+SELECT
+    {select_columns}
+FROM {index.table}
+WHERE ({like_expr(index, term)}){extra}
+LIMIT {int(limit)};
+    """.strip()
+    return await client.run_sql(sql)
+
+
+def _strip_score(result: Dict[str, Any]) -> Dict[str, Any]:
+    """相关度只用于排序，不透出到接口列中。"""
+    columns = [c for c in result.get("columns", []) if c != SCORE_COLUMN]
+    rows = [
+        {k: v for k, v in row.items() if k != SCORE_COLUMN}
+        for row in result.get("rows", [])
+    ]
+    return {**result, "columns": columns, "rows": rows}
+
+
+async def ensure_fulltext_indexes() -> None:
+    """检查并创建缺失的全文索引；建好后由数据库随导入自动维护。"""
+    client = get_matrixone_client()
+
+    for index in ALL_FULLTEXT_INDEXES:
+        existing = await client.run_sql(f"SHOW INDEX FROM {index.table};")
+        if existing.get("error"):
+            logger.warning(f"无法读取索引信息: {index.table}, {existing['error']}")
+            continue
+        names = {row.get("Key_name") for row in existing.get("rows", [])}
+        if index.name in names:
+            continue
+
+        logger.info(f"创建全文索引: {index.name} ON {index.table}({index.column_list})")
+        try:
+            # 实验特性开关是会话级的，需与建索引语句在同一连接上执行
+            async with AsyncSessionLocal() as session:
+                await session.execute(text("SET experimental_fulltext_index = 1"))
+                await session.execute(
+                    text(
+                        f"CREATE FULLTEXT INDEX `{index.name}` ON {index.table} "
+                        f"({index.column_list}) WITH PARSER ngram"
+                    )
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"全文索引创建失败: {index.name}, {e}")
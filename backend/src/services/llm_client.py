@@ -1,9 +1,13 @@
 import logging
-from typing import Dict, List
+import time
+from typing import Any, Dict, List
 
 from openai import AsyncOpenAI
 
 from src.config import settings
+from src.utils.logger import truncated
+from src.utils.metrics import LLM_DURATION, LLM_ERRORS, LLM_TOKENS_PER_SECOND
+from src.utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +18,7 @@ class LLMError(Exception):
 
 
 _client: AsyncOpenAI | None = None
+_embedding_client: AsyncOpenAI | None = None
 
 
 def _get_client() -> AsyncOpenAI:
@@ -27,6 +32,26 @@ def _get_client() -> AsyncOpenAI:
     return _client
 
 
+async def create_chat_completion(params: Dict[str, Any]) -> Any:
+    """非流式 Chat Completion，记录调用耗时与生成速度（按响应 usage 计算）。"""
+    model = params.get("model") or ""
+    started = time.perf_counter()
+    with span("llm.complete", **{"llm.model": model}) as current:
+        try:
+            resp = await _get_client().chat.completions.create(**params)
+        except Exception:
+            LLM_ERRORS.labels(model).inc()
+            raise
+        tokens = getattr(getattr(resp, "usage", None), "completion_tokens", None)
+        if current is not None and tokens:
+            current.set_attribute("llm.completion_tokens", tokens)
+    elapsed = time.perf_counter() - started
+    LLM_DURATION.labels(model, "complete").observe(elapsed)
+    if tokens and elapsed > 0:
+        LLM_TOKENS_PER_SECOND.labels(model).observe(tokens / elapsed)
+    return resp
+
+
 async def chat(
     messages: List[Dict[str, str]],
     model: str | None = None,
@@ -40,8 +65,6 @@ async def chat(
     if not settings.LLM_API_KEY:
         raise LLMError("LLM_API_KEY 未配置")
 
-    client = _get_client()
-
     resolved_model = model or settings.LLM_DEFAULT_MODEL
     if not resolved_model:
         raise LLMError("未配置模型名称，请设置 model 或 LLM_DEFAULT_MODEL")
@@ -55,15 +78,15 @@ async def chat(
         params["response_format"] = {"type": response_format}
 
     try:
-        logger.info(f"Calling LLM: model={resolved_model}, messages: {messages}")
-        resp = await client.chat.completions.create(**params)
+        logger.info("Calling LLM: model=%s, messages: %s", resolved_model, truncated(messages))
+        resp = await create_chat_completion(params)
     except Exception as exc:  # noqa: BLE001
         logger.error(f"LLM API call failed: {exc}", exc_info=True)
         raise LLMError(f"LLM 调用失败: {exc}") from exc
 
     try:
         content = resp.choices[0].message.content or ""
-        logger.info(f"LLM response received, content: {content}")
+        logger.info("LLM response received, content: %s", truncated(content))
     except (AttributeError, IndexError) as exc:  # pragma: no cover - 防御性
         logger.error(f"Failed to parse LLM response: {resp}", exc_info=True)
         raise LLMError(f"Unexpected LLM response: {resp}") from exc
@@ -71,3 +94,33 @@ async def chat(
     return content
 
 
+def _get_embedding_client() -> AsyncOpenAI:
+    """懒加载向量嵌入客户端；EMBEDDING_BASE_URL 未配置时与对话共用同一服务。"""
+    global _embedding_client
+    if not settings.EMBEDDING_BASE_URL and not settings.EMBEDDING_API_KEY:
+        return _get_client()
+    if _embedding_client is None:
+        _embedding_client = AsyncOpenAI(
+            api_key=settings.EMBEDDING_API_KEY or settings.LLM_API_KEY,
+            base_url=settings.EMBEDDING_BASE_URL or settings.LLM_BASE_URL,
+        )
+    return _embedding_client
+
+
+async def embed_texts(
+    texts: List[str], model: str | None = None
+) -> List[List[float]]:
+    """批量生成文本向量，返回顺序与输入一致。"""
+    if not texts:
+        return []
+
+    client = _get_embedding_client()
+    resolved_model = model or settings.EMBEDDING_MODEL
+    try:
+        resp = await client.embeddings.create(model=resolved_model, input=texts)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Embedding API call failed: {exc}", exc_info=True)
+        raise LLMError(f"向量生成失败: {exc}") from exc
+
+    data = sorted(resp.data, key=lambda d: d.index)
+    return [d.embedding for d in data]
@@ -0,0 +1,207 @@
+"""
+事件循环监控
+- 调度延迟：后台任务按固定间隔 sleep，实际唤醒时间与预期之差即事件循环延迟，写入直方图并定期计算分位数；
+- 阻塞检测：看门狗线程检查上述任务的心跳，超过 LOOP_BLOCK_THRESHOLD 未更新时，
+  抓取事件循环线程当前的调用栈写入日志（同一次阻塞只报告一次），阻塞结束后记录持续时间；
+- 开发模式（LOOP_MONITOR_DEV）：开启 asyncio 调试模式报告慢回调，并通过审计钩子报告
+  在事件循环线程上执行的同步文件 / 网络 / 子进程调用（每个调用位置只报告一次）。
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+from src.config import settings
+from src.utils.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG, EVENT_LOOP_LAG_QUANTILE
+
+logger = logging.getLogger(__name__)
+
+# 阻塞时记录的调用栈深度（最内层）
+STACK_LIMIT = 20
+# 计算分位数的样本窗口与刷新频率（按采样次数）
+LAG_WINDOW = 600
+QUANTILE_EVERY = 10
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 开发模式下视为同步阻塞调用的审计事件
+BLOCKING_AUDIT_EVENTS = frozenset(
+    {
+        "open",
+        "os.listdir",
+        "os.scandir",
+        "shutil.copyfile",
+        "shutil.rmtree",
+        "socket.connect",
+        "socket.getaddrinfo",
+        "subprocess.Popen",
+        "os.system",
+    }
+)
+
+
+class LoopMonitor:
+    """事件循环延迟采样与阻塞看门狗"""
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._samples: deque = deque(maxlen=LAG_WINDOW)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = 0.0
+        self.blocked = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        if settings.LOOP_MONITOR_DEV:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+            _install_blocking_io_hook(self._loop_thread)
+        logger.info(
+            f"事件循环监控已启动: interval={self.interval}s, threshold={self.threshold}s, "
+            f"dev={settings.LOOP_MONITOR_DEV}"
+        )
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self._samples),
+            "blocked": self.blocked,
+            **{f"p{int(q * 100)}": _quantile(sorted(self._samples), q) for q in QUANTILES},
+        }
+
+    async def _run(self) -> None:
+        ticks = 0
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            self._samples.append(lag)
+            ticks += 1
+            if ticks % QUANTILE_EVERY == 0:
+                ordered = sorted(self._samples)
+                for q in QUANTILES:
+                    EVENT_LOOP_LAG_QUANTILE.labels(str(q)).set(_quantile(ordered, q))
+
+    def _watch(self) -> None:
+        """看门狗线程：心跳停滞即说明事件循环线程正被某个回调占用。"""
+        reported: Optional[float] = None
+        while not self._stopping.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold:
+                if reported is not None:
+                    logger.warning(f"事件循环阻塞结束，持续约 {time.monotonic() - reported:.3f}s")
+                    reported = None
+                continue
+            if reported is not None:
+                continue
+            # 以心跳时间为起点估算阻塞持续时间
+            reported = heartbeat + self.interval
+            self.blocked += 1
+            EVENT_LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame is not None else "(无法获取)"
+            logger.warning(
+                f"事件循环阻塞超过 {stalled:.3f}s，事件循环线程当前调用栈:\n{stack}"
+            )
+
+
+def _quantile(ordered: Any, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_hook_installed = False
+_reported_sites: Set[str] = set()
+_in_hook = threading.local()
+
+
+def _install_blocking_io_hook(loop_thread: int) -> None:
+    """审计钩子无法移除，只在开发模式下安装一次。"""
+    global _hook_installed
+    if _hook_installed:
+        return
+    _hook_installed = True
+
+    def hook(event: str, args: Any) -> None:
+        if event not in BLOCKING_AUDIT_EVENTS or threading.get_ident() != loop_thread:
+            return
+        if getattr(_in_hook, "active", False):
+            return
+        try:
+            if asyncio.current_task() is None:
+                return
+        except RuntimeError:
+            return
+        _in_hook.active = True
+        try:
+            _report_blocking_io(event, args, sys._getframe(1))
+        finally:
+            _in_hook.active = False
+
+    sys.addaudithook(hook)
+
+
+def _report_blocking_io(event: str, args: Any, frame: Any) -> None:
+    # 模块导入与 linecache 读取源码（调试模式记录任务创建栈时会触发）不属于业务 I/O
+    site = None
+    f = frame
+    while f is not None:
+        filename = f.f_code.co_filename
+        if filename.startswith("<frozen importlib") or filename.endswith("linecache.py"):
+            return
+        # 定位到项目代码中最内层的调用位置，同一位置只报告一次
+        if site is None and "/src/" in filename:
+            site = f"{filename}:{f.f_lineno}"
+        f = f.f_back
+    site = site or f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    if site in _reported_sites:
+        return
+    _reported_sites.add(site)
+    detail = str(args[0])[:200] if args else ""
+    stack = traceback.format_stack(frame, limit=8)
+    logger.warning(f"事件循环线程上的同步 I/O: {event}({detail}) at {site}\n{''.join(stack)}")
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(
+            interval=settings.LOOP_MONITOR_INTERVAL,
+            threshold=settings.LOOP_BLOCK_THRESHOLD,
+        )
+    return _loop_monitor
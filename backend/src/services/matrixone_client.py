@@ -11,6 +11,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
 from src.db.session import AsyncSessionLocal
+from src.utils.logger import truncated
+from src.utils.tracing import mark_error, span
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +34,17 @@ class MatrixOneClient:
         Returns:
             查询结果，包含columns和rows
         """
-        logger.info(f"执行SQL查询: {statement[:500]}{'...' if len(statement) > 500 else ''}")
+        with span("moi.run_sql", **{"db.statement": statement[:500]}) as current:
+            result = await self._execute(statement)
+            if result.get("error"):
+                mark_error(current, result["error"])
+            elif current is not None:
+                current.set_attribute("db.rows", len(result.get("rows", [])))
+            return result
+
+    async def _execute(self, statement: str) -> Dict[str, Any]:
+        # 向量检索语句含完整向量字面量，只在输出时截断
+        logger.info("执行SQL查询: %s", truncated(statement, 500))
 
         try:
             async with AsyncSessionLocal() as session:
@@ -52,7 +64,7 @@ class MatrixOneClient:
                             row_dict[col] = row[idx]
                         rows.append(row_dict)
 
-                    logger.info(f"SQL查询成功，返回 {len(rows)} 行数据，列: {columns}")
+                    logger.info("SQL查询成功，返回 %d 行数据，列: %s", len(rows), truncated(columns))
                     return {
                         "columns": columns,
                         "rows": rows
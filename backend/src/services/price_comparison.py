@@ -0,0 +1,339 @@
+"""
+比价计算服务
+标的物的供应商报价与二采价格库（product_price）的历史单价对比，全部数值计算在进程内完成，
+大模型只负责解读结构化结果：
+
+- 历史参考价：每个标的物混合检索 product_price 前 PRICE_HISTORY_TOP_K 条，取与首条计量单位一致的记录，
+  平均单价取均值、最低价取最小值、最高价取最大值；
+- 报价按币种换算为人民币、按计量单位换算为每标准单位价格（与 table_extractor 一致）；
+- 所有标的物的报价拼成一组数组一次计算：与历史均价 / 最低价 / 最高价的差额、在历史区间中的位置、
+  异常标记（超出历史区间、偏离同一标的物报价中位数超过 PRICE_OUTLIER_RATIO 倍）与组内排名。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.config import settings
+from src.services.retrieval import PRICE_CORPUS, SearchHit, hybrid_search
+from src.utils.metrics import sql_label
+from src.utils.number_utils import parse_amount
+from src.utils.parse_file_utils import FX_RATES
+from src.utils.table_extractor import normalize_units
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SELECT = """
+  `物料短描述`,
+  `物料单位`,
+  `平均单价（元）`,
+  `最高价（元）`,
+  `最低价（元）`
+""".strip()
+
+# 排名时排在正常报价之后的标记：价格可疑或无法与其他报价比较
+SUSPECT_FLAGS = ("below_min", "low_vs_peers", "unit_mismatch", "unknown_currency")
+
+
+@dataclass(frozen=True, slots=True)
+class ComparisonItem:
+    name: str
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+    embedding: Optional[Sequence[float]] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    item: int
+    supplier: str
+    unit_price: float
+    unit: Optional[str] = None
+    currency: str = "CNY"
+
+
+@dataclass(frozen=True, slots=True)
+class PriceReference:
+    """标的物的历史参考价（人民币 / 标准单位）。"""
+
+    description: str
+    unit: str
+    average: float
+    minimum: float
+    maximum: float
+    samples: int
+
+
+# ---------------------------------------------------------------------------
+# 历史参考价
+# ---------------------------------------------------------------------------
+
+
+def _price(value: Any) -> float:
+    amount = parse_amount(value)
+    return float(amount) if amount is not None else np.nan
+
+
+def build_references(hits: Sequence[Sequence[SearchHit]]) -> List[Optional[PriceReference]]:
+    """每个标的物的检索命中聚合为历史参考价；没有命中或价格均无法解析时为 None。"""
+    records = [
+        {
+            "item": i,
+            "description": hit.row.get("物料短描述") or "",
+            "unit": hit.row.get("物料单位") or "",
+            "average": _price(hit.row.get("平均单价（元）")),
+            "maximum": _price(hit.row.get("最高价（元）")),
+            "minimum": _price(hit.row.get("最低价（元）")),
+        }
+        for i, item_hits in enumerate(hits)
+        for hit in item_hits
+    ]
+    references: List[Optional[PriceReference]] = [None] * len(hits)
+    if not records:
+        return references
+    frame = pd.DataFrame(records)
+    unit, factor = normalize_units(frame["unit"])
+    frame["unit"] = unit
+    for column in ("average", "maximum", "minimum"):
+        frame[column] = frame[column] / factor
+    # 只取与首条命中计量单位一致的记录，避免“台”与“套”的价格混在一起
+    first_unit = frame.groupby("item")["unit"].transform("first")
+    frame = frame[(frame["unit"] == first_unit) & frame["average"].notna()]
+    grouped = frame.groupby("item").agg(
+        description=("description", "first"),
+        unit=("unit", "first"),
+        average=("average", "mean"),
+        minimum=("minimum", "min"),
+        maximum=("maximum", "max"),
+        samples=("average", "size"),
+    )
+    for row in grouped.itertuples():
+        references[row.Index] = PriceReference(
+            description=row.description,
+            unit=row.unit,
+            average=row.average,
+            # 缺少最低 / 最高价时以均价代替
+            minimum=row.minimum if not np.isnan(row.minimum) else row.average,
+            maximum=row.maximum if not np.isnan(row.maximum) else row.average,
+            samples=int(row.samples),
+        )
+    return references
+
+
+async def fetch_references(items: Sequence[ComparisonItem]) -> List[Optional[PriceReference]]:
+    """并发检索每个标的物的历史价格（并发数由 MOI_BATCH_CONCURRENCY 限制），单个标的物检索失败时视为没有历史价格。"""
+    semaphore = asyncio.Semaphore(settings.MOI_BATCH_CONCURRENCY)
+
+    async def search(item: ComparisonItem) -> List[SearchHit]:
+        async with semaphore:
+            with sql_label("moi.price_comparison"):
+                try:
+                    return await hybrid_search(
+                        PRICE_CORPUS,
+                        item.name,
+                        embedding=item.embedding,
+                        top_k=settings.PRICE_HISTORY_TOP_K,
+                        select=HISTORY_SELECT,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning(f"比价历史价格检索失败: item='{item.name}', {exc}")
+                    return []
+
+    hits = await asyncio.gather(*(search(item) for item in items))
+    return build_references(hits)
+
+
+# ---------------------------------------------------------------------------
+# 向量化比价
+# ---------------------------------------------------------------------------
+
+
+def compare_quotes(
+    items: Sequence[ComparisonItem],
+    quotes: Sequence[Quote],
+    references: Sequence[Optional[PriceReference]],
+    *,
+    outlier_ratio: float,
+    rates: Mapping[str, float] = FX_RATES,
+) -> pd.DataFrame:
+    """计算所有报价的比价指标，返回按 (标的物, 排名) 排序的表，每行一条报价。
+
+    列：item、supplier、unit_price（原始报价）、currency、unit（标准单位）、unit_price_cny（人民币 / 标准单位）、
+    delta_avg / delta_avg_pct / delta_min / delta_max、position（在历史最低价到最高价之间的位置，0~1 之外即超出区间）、
+    peer_ratio（与同一标的物报价中位数之比）、total（报价 × 数量）、flags、suspect（可疑报价）、rank（1 为最优）。
+    """
+    n = len(items)
+    code = np.fromiter((q.item for q in quotes), dtype=np.int64, count=len(quotes))
+    raw_price = np.fromiter((q.unit_price for q in quotes), dtype=np.float64, count=len(quotes))
+    currency = np.array([(q.currency or "CNY").upper() for q in quotes], dtype=object)
+    rate = np.array([rates.get(c, np.nan) for c in currency], dtype=np.float64)
+
+    # 报价单位缺省时沿用标的物单位，再缺省时沿用历史参考价单位
+    ref_unit = np.array([r.unit if r is not None else "" for r in references], dtype=object)
+    item_unit = np.array([item.unit or "" for item in items], dtype=object)
+    quote_unit = np.array([q.unit or "" for q in quotes], dtype=object)
+    quote_unit = np.where(quote_unit != "", quote_unit, item_unit[code])
+    unit, factor = normalize_units(pd.Series(quote_unit, dtype=object))
+    unit = np.where(unit != "", unit, ref_unit[code])
+    price = raw_price * rate / factor
+
+    def ref(attr: str) -> np.ndarray:
+        values = np.array(
+            [getattr(r, attr) if r is not None else np.nan for r in references], dtype=np.float64
+        )
+        return values[code]
+
+    average, minimum, maximum = ref("average"), ref("minimum"), ref("maximum")
+    has_ref = ~np.isnan(average)
+    unit_mismatch = has_ref & (ref_unit[code] != "") & (unit != ref_unit[code])
+    comparable = has_ref & ~unit_mismatch
+    average = np.where(comparable, average, np.nan)
+    minimum = np.where(comparable, minimum, np.nan)
+    maximum = np.where(comparable, maximum, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_avg = price - average
+        delta_avg_pct = delta_avg / average * 100
+        span = maximum - minimum
+        position = np.where(span > 0, (price - minimum) / span, np.where(price > maximum, 1.0, 0.0))
+        position = np.where(comparable & ~np.isnan(price), position, np.nan)
+
+        # 同一标的物报价的中位数（分组向量化）
+        peer_median = pd.Series(price).groupby(code).transform("median").to_numpy()
+        peers = np.bincount(code, minlength=n)[code]
+        # 报价少于 3 条时中位数没有代表性，不做同组比较
+        peer_ratio = np.where(peers >= 3, price / peer_median, np.nan)
+
+    item_quantity = np.array(
+        [item.quantity if item.quantity is not None else np.nan for item in items], dtype=np.float64
+    )
+    _, item_factor = normalize_units(pd.Series(item_unit, dtype=object))
+    # 数量按标的物单位换算为标准单位后与每标准单位价格相乘
+    total = price * (item_quantity * item_factor)[code]
+
+    flag_masks = {
+        "no_history": ~has_ref,
+        "unit_mismatch": unit_mismatch,
+        "unknown_currency": np.isnan(rate),
+        "above_max": price > maximum,
+        "below_min": price < minimum,
+        "high_vs_peers": peer_ratio > outlier_ratio,
+        "low_vs_peers": peer_ratio < 1 / outlier_ratio,
+    }
+    suspect = np.zeros(len(quotes), dtype=bool)
+    for name in SUSPECT_FLAGS:
+        suspect |= flag_masks[name]
+
+    # 组内排名：可疑报价排在正常报价之后，其余按人民币单价升序
+    order = np.lexsort((np.nan_to_num(price, nan=np.inf), suspect, code))
+    sorted_code = code[order]
+    group_start = np.searchsorted(sorted_code, sorted_code, side="left")
+    rank = np.empty(len(quotes), dtype=np.int64)
+    rank[order] = np.arange(len(quotes)) - group_start + 1
+
+    names = np.array(list(flag_masks), dtype=object)
+    masks = np.column_stack(list(flag_masks.values()))
+    flags = [names[row].tolist() for row in masks]
+
+    frame = pd.DataFrame(
+        {
+            "item": code,
+            "supplier": [q.supplier for q in quotes],
+            "unit_price": raw_price,
+            "currency": currency,
+            "unit": unit,
+            "unit_price_cny": price,
+            "delta_avg": delta_avg,
+            "delta_avg_pct": delta_avg_pct,
+            "delta_min": price - minimum,
+            "delta_max": price - maximum,
+            "position": position,
+            "peer_ratio": peer_ratio,
+            "total": total,
+            "flags": flags,
+            "suspect": suspect,
+            "rank": rank,
+        }
+    )
+    return frame.iloc[order].reset_index(drop=True)
+
+
+def summarize_items(n: int, frame: pd.DataFrame) -> pd.DataFrame:
+    """每个标的物一行：报价数、可疑报价数、最优供应商与单价、正常报价的价差百分比（(最高 - 最低) / 最低）。"""
+    code = frame["item"].to_numpy()
+    summary = pd.DataFrame(
+        {
+            "quotes": np.bincount(code, minlength=n),
+            "suspect": np.bincount(code, weights=frame["suspect"], minlength=n).astype(np.int64),
+        }
+    )
+    normal = frame[~frame["suspect"] & frame["unit_price_cny"].notna()]
+    grouped = normal.groupby("item")
+    # frame 已按排名排序，每组第一条即最优报价
+    best = grouped.first()
+    low, high = grouped["unit_price_cny"].min(), grouped["unit_price_cny"].max()
+    summary["best_supplier"] = best["supplier"]
+    summary["best_unit_price"] = best["unit_price_cny"]
+    summary["spread_pct"] = ((high - low) / low * 100).where(grouped.size() > 1)
+    return summary
+
+
+def _cell(values: pd.Series, fmt: str) -> pd.Series:
+    return values.map(lambda v: "" if pd.isna(v) else format(v, fmt))
+
+
+def format_comparison(
+    items: Sequence[ComparisonItem],
+    references: Sequence[Optional[PriceReference]],
+    frame: pd.DataFrame,
+    summary: pd.DataFrame,
+    max_quotes: int = 10,
+) -> str:
+    """比价结果的 markdown 文本，供大模型解读：标的物汇总表与每个标的物排名前 max_quotes 的报价表。"""
+    labels = {
+        "no_history": "无历史价", "unit_mismatch": "单位不一致", "unknown_currency": "币种未知",
+        "above_max": "高于历史最高价", "below_min": "低于历史最低价",
+        "high_vs_peers": "明显高于其他报价", "low_vs_peers": "明显低于其他报价",
+    }
+    names = pd.Series([item.name for item in items])
+
+    def ref(attr: str) -> pd.Series:
+        return pd.Series([getattr(r, attr) if r is not None else None for r in references])
+
+    overview = pd.DataFrame(
+        {
+            "标的物": names,
+            "历史参考": ref("description").fillna("（无）"),
+            "单位": ref("unit").fillna(""),
+            "历史均价": _cell(ref("average"), ".2f"),
+            "历史最低": _cell(ref("minimum"), ".2f"),
+            "历史最高": _cell(ref("maximum"), ".2f"),
+            "报价数": summary["quotes"],
+            "可疑报价": summary["suspect"],
+            "最优供应商": summary["best_supplier"].fillna(""),
+            "最优单价": _cell(summary["best_unit_price"], ".2f"),
+            "价差": _cell(summary["spread_pct"], ".1f").map(lambda v: f"{v}%" if v else ""),
+        }
+    )
+    text = "【比价汇总】单价为人民币 / 标准单位\n" + overview.to_markdown(index=False)
+
+    shown = frame[frame["rank"] <= max_quotes]
+    if not shown.empty:
+        quotes = pd.DataFrame(
+            {
+                "标的物": names.to_numpy()[shown["item"].to_numpy()],
+                "排名": shown["rank"].to_numpy(),
+                "供应商": shown["supplier"].to_numpy(),
+                "单价(元)": _cell(shown["unit_price_cny"], ".2f").to_numpy(),
+                "较均价": _cell(shown["delta_avg_pct"], "+.1f").map(lambda v: f"{v}%" if v else "").to_numpy(),
+                "标记": shown["flags"].map(lambda f: "、".join(labels[x] for x in f)).to_numpy(),
+            }
+        )
+        text += "\n\n【报价明细】\n" + quotes.to_markdown(index=False)
+        if len(shown) < len(frame):
+            text += f"\n... 共 {len(frame)} 条报价，每个标的物仅列出排名前 {max_quotes} 条"
+    return text
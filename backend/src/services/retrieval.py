@@ -0,0 +1,213 @@
+"""
+混合检索服务
+关键词（全文索引）与向量（l2_distance）检索并发执行，
+以倒数排名融合（Reciprocal Rank Fusion）合并候选，按主键去重后返回带分数的结果
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from src.services.keyword_search import (
+    BIDDING_FULLTEXT,
+    PRICE_FULLTEXT,
+    FulltextIndex,
+    escape_term,
+    keyword_search,
+)
+from src.services.matrixone_client import get_matrixone_client
+from src.utils.metrics import sql_label
+
+logger = logging.getLogger(__name__)
+
+# RRF 平滑常数，取论文推荐值 60：弱化单路排名靠前带来的过大权重
+RRF_K = 60
+
+ID_COLUMN = "id"
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """可检索的数据表：列投影、全文索引、向量列与可用过滤条件。"""
+
+    name: str
+    table: str
+    select: str
+    # select 投影后的列名，按顺序对应接口返回的 columns
+    columns: Tuple[str, ...]
+    fulltext: FulltextIndex
+    vector_columns: Tuple[str, ...]
+    # 过滤参数名 -> 列名
+    filters: Mapping[str, str]
+
+
+BIDDING_CORPUS = Corpus(
+    name="bidding",
+    table="`xunyuan_agent`.`bidding_records_1`",
+    select="""
+  `项目名称`,
+  `单位` AS `采购单位`,
+  `细化产品`,
+  `供应商名称`,
+  `中标金额_万元` AS `中标金额（万元）`,
+  `参与状态`
+    """.strip(),
+    columns=("项目名称", "采购单位", "细化产品", "供应商名称", "中标金额（万元）", "参与状态"),
+    fulltext=BIDDING_FULLTEXT,
+    vector_columns=("project_name_embedding", "product_embedding"),
+    filters={"unit": "单位", "status": "参与状态", "supplier": "供应商名称"},
+)
+
+PRICE_CORPUS = Corpus(
+    name="price",
+    table="`xunyuan_agent`.`product_price`",
+    select="""
+  `项目名称`,
+  `物料短描述`,
+  `物料单位`,
+  `平均单价（元）`,
+  `最高价（元）`,
+  `最低价（元）`
+    """.strip(),
+    columns=("项目名称", "物料短描述", "物料单位", "平均单价（元）", "最高价（元）", "最低价（元）"),
+    fulltext=PRICE_FULLTEXT,
+    vector_columns=("project_name_embedding", "product_embedding"),
+    filters={"unit": "单位", "material_unit": "物料单位"},
+)
+
+CORPORA: Dict[str, Corpus] = {c.name: c for c in (BIDDING_CORPUS, PRICE_CORPUS)}
+
+
+@dataclass
+class SearchHit:
+    """融合后的单条命中：主键、RRF 分数、命中来源及行数据（不含主键列）。"""
+
+    id: Any
+    score: float
+    sources: List[str] = field(default_factory=list)
+    row: Dict[str, Any] = field(default_factory=dict)
+
+
+def reciprocal_rank_fusion(
+    rankings: Mapping[str, Sequence[Dict[str, Any]]], k: int = RRF_K
+) -> List[SearchHit]:
+    """按 score(d) = Σ 1 / (k + rank_i(d)) 融合多路排序结果，rank 从 1 开始。"""
+    hits: Dict[Any, SearchHit] = {}
+    for source, rows in rankings.items():
+        for rank, row in enumerate(rows, start=1):
+            doc_id = row.get(ID_COLUMN)
+            if doc_id is None:
+                continue
+            hit = hits.get(doc_id)
+            if hit is None:
+                hit = hits[doc_id] = SearchHit(
+                    id=doc_id,
+                    score=0.0,
+                    row={k_: v for k_, v in row.items() if k_ != ID_COLUMN},
+                )
+            hit.score += 1.0 / (k + rank)
+            hit.sources.append(source)
+    return sorted(hits.values(), key=lambda h: h.score, reverse=True)
+
+
+def _filter_sql(corpus: Corpus, filters: Optional[Mapping[str, Optional[str]]]) -> Optional[str]:
+    if not filters:
+        return None
+    clauses = []
+    for key, value in filters.items():
+        if value is None or value == "":
+            continue
+        column = corpus.filters.get(key)
+        if column is None:
+            raise ValueError(f"不支持的过滤条件: {key}")
+        clauses.append(f"`{column}` = '{escape_term(str(value))}'")
+    return " AND ".join(clauses) or None
+
+
+async def _vector_search(
+    corpus: Corpus,
+    select: str,
+    column: str,
+    vector_str: str,
+    limit: int,
+    where: Optional[str],
+) -> Dict[str, Any]:
+    extra = f" AND ({where})" if where else ""
+    sql = f"""
+SELECT
+    {select},
+    `{ID_COLUMN}`
+FROM {corpus.table}
+WHERE `{column}` IS NOT NULL{extra}
+ORDER BY l2_distance(`{column}`, '{vector_str}') ASC
+LIMIT {int(limit)};
+    """.strip()
+    return await get_matrixone_client().run_sql(sql)
+
+
+async def _labeled(label: str, query: Any) -> Any:
+    # 各路检索在独立任务中执行，标签只作用于本路的 SQL 指标
+    with sql_label(label):
+        return await query
+
+
+async def hybrid_search(
+    corpus: Corpus,
+    query: str,
+    *,
+    embedding: Optional[Sequence[float]] = None,
+    filters: Optional[Mapping[str, Optional[str]]] = None,
+    top_k: int = 20,
+    candidate_k: int = 50,
+    select: Optional[str] = None,
+    use_keyword: bool = True,
+    use_vector: bool = True,
+) -> List[SearchHit]:
+    """关键词 + 向量并发检索，RRF 融合后返回前 top_k 条。
+
+    select 可覆盖默认列投影（例如只取聚合所需的列）；未提供 embedding 时仅走关键词检索。
+    """
+    select = select or corpus.select
+    where = _filter_sql(corpus, filters)
+
+    tasks: Dict[str, Any] = {}
+    if use_keyword and query.strip():
+        tasks["keyword"] = _labeled(
+            f"{corpus.name}.keyword",
+            keyword_search(
+                corpus.fulltext,
+                f"{select},\n    `{ID_COLUMN}`",
+                query,
+                limit=candidate_k,
+                where=where,
+            ),
+        )
+    if use_vector and embedding:
+        vector_str = "[" + ",".join(map(str, embedding)) + "]"
+        for column in corpus.vector_columns:
+            tasks[f"vector:{column}"] = _labeled(
+                f"{corpus.name}.vector.{column}",
+                _vector_search(corpus, select, column, vector_str, candidate_k, where),
+            )
+
+    if not tasks:
+        return []
+
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    rankings: Dict[str, List[Dict[str, Any]]] = {}
+    for source, result in zip(tasks.keys(), results):
+        if isinstance(result, Exception):
+            logger.warning(f"{corpus.name} {source} 检索失败: {result}")
+            continue
+        if result.get("error"):
+            logger.warning(f"{corpus.name} {source} 检索失败: {result['error']}")
+            continue
+        rankings[source] = result.get("rows", [])
+
+    hits = reciprocal_rank_fusion(rankings)[:top_k]
+    logger.info(
+        f"混合检索完成: corpus={corpus.name}, "
+        f"候选={[(s, len(r)) for s, r in rankings.items()]}, 返回={len(hits)}"
+    )
+    return hits
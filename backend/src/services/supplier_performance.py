@@ -0,0 +1,242 @@
+"""
+供应商历史表现物化服务
+按 (供应商名称, 细化产品) 预聚合 bidding_records_1 的投标/中标统计，
+以自增 id 为水位线增量刷新，接口查询时直接读取内存聚合而非每次 GROUP BY
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import settings
+from src.services.keyword_search import escape_term
+from src.services.matrixone_client import get_matrixone_client
+from src.utils.number_utils import parse_amount
+
+logger = logging.getLogger(__name__)
+
+BIDDING_TABLE = "`xunyuan_agent`.`bidding_records_1`"
+
+# 刷新失败后的重试间隔（秒），避免数据库不可用时每个请求都重试
+RETRY_SECONDS = 10
+
+# 金额字符串转换只在聚合时做一次，请求路径不再 CAST
+_AGGREGATE_SELECT = f"""
+SELECT
+    `供应商名称` AS supplier,
+    `细化产品` AS product,
+    COUNT(*) AS bid_count,
+    SUM(CASE WHEN `参与状态` = '中标' THEN 1 ELSE 0 END) AS win_count,
+    SUM(CASE WHEN `参与状态` = '中标'
+        THEN CAST(REPLACE(`中标金额_万元`, ',', '') AS DECIMAL(18,2)) ELSE 0 END) AS win_amount
+FROM {BIDDING_TABLE}
+""".strip()
+
+# 对外返回的列名与原 GROUP BY 查询保持一致，前端无需改动
+PERFORMANCE_COLUMNS = [
+    "供应商名称",
+    "投标次数",
+    "中标次数",
+    "中标率(%)",
+    "合计中标金额（万元）",
+]
+
+
+@dataclass(slots=True)
+class SupplierProductStats:
+    """单个 (供应商, 细化产品) 的累计统计，金额以 Decimal 存储。"""
+
+    bid_count: int = 0
+    win_count: int = 0
+    win_amount: Decimal = Decimal("0")
+
+
+class SupplierPerformanceStore:
+    """供应商历史表现的内存物化视图"""
+
+    def __init__(self) -> None:
+        self._stats: Dict[Tuple[str, str], SupplierProductStats] = {}
+        self._watermark = 0
+        # 最近一次成功刷新与失败的时间：成功后按刷新间隔节流，失败后按 RETRY_SECONDS 重试
+        self._checked_at = 0.0
+        self._failed_at = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def refresh(self) -> int:
+        """增量刷新：只聚合水位线之后新导入的记录，返回本次处理的记录数。"""
+        async with self._lock:
+            return await self._refresh(self._stats, self._watermark)
+
+    async def rebuild(self) -> int:
+        """全量重建，用于历史记录被修改或删除之后；新聚合完成后整体替换，期间查询仍读旧数据。"""
+        async with self._lock:
+            return await self._refresh({}, 0)
+
+    async def _refresh(
+        self, stats: Dict[Tuple[str, str], SupplierProductStats], watermark: int
+    ) -> int:
+        """聚合 watermark 之后的记录并累加到 stats，成功后才替换当前聚合与水位线。"""
+        client = get_matrixone_client()
+        max_result = await client.run_sql(
+            f"SELECT MAX(`id`) AS `max_id`, COUNT(*) AS `total` FROM {BIDDING_TABLE} "
+            f"WHERE `id` > {watermark};"
+        )
+        if max_result.get("error") or not max_result.get("rows"):
+            logger.warning(f"供应商表现刷新失败: {max_result.get('error')}")
+            self._failed_at = time.monotonic()
+            return 0
+
+        max_id = max_result["rows"][0].get("max_id")
+        if max_id is None:
+            # 没有新记录（包括空表）也算加载完成
+            self._stats = stats
+            self._watermark = watermark
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            return 0
+        max_id = int(max_id)
+        new_rows = int(max_result["rows"][0].get("total") or 0)
+
+        agg_result = await client.run_sql(
+            f"{_AGGREGATE_SELECT}\nWHERE `id` > {watermark} AND `id` <= {max_id}\n"
+            f"GROUP BY `供应商名称`, `细化产品`;"
+        )
+        if agg_result.get("error"):
+            logger.warning(f"供应商表现聚合失败: {agg_result['error']}")
+            self._failed_at = time.monotonic()
+            return 0
+
+        _accumulate(stats, agg_result.get("rows", []))
+        self._stats = stats
+        self._watermark = max_id
+        self._loaded = True
+        self._checked_at = time.monotonic()
+        logger.info(
+            f"供应商表现增量刷新完成: 新增记录 {new_rows} 条，"
+            f"聚合键 {len(stats)} 个，水位线 id={max_id}"
+        )
+        return new_rows
+
+    def _due(self) -> bool:
+        now = time.monotonic()
+        if now - self._failed_at < RETRY_SECONDS:
+            return False
+        return not self._loaded or now - self._checked_at >= settings.SUPPLIER_STATS_REFRESH_SECONDS
+
+    async def ensure_fresh(self) -> None:
+        """超过刷新间隔时触发一次增量刷新（仅比较 MAX(id)，开销很小）。
+
+        未加载时等待进行中的加载（如启动预热）完成，而不是直接读取空聚合。
+        """
+        if not self._due():
+            return
+        async with self._lock:
+            # 等锁期间其他请求可能已完成刷新
+            if self._due():
+                await self._refresh(self._stats, self._watermark)
+
+    async def query(
+        self, keys: Iterable[Tuple[str, Optional[str]]], limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """返回候选的中标供应商排行；物化结构尚未加载（刷新失败）时按候选实时 GROUP BY。"""
+        if self._loaded:
+            return self.lookup(keys, limit)
+        return await self._lookup_live(keys, limit)
+
+    async def _lookup_live(
+        self, keys: Iterable[Tuple[str, Optional[str]]], limit: int
+    ) -> List[Dict[str, Any]]:
+        pairs = {(supplier, product or "") for supplier, product in keys}
+        if not pairs:
+            return []
+        conditions = " OR ".join(
+            f"(`供应商名称` = '{escape_term(supplier)}' "
+            f"AND IFNULL(`细化产品`, '') = '{escape_term(product)}')"
+            for supplier, product in sorted(pairs)
+        )
+        result = await get_matrixone_client().run_sql(
+            f"{_AGGREGATE_SELECT}\nWHERE {conditions}\nGROUP BY `供应商名称`, `细化产品`;"
+        )
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        stats: Dict[Tuple[str, str], SupplierProductStats] = {}
+        _accumulate(stats, result.get("rows", []))
+        return _rank(stats, pairs, limit)
+
+    def lookup(
+        self, keys: Iterable[Tuple[str, Optional[str]]], limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """按候选 (供应商, 细化产品) 汇总内存中的统计，返回中标供应商排行。"""
+        return _rank(self._stats, {(s, p or "") for s, p in keys}, limit)
+
+
+def _accumulate(
+    stats: Dict[Tuple[str, str], SupplierProductStats], rows: Iterable[Dict[str, Any]]
+) -> None:
+    """将 GROUP BY (供应商名称, 细化产品) 的结果行累加到 stats。"""
+    for row in rows:
+        if not row.get("supplier"):
+            continue
+        key = (row["supplier"], row.get("product") or "")
+        entry = stats.get(key)
+        if entry is None:
+            entry = stats[key] = SupplierProductStats()
+        entry.bid_count += int(row.get("bid_count") or 0)
+        entry.win_count += int(row.get("win_count") or 0)
+        entry.win_amount += parse_amount(row.get("win_amount")) or Decimal("0")
+
+
+def _rank(
+    stats_by_key: Dict[Tuple[str, str], SupplierProductStats],
+    keys: Iterable[Tuple[str, str]],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """按供应商汇总候选键的统计，按中标次数、中标金额倒序取前 limit 个。"""
+    per_supplier: Dict[str, SupplierProductStats] = {}
+    for supplier, product in keys:
+        stats = stats_by_key.get((supplier, product))
+        if stats is None:
+            continue
+        total = per_supplier.get(supplier)
+        if total is None:
+            total = per_supplier[supplier] = SupplierProductStats()
+        total.bid_count += stats.bid_count
+        total.win_count += stats.win_count
+        total.win_amount += stats.win_amount
+
+    ranked = sorted(
+        ((s, t) for s, t in per_supplier.items() if t.win_count > 0),
+        key=lambda item: (item[1].win_count, item[1].win_amount),
+        reverse=True,
+    )[:limit]
+
+    return [
+        {
+            "供应商名称": supplier,
+            "投标次数": total.bid_count,
+            "中标次数": total.win_count,
+            "中标率(%)": round(total.win_count * 100.0 / total.bid_count, 2),
+            "合计中标金额（万元）": float(total.win_amount.quantize(Decimal("0.01"))),
+        }
+        for supplier, total in ranked
+    ]
+
+
+# 全局实例
+_store: Optional[SupplierPerformanceStore] = None
+
+
+def get_supplier_performance_store() -> SupplierPerformanceStore:
+    """获取供应商表现物化实例（单例模式）"""
+    global _store
+    if _store is None:
+        _store = SupplierPerformanceStore()
+    return _store
@@ -0,0 +1,470 @@
+"""
+消息异步落库（write-behind）服务
+同步接口只需把消息追加到本地 WAL 并 fsync 即可返回，后台任务按批次合并提交到数据库：
+
+- WAL：按段滚动的 JSONL 文件，多个并发请求的追加合并为一次 fsync；
+- 组提交：按序取出一批记录，会话 upsert + 消息多行 INSERT 在同一事务内完成；
+- 顺序：记录按序号严格先进先出，同一会话的消息入库顺序与确认顺序一致；
+- 重试：失败整批指数退避重试，超过次数后按会话拆分，仍失败的会话写入死信文件；
+- 恢复：启动时按检查点重放未提交的记录；读取接口通过 pending_messages 合并未落库的消息。
+
+提交成功与检查点落盘之间崩溃时，重放可能重复写入该批消息（至少一次语义）。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Any, Deque, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.crud.crud_conversations import ConversationUnavailable, crud_conversations
+from src.crud.crud_messages import crud_messages
+from src.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 单个 WAL 段的大小上限，超过后滚动新段；已全部提交的旧段会被删除
+WAL_SEGMENT_BYTES = 16 * 1024 * 1024
+
+CHECKPOINT_FILE = "checkpoint.json"
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+MAX_RETRY_DELAY = 30.0
+
+
+@dataclass
+class PendingWrite:
+    """一次同步请求：会话元数据 + 待写入的消息（按时间顺序）。"""
+
+    seq: int
+    conversation_id: int
+    name: str
+    created_at: datetime
+    updated_at: datetime
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "seq": self.seq,
+                "conversation_id": self.conversation_id,
+                "name": self.name,
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat(),
+                "messages": [
+                    {**m, "created_at": m["created_at"].isoformat()}
+                    for m in self.messages
+                ],
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PendingWrite":
+        return cls(
+            seq=data["seq"],
+            conversation_id=data["conversation_id"],
+            name=data["name"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+            messages=[
+                {**m, "created_at": datetime.fromisoformat(m["created_at"])}
+                for m in data["messages"]
+            ],
+        )
+
+
+@dataclass(frozen=True)
+class PendingMessage:
+    """尚未落库的消息，字段与消息列表投影行一致，供读取接口合并展示。"""
+
+    id: str
+    role: str
+    content: str
+    created_at: datetime
+    deep_thinking: Optional[str]
+    model: Optional[str]
+
+
+class WriteBehindQueue:
+    """基于本地 WAL 的消息写入队列"""
+
+    def __init__(
+        self,
+        wal_dir: str,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        max_retries: int = 5,
+    ) -> None:
+        self.wal_dir = wal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._segment_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """内存状态均可由 WAL 重建，启动时清空后重放。"""
+        self._queue: Deque[PendingWrite] = deque()
+        self._by_conversation: Dict[int, Deque[PendingWrite]] = {}
+        self._next_seq = 1
+        self._committed_seq = 0
+
+        # WAL 段：(路径, 段内最大序号)，最后一个为当前写入段
+        self._segments: List[Tuple[str, int]] = []
+        self._wal: Optional[IO[str]] = None
+
+        self._append_buffer: List[Tuple[str, Optional[PendingWrite], asyncio.Future]] = []
+        self._appending = False
+        # 事件与锁在 start 中随事件循环创建
+        self._wakeup: Optional[asyncio.Event] = None
+        self._commit_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """重放未提交的 WAL 记录并启动后台提交任务。"""
+        os.makedirs(self.wal_dir, exist_ok=True)
+        self._reset()
+        self._wakeup = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+        replayed = await asyncio.to_thread(self._replay)
+        for record in replayed:
+            self._enqueue(record)
+        if replayed:
+            logger.info(f"write-behind 重放 {len(replayed)} 条未提交记录")
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """停止后台任务前尽量提交剩余记录；未提交的部分留在 WAL 中下次重放。"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            try:
+                await asyncio.wait_for(self._flusher, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"write-behind 停止超时，剩余 {len(self._queue)} 条待下次重放")
+                self._flusher.cancel()
+        with self._segment_lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    # ------------------------------------------------------------------
+    # 写入与读取
+    # ------------------------------------------------------------------
+
+    async def submit(
+        self,
+        *,
+        conversation_id: int,
+        name: str,
+        created_at: datetime,
+        updated_at: datetime,
+        messages: List[Dict[str, Any]],
+    ) -> None:
+        """追加一条同步记录，WAL fsync 完成后返回。"""
+        record = PendingWrite(
+            seq=self._take_seq(),
+            conversation_id=conversation_id,
+            name=name,
+            created_at=created_at,
+            updated_at=updated_at,
+            messages=messages,
+        )
+        await self._append(record.to_json(), record)
+
+    async def discard(self, conversation_id: int) -> None:
+        """丢弃某会话的未提交记录（会话被删除时调用），并在 WAL 中留下删除标记。"""
+        marker = json.dumps({"seq": self._take_seq(), "discard": conversation_id})
+        await self._append(marker, None)
+        async with self._commit_lock:
+            self._drop_conversation(conversation_id)
+
+    def has_pending(self, conversation_id: int) -> bool:
+        return conversation_id in self._by_conversation
+
+    def pending_messages(self, conversation_id: int) -> List[PendingMessage]:
+        """该会话已确认但尚未落库的消息，按写入顺序排列。"""
+        out: List[PendingMessage] = []
+        for record in self._by_conversation.get(conversation_id, ()):
+            for i, m in enumerate(record.messages):
+                out.append(
+                    PendingMessage(
+                        id=f"pending-{record.seq}-{i}",
+                        role=m["role"],
+                        content=m["content"],
+                        created_at=m["created_at"],
+                        deep_thinking=m.get("deep_thinking"),
+                        model=m.get("model"),
+                    )
+                )
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_records": len(self._queue),
+            "pending_conversations": len(self._by_conversation),
+            "committed_seq": self._committed_seq,
+            "wal_segments": len(self._segments),
+        }
+
+    def _take_seq(self) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+
+    def _enqueue(self, record: PendingWrite) -> None:
+        self._queue.append(record)
+        self._by_conversation.setdefault(record.conversation_id, deque()).append(record)
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _drop_conversation(self, conversation_id: int) -> None:
+        dropped = self._by_conversation.pop(conversation_id, None)
+        if dropped:
+            self._queue = deque(r for r in self._queue if r.conversation_id != conversation_id)
+
+    # ------------------------------------------------------------------
+    # WAL
+    # ------------------------------------------------------------------
+
+    async def _append(self, line: str, record: Optional[PendingWrite]) -> None:
+        """组提交追加：并发请求的行合并为一次 write + fsync。"""
+        future = asyncio.get_running_loop().create_future()
+        self._append_buffer.append((line, record, future))
+        if not self._appending:
+            self._appending = True
+            asyncio.create_task(self._drain_appends())
+        await future
+
+    async def _drain_appends(self) -> None:
+        try:
+            while self._append_buffer:
+                batch, self._append_buffer = self._append_buffer, []
+                try:
+                    await asyncio.to_thread(self._write_lines, [line for line, _, _ in batch])
+                except Exception as exc:  # noqa: BLE001
+                    logger.error(f"write-behind WAL 写入失败: {exc}", exc_info=True)
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                    continue
+                # 按序号顺序进入内存队列，保证确认顺序即提交顺序
+                for _, record, future in batch:
+                    if record is not None:
+                        self._enqueue(record)
+                    if not future.done():
+                        future.set_result(None)
+        finally:
+            self._appending = False
+
+    def _write_lines(self, lines: List[str]) -> None:
+        last_seq = json.loads(lines[-1])["seq"]
+        with self._segment_lock:
+            if self._wal is None or self._wal.tell() >= WAL_SEGMENT_BYTES:
+                self._open_segment(json.loads(lines[0])["seq"])
+            self._wal.write("\n".join(lines) + "\n")
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            path, _ = self._segments[-1]
+            self._segments[-1] = (path, last_seq)
+
+    def _open_segment(self, first_seq: int) -> None:
+        if self._wal is not None:
+            self._wal.close()
+        path = os.path.join(self.wal_dir, f"wal-{first_seq:012d}.jsonl")
+        self._wal = open(path, "a", encoding="utf-8")
+        self._segments.append((path, first_seq - 1))
+
+    def _replay(self) -> List[PendingWrite]:
+        checkpoint_path = os.path.join(self.wal_dir, CHECKPOINT_FILE)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding="utf-8") as f:
+                self._committed_seq = int(json.load(f).get("committed_seq", 0))
+
+        records: Dict[int, PendingWrite] = {}
+        max_seq = self._committed_seq
+        names = sorted(
+            n for n in os.listdir(self.wal_dir) if n.startswith("wal-") and n.endswith(".jsonl")
+        )
+        for name in names:
+            path = os.path.join(self.wal_dir, name)
+            segment_max = 0
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的尾行，对应请求未被确认，直接跳过
+                        logger.warning(f"write-behind 跳过损坏的 WAL 行: {name}")
+                        continue
+                    seq = data["seq"]
+                    segment_max = max(segment_max, seq)
+                    max_seq = max(max_seq, seq)
+                    if seq <= self._committed_seq:
+                        continue
+                    if "discard" in data:
+                        records = {
+                            s: r for s, r in records.items()
+                            if r.conversation_id != data["discard"]
+                        }
+                    else:
+                        records[seq] = PendingWrite.from_dict(data)
+            self._segments.append((path, segment_max))
+
+        self._next_seq = max_seq + 1
+        return [records[s] for s in sorted(records)]
+
+    def _save_checkpoint(self, committed_seq: int) -> None:
+        path = os.path.join(self.wal_dir, CHECKPOINT_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"committed_seq": committed_seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # 删除已全部提交的旧段（当前写入段保留）
+        with self._segment_lock:
+            keep = []
+            for i, (seg_path, seg_max) in enumerate(self._segments):
+                is_current = i == len(self._segments) - 1 and self._wal is not None
+                if not is_current and seg_max <= committed_seq:
+                    try:
+                        os.remove(seg_path)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    keep.append((seg_path, seg_max))
+            self._segments = keep
+
+    def _write_dead_letter(self, records: List[PendingWrite]) -> None:
+        path = os.path.join(self.wal_dir, DEAD_LETTER_FILE)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(r.to_json() + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ------------------------------------------------------------------
+    # 后台组提交
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            if not self._queue:
+                if self._stopping:
+                    return
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            batch = [self._queue[i] for i in range(min(self.batch_size, len(self._queue)))]
+            try:
+                await self._commit(batch)
+                failures = 0
+            except Exception as exc:  # noqa: BLE001
+                failures += 1
+                logger.warning(
+                    f"write-behind 批量提交失败（第 {failures} 次，{len(batch)} 条）: {exc}"
+                )
+                if failures < self.max_retries:
+                    if self._stopping:
+                        return
+                    await asyncio.sleep(min(0.5 * 2 ** (failures - 1), MAX_RETRY_DELAY))
+                    continue
+                await self._commit_isolated(batch)
+                failures = 0
+
+            self._complete(batch)
+            await asyncio.to_thread(self._save_checkpoint, batch[-1].seq)
+
+    async def _commit(self, batch: List[PendingWrite]) -> None:
+        """一个事务内提交一批记录：每个会话一次 upsert，全部消息一条多行 INSERT。"""
+        conversations: Dict[int, Tuple[str, datetime, datetime]] = {}
+        rows: List[Dict[str, Any]] = []
+        for record in batch:
+            name, created_at, updated_at = conversations.get(
+                record.conversation_id, (record.name, record.created_at, record.updated_at)
+            )
+            conversations[record.conversation_id] = (
+                name,
+                created_at,
+                max(updated_at, record.updated_at),
+            )
+            rows.extend({"conversation_id": record.conversation_id, **m} for m in record.messages)
+
+        # 持锁提交，使 discard 能等待进行中的事务结束，避免已删除的会话被重新写入
+        async with self._commit_lock, AsyncSessionLocal() as db:
+            for conversation_id, (name, created_at, updated_at) in conversations.items():
+                try:
+                    await crud_conversations.upsert_for_sync(
+                        db,
+                        conversation_id=conversation_id,
+                        name=name,
+                        created_at=created_at,
+                        updated_at=updated_at,
+                    )
+                except ConversationUnavailable as exc:
+                    # 入队前已校验，提交时仍未命中说明会话期间被删除 / 归档，消息随之丢弃
+                    logger.warning(f"write-behind 丢弃会话 {conversation_id} 的消息: {exc}")
+                    rows = [r for r in rows if r["conversation_id"] != conversation_id]
+            await crud_messages.insert_many(db, rows)
+            await db.commit()
+
+    async def _commit_isolated(self, batch: List[PendingWrite]) -> None:
+        """整批反复失败时按会话拆分提交，仍失败的会话转入死信文件，避免阻塞后续写入。"""
+        grouped: Dict[int, List[PendingWrite]] = {}
+        for record in batch:
+            grouped.setdefault(record.conversation_id, []).append(record)
+        for conversation_id, records in grouped.items():
+            try:
+                await self._commit(records)
+            except Exception as exc:  # noqa: BLE001
+                logger.error(
+                    f"write-behind 会话 {conversation_id} 的 {len(records)} 条记录提交失败，"
+                    f"已写入死信文件: {exc}"
+                )
+                await asyncio.to_thread(self._write_dead_letter, records)
+
+    def _complete(self, batch: List[PendingWrite]) -> None:
+        committed = {r.seq for r in batch}
+        # 提交期间该会话可能被 discard，队首不一定仍是本批记录
+        while self._queue and self._queue[0].seq in committed:
+            self._queue.popleft()
+        for record in batch:
+            pending = self._by_conversation.get(record.conversation_id)
+            if pending and pending[0].seq == record.seq:
+                pending.popleft()
+                if not pending:
+                    del self._by_conversation[record.conversation_id]
+        self._committed_seq = max(self._committed_seq, batch[-1].seq)
+
+
+_write_behind_queue: Optional[WriteBehindQueue] = None
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    global _write_behind_queue
+    if _write_behind_queue is None:
+        _write_behind_queue = WriteBehindQueue(
+            settings.WRITE_BEHIND_DIR,
+            batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            max_retries=settings.WRITE_BEHIND_MAX_RETRIES,
+        )
+    return _write_behind_queue
@@ -0,0 +1,40 @@
+"""
+压缩工具
+优先使用 zstd（需安装可选依赖 zstandard），未安装时退化为标准库 zlib；
+压缩结果带编码名，解压时按编码选择实现，两种数据可以共存
+"""
+
+import zlib
+from typing import Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+
+
+def default_codec() -> str:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """压缩并返回 (编码名, 压缩数据)。"""
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB, zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("数据以 zstd 压缩，需安装 zstandard 才能读取")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"未知的压缩编码: {codec}")
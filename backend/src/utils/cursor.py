@@ -0,0 +1,39 @@
+"""
+分页游标工具
+将排序键（如 pinned, updated_at, id）编码为不透明的 URL 安全字符串，用于 keyset 分页
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析。"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """解析游标并按位置校验值类型（bool 不视为 int），不符合时抛出 InvalidCursor。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v
+            for v in payload
+        ]
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor(f"invalid cursor: {cursor}") from exc
+    if len(values) != len(types) or any(
+        type(v) is not t for v, t in zip(values, types)
+    ):
+        raise InvalidCursor(f"invalid cursor: {cursor}")
+    return values
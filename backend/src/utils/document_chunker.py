@@ -0,0 +1,182 @@
+"""
+上传文件的结构化切块
+按文档自身结构切分：PDF 按页、Excel / CSV 按工作表与行区间（每块重复表头）、Word 按标题小节与表格、
+PPT 按幻灯片；超过 max_chars 的单元再按行拼装切分。切块结果用于会话内文件检索。
+"""
+
+import io
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.utils.pdf_extractor import PdfPage, extract_pages
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentChunk:
+    source: str
+    # 在文件中的位置，例如 "第 3 页"、"工作表 Sheet1 第 1-40 行"、"幻灯片 2"、"表格 1"
+    location: str
+    text: str
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """按行拼装为不超过 max_chars 的片段，超长的单行硬切。"""
+    pieces: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        while len(line) > max_chars:
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) + 1 > max_chars and current:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def _sections(
+    source: str, units: Iterable[Tuple[str, str]], max_chars: int
+) -> Iterator[DocumentChunk]:
+    for location, text in units:
+        pieces = split_text(text, max_chars)
+        for i, piece in enumerate(pieces, start=1):
+            suffix = f"（{i}/{len(pieces)}）" if len(pieces) > 1 else ""
+            yield DocumentChunk(source, f"{location}{suffix}", piece)
+
+
+def _rows(source: str, label: str, header: str, rows: List[str], max_chars: int) -> Iterator[DocumentChunk]:
+    """表格按行区间切块，每块带表头；行号从 1 开始（不含表头）。"""
+    start = 0
+    while start < len(rows):
+        size = len(header)
+        end = start
+        while end < len(rows) and (end == start or size + len(rows[end]) + 1 <= max_chars):
+            size += len(rows[end]) + 1
+            end += 1
+        body = "\n".join(rows[start:end])
+        numbers = f"{start + 1}-{end}" if end - start > 1 else f"{end}"
+        yield DocumentChunk(source, f"{label} 第 {numbers} 行", f"{header}\n{body}")
+        start = end
+
+
+def _cell(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value).replace("\n", " ")
+
+
+def _pdf_sections(pages: Iterable[PdfPage]) -> Iterator[Tuple[str, str]]:
+    return ((f"第 {page.number} 页", page.text) for page in pages if not page.scanned)
+
+
+def _chunk_pdf(source: str, data: bytes, max_chars: int, max_pages: int) -> Iterator[DocumentChunk]:
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    count = min(len(reader.pages), max_pages)
+    pages = (
+        page for index in range(count) for page in extract_pages(reader, index, index + 1)
+    )
+    yield from _sections(source, _pdf_sections(pages), max_chars)
+
+
+def _chunk_table_file(source: str, data: bytes, ext: str, max_chars: int) -> Iterator[DocumentChunk]:
+    if ext == "csv":
+        sheets = {"Sheet1": pd.read_csv(io.BytesIO(data))}
+    else:
+        sheets = pd.read_excel(io.BytesIO(data), sheet_name=None)
+    for name, frame in sheets.items():
+        if frame.empty:
+            continue
+        header = " | ".join(str(c) for c in frame.columns)
+        rows = [" | ".join(_cell(v) for v in row) for row in frame.itertuples(index=False, name=None)]
+        yield from _rows(source, f"工作表 {name}", header, rows, max_chars)
+
+
+def _chunk_docx(source: str, data: bytes, max_chars: int) -> Iterator[DocumentChunk]:
+    import docx
+
+    document = docx.Document(io.BytesIO(data))
+    sections: List[Tuple[str, str]] = []
+    title, lines = "正文", []
+    for para in document.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        style = (para.style.name if para.style is not None else "") or ""
+        if style.startswith("Heading") or style.startswith("标题") or style == "Title":
+            if lines:
+                sections.append((title, "\n".join(lines)))
+            title, lines = f"小节「{text[:40]}」", [text]
+        else:
+            lines.append(text)
+    if lines:
+        sections.append((title, "\n".join(lines)))
+    yield from _sections(source, sections, max_chars)
+
+    for index, table in enumerate(document.tables, start=1):
+        rows = [" | ".join(_cell(c.text) for c in row.cells) for row in table.rows]
+        if rows:
+            yield from _rows(source, f"表格 {index}", rows[0], rows[1:] or [""], max_chars)
+
+
+def _chunk_pptx(source: str, data: bytes, max_chars: int) -> Iterator[DocumentChunk]:
+    import pptx
+
+    presentation = pptx.Presentation(io.BytesIO(data))
+    slides = []
+    for index, slide in enumerate(presentation.slides, start=1):
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text") and shape.text.strip()]
+        if texts:
+            slides.append((f"幻灯片 {index}", "\n".join(texts)))
+    yield from _sections(source, slides, max_chars)
+
+
+def chunk_document(
+    source: str,
+    data: bytes,
+    *,
+    max_chars: int,
+    max_chunks: int,
+    max_pages: int,
+    pages: Optional[Sequence[PdfPage]] = None,
+) -> List[DocumentChunk]:
+    """按扩展名切块，最多返回 max_chunks 块；不支持的格式返回空列表。
+
+    pages 为已提取的 PDF 各页时直接按页切块，不再重新解析文件。
+    """
+    ext = source.rsplit(".", 1)[-1].lower() if "." in source else ""
+    match ext:
+        case "pdf" if pages is not None:
+            chunks = _sections(source, _pdf_sections(pages), max_chars)
+        case "pdf":
+            chunks = _chunk_pdf(source, data, max_chars, max_pages)
+        case "xlsx" | "xls" | "csv":
+            chunks = _chunk_table_file(source, data, ext, max_chars)
+        case "docx":
+            chunks = _chunk_docx(source, data, max_chars)
+        case "pptx":
+            chunks = _chunk_pptx(source, data, max_chars)
+        case "txt" | "md":
+            paragraphs = data.decode("utf-8", errors="ignore")
+            chunks = _sections(source, [("正文", paragraphs)], max_chars)
+        case _:
+            return []
+    result: List[DocumentChunk] = []
+    for chunk in chunks:
+        if len(result) >= max_chunks:
+            logger.warning(f"文件 {source} 切块超过 {max_chunks} 块，其余内容不建立索引")
+            break
+        result.append(chunk)
+    return result
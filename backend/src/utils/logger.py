@@ -1,32 +1,174 @@
+"""
+日志配置
+根 Logger 只挂一个 QueueHandler：调用方线程（事件循环）只做级别 / 限流判断与入队，
+格式化与 stdout、文件写入由 QueueListener 后台线程完成，不再阻塞事件循环。
+
+- LOG_FORMAT=json 时每行输出一个 JSON 对象，默认为文本格式；
+- LOG_RATE_LIMITS 按 logger 名前缀限制每秒条数（只作用于 WARNING 以下），超出的记录直接丢弃并计数；
+- 大对象用 truncated() 包装后作为 % 参数传入，只有记录真正输出时才截断并转成字符串。
+"""
+
+import atexit
+import json
 import logging
-import sys
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import reprlib
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import settings
+from src.utils.metrics import Counter
+from src.utils.tracing import TraceIdFilter
 
 # 确保 logs 目录存在
 LOG_DIR = "logs"
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+TEXT_FORMAT = (
+    "[%(asctime)s] %(levelname)s [%(trace_id)s] in %(module)s.%(funcName)s:%(lineno)d: %(message)s"
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped", "被限流或队列已满而丢弃的日志条数", ("logger", "reason")
+)
+
+_listener: Optional[QueueListener] = None
+
+
+class _Truncated:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int] = None) -> None:
+        self.value = value
+        self.limit = limit or settings.LOG_MAX_VALUE_CHARS
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, str):
+            text = value
+        else:
+            limiter = reprlib.Repr()
+            limiter.maxstring = limiter.maxother = self.limit
+            limiter.maxlist = limiter.maxdict = limiter.maxlevel = 20
+            text = limiter.repr(value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}...(共 {len(text)} 字符)"
+
+    __repr__ = __str__
+
+
+def truncated(value: Any, limit: Optional[int] = None) -> _Truncated:
+    """延迟截断的日志参数：格式化时才转成字符串，列表 / 字典按 reprlib 限长，不生成完整 repr。
+
+    用法：logger.info("messages: %s", truncated(messages))
+    """
+    return _Truncated(value, limit)
+
+
+class RateLimitFilter(logging.Filter):
+    """按 logger 名前缀的令牌桶限流，WARNING 及以上级别不受限制。"""
+
+    def __init__(self, limits: Dict[str, float]) -> None:
+        super().__init__()
+        # 最长前缀优先匹配
+        self.limits = sorted(limits.items(), key=lambda kv: len(kv[0]), reverse=True)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.limits:
+            return True
+        prefix, rate = self._match(record.name)
+        if prefix is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(prefix, (rate, now))
+            # 桶容量为一秒的配额
+            tokens = min(rate, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            self._buckets[prefix] = (tokens - 1 if allowed else tokens, now)
+        if not allowed:
+            LOG_RECORDS_DROPPED.labels(prefix, "rate_limit").inc()
+        return allowed
+
+    def _match(self, name: str) -> Tuple[Optional[str], float]:
+        for prefix, rate in self.limits:
+            if name == prefix or name.startswith(prefix + "."):
+                return prefix, rate
+        return None, 0.0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """入队前只合成消息文本，异常堆栈与格式化留给后台线程；队列已满时丢弃而不阻塞。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用方线程中求值参数，避免其后被修改；truncated 参数在此时截断
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.name, "queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": f"{record.module}.{record.funcName}:{record.lineno}",
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _parse_rate_limits(raw: str) -> Dict[str, float]:
+    """解析 "src.services.matrixone_client=20,src.routers.moi=50" 形式的配置。"""
+    limits: Dict[str, float] = {}
+    for item in raw.split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            limits[name.strip()] = float(rate)
+    return limits
+
+
 def setup_logging():
     """配置根 Logger，使其对所有模块生效"""
+    global _listener
     logger = logging.getLogger()
-    
+
     # 避免重复配置
     if logger.handlers:
         return
-        
-    logger.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter(
-        "[%(asctime)s] %(levelname)s in %(module)s.%(funcName)s:%(lineno)d: %(message)s"
-    )
-    
+
+    logger.setLevel(settings.LOG_LEVEL)
+
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
     # 控制台输出
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+
     # 文件输出 (每天轮转，保留 7 天)
     file_handler = RotatingFileHandler(
         os.path.join(LOG_DIR, "backend.log"),
@@ -35,4 +177,23 @@ def setup_logging():
         encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    # 限流先于 trace id 注入：被丢弃的记录不做任何额外工作；trace id 依赖调用方上下文，须在入队前取得
+    queue_handler.addFilter(RateLimitFilter(_parse_rate_limits(settings.LOG_RATE_LIMITS)))
+    queue_handler.addFilter(TraceIdFilter())
+    logger.addHandler(queue_handler)
+
+    _listener = QueueListener(
+        queue_handler.queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """停止后台线程，输出队列中剩余的日志。"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,366 @@
+"""
+进程内指标
+轻量实现 Counter / Gauge / Histogram（接口与 prometheus_client 一致），
+由 /metrics 按 Prometheus 文本格式输出；记录一次观测只是一次加锁的计数更新，可常驻开启
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 接口延迟（秒）
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+# 数据库与连接池等待（秒）
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 生成速度（token/s）
+RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._samples(key, child))
+        return lines
+
+    def _samples(self, key: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self, key, child) -> List[str]:
+        return [f"{self.name}_total{_label_str(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """采集时调用 function 取值，适合连接池占用等现成的状态。"""
+        self._function = function
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception:  # noqa: BLE001
+                pass
+        return super().collect()
+
+    def _samples(self, key, child) -> List[str]:
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # 各桶独立计数，输出时再累加
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self, key, child) -> List[str]:
+        names = self.labelnames + ("le",)
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _label_str(names, key + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        base = _label_str(self.labelnames, key)
+        lines.append(f"{self.name}_sum{base} {_format_value(total)}")
+        lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标重复注册: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------------------------------
+# 指标定义
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求耗时（流式响应含整个推送过程）",
+    ("method", "route", "status"),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "LLM 流式调用从发起请求到首个 token 的耗时",
+    ("model",),
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "LLM 调用总耗时",
+    ("model", "mode"),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "LLM 生成速度（首 token 之后；流式按 chunk 计数）",
+    ("model",),
+    buckets=RATE_BUCKETS,
+)
+LLM_ERRORS = Counter("llm_errors", "LLM 调用失败次数", ("model",))
+SQL_DURATION = Histogram(
+    "sql_query_duration_seconds",
+    "SQL 执行耗时，按查询形态（标签 + 语句类型 + 表）区分",
+    ("shape",),
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "从连接池获取连接的等待时间（含新建连接）",
+    buckets=DB_BUCKETS,
+)
+FILE_PARSE_DURATION = Histogram(
+    "file_parse_duration_seconds",
+    "上传文件解析耗时",
+    ("type",),
+)
+PDF_PAGES = Counter(
+    "pdf_pages", "PDF 页处理数：extracted 为已提取，scanned 为无文本层而跳过", ("result",)
+)
+SSE_STREAMS_IN_FLIGHT = Gauge("sse_streams_in_flight", "正在推送的 SSE 流数量")
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "事件循环调度延迟（定时器实际唤醒时间与预期之差）",
+    buckets=DB_BUCKETS,
+)
+EVENT_LOOP_LAG_QUANTILE = Gauge(
+    "event_loop_lag_quantile_seconds",
+    "最近一段时间事件循环调度延迟的分位数",
+    ("quantile",),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "event_loop_blocked", "事件循环阻塞超过阈值的次数"
+)
+DOC_INDEX_CHUNKS = Counter(
+    "doc_index_chunks", "上传文件写入会话检索索引的片段数", ("type",)
+)
+FILE_ARTIFACTS = Counter(
+    "file_artifacts", "上传文件处理次数：parsed 为新解析，reused 为复用已存储的解析结果", ("result",)
+)
+DOC_RETRIEVAL_DURATION = Histogram(
+    "doc_retrieval_duration_seconds",
+    "聊天轮次检索上传文件片段的耗时（含问题向量生成）",
+)
+
+
+# ---------------------------------------------------------------------------
+# SQL 查询形态
+# ---------------------------------------------------------------------------
+
+_sql_label: ContextVar[Optional[str]] = ContextVar("sql_label", default=None)
+
+_SHAPE_RE = re.compile(
+    r"^\s*(\w+)\b.*?\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+([`\w.]+)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@contextmanager
+def sql_label(label: str) -> Iterator[None]:
+    """为其中执行的 SQL 打标签（可嵌套，以 / 连接），用于区分同一张表上的不同查询。"""
+    current = _sql_label.get()
+    token = _sql_label.set(f"{current}/{label}" if current else label)
+    try:
+        yield
+    finally:
+        _sql_label.reset(token)
+
+
+def query_shape(statement: str) -> str:
+    """语句类型 + 首个表名，例如 select messages；不含字面量，基数有限。"""
+    match = _SHAPE_RE.match(statement[:1000])
+    if match:
+        shape = f"{match.group(1).lower()} {match.group(2).replace('`', '')}"
+    else:
+        shape = statement.split(None, 1)[0].lower() if statement.strip() else "unknown"
+    label = _sql_label.get()
+    return f"{label}:{shape}" if label else shape
+
+
+# ---------------------------------------------------------------------------
+# HTTP 中间件
+# ---------------------------------------------------------------------------
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：按路由模板记录请求耗时，不缓冲响应体，不影响 SSE 推送。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # 未匹配的路径统一归为 unmatched，避免标签基数随请求路径膨胀
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], path, str(status)).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,32 @@
+"""
+数值解析工具
+统一处理采购数据中以字符串形式存储的金额、单价（千分位、货币符号、单位后缀等）
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional
+
+# 金额中常见的非数值字符：千分位、货币符号、中文单位、空白
+_AMOUNT_NOISE = re.compile(r"[,，\s￥¥元]|RMB|CNY", re.IGNORECASE)
+
+
+def parse_amount(value: Any) -> Optional[Decimal]:
+    """将金额字段解析为 Decimal，无法解析时返回 None。
+
+    支持 "1,234.50"、"￥1234.5元"、Decimal/int/float 等输入。
+    """
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+
+    text = _AMOUNT_NOISE.sub("", str(value))
+    if not text or text in {"-", "--", "/"}:
+        return None
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
@@ -1,56 +1,84 @@
 import io
 import logging
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import UploadFile
-import pypdf
 import docx
 import pptx
 import zipfile
 import re
+import time
+
+from src.config import settings
+from src.utils.metrics import FILE_PARSE_DURATION, PDF_PAGES
+from src.utils.pdf_extractor import (
+    PdfPage,
+    extract_pdf_pages,
+    extract_pdf_text,
+    extract_pdf_text_sync,
+    render_pages,
+)
+from src.utils.table_extractor import ExtractedTable, extract_table, format_summary, parse_rates
+from src.utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
-async def parse_file_content(file: UploadFile) -> Dict[str, Any]:
+# 指标按文件类型区分，其余扩展名归为 other
+PARSE_METRIC_TYPES = {"xlsx", "xls", "csv", "pdf", "docx", "doc", "txt", "pptx", "ppt"}
+
+# 做报价表结构化提取的文件类型
+TABLE_EXTS = {"xlsx", "xls", "csv"}
+FX_RATES = parse_rates(settings.FX_RATES)
+
+async def parse_file_content(file: UploadFile, keep_pages: bool = False) -> Dict[str, Any]:
     """
     解析上传文件内容，返回标准化格式
+    keep_pages=True 时 PDF 提取全部页（不受字符上限限制）并在 pages 中返回，供建立检索索引复用
     """
     filename = file.filename or "unknown"
     ext = filename.split('.')[-1].lower() if '.' in filename else ""
     content = ""
     error = None
+    tables: List[ExtractedTable] = []
+    pages: Optional[List[PdfPage]] = None
+    started = time.perf_counter()
 
     try:
         # 读取文件内容
         file_bytes = await file.read()
         file_obj = io.BytesIO(file_bytes)
         logger.info(f"Parsing file {filename} with extension {ext}")
-        match ext:
-            case 'xlsx' | 'xls' | 'csv':
-                content = _parse_excel(file_obj, ext)
-            case 'pdf':
-                content = _parse_pdf(file_obj)
-            case 'docx':
-                content = _parse_word(file_obj)
-            case 'doc':
-                content = "[注意: .doc 是旧版 Word 格式，建议转换为 .docx 后重新上传以获得更好的解析效果]"
-                content += _parse_word(file_obj)
-            case 'txt':
-                content = file_bytes.decode('utf-8', errors='ignore')
-            case 'pptx':
-                content = _parse_pptx(file_obj)
-            case 'ppt':
-                content = "[注意: .ppt 是旧版 PowerPoint 格式，建议转换为 .pptx 后重新上传以获得更好的解析效果]"
-            case _:
-                logger.warning(f"Unsupported file format: {ext} for file {filename}")
-                content = f"[不支持的文件格式: {ext}]"
-                error = "不支持的文件格式"
+        attributes = {"file.name": filename, "file.type": ext, "file.size": len(file_bytes)}
+        with span("parse_file", **attributes):
+            match ext:
+                case 'xlsx' | 'xls' | 'csv':
+                    content, tables = _parse_excel_tables(file_obj, ext)
+                case 'pdf':
+                    content, pages = await _parse_pdf_async(file_bytes, keep_pages)
+                case 'docx':
+                    content = _parse_word(file_obj)
+                case 'doc':
+                    content = "[注意: .doc 是旧版 Word 格式，建议转换为 .docx 后重新上传以获得更好的解析效果]"
+                    content += _parse_word(file_obj)
+                case 'txt':
+                    content = file_bytes.decode('utf-8', errors='ignore')
+                case 'pptx':
+                    content = _parse_pptx(file_obj)
+                case 'ppt':
+                    content = "[注意: .ppt 是旧版 PowerPoint 格式，建议转换为 .pptx 后重新上传以获得更好的解析效果]"
+                case _:
+                    logger.warning(f"Unsupported file format: {ext} for file {filename}")
+                    content = f"[不支持的文件格式: {ext}]"
+                    error = "不支持的文件格式"
 
     except Exception as e:
         logger.error(f"Error parsing file {filename}: {e}", exc_info=True)
         content = f"[解析失败: {str(e)}]"
         error = str(e)
     finally:
+        FILE_PARSE_DURATION.labels(ext if ext in PARSE_METRIC_TYPES else "other").observe(
+            time.perf_counter() - started
+        )
         # 关闭文件
         try:
             await file.close()
@@ -61,60 +89,114 @@ async def parse_file_content(file: UploadFile) -> Dict[str, Any]:
         "name": filename,
         "type": ext,
         "content": content,
-        "error": error
+        "error": error,
+        # 识别出的报价表（类型化列），仅表格文件
+        "tables": tables,
+        # 已提取的 PDF 各页，仅 keep_pages 时
+        "pages": pages,
     }
 
 def _parse_excel(file_obj: io.BytesIO, ext: str) -> str:
+    return _parse_excel_tables(file_obj, ext)[0]
+
+def _parse_excel_tables(file_obj: io.BytesIO, ext: str) -> Tuple[str, List[ExtractedTable]]:
+    """每个工作表输出 markdown；识别为报价表的工作表输出比价统计摘要与少量明细行，并返回类型化的提取结果。"""
     result = []
+    tables: List[ExtractedTable] = []
     try:
-        if ext == 'csv':
-            df = pd.read_csv(file_obj)
-            result.append(_dataframe_to_markdown(df, "Sheet1"))
-        else:
-            # xlsx or xls
-            excel_file = pd.ExcelFile(file_obj)
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
+        for sheet_name, df in _read_sheets(file_obj, ext).items():
+            table = extract_table(df, str(sheet_name), FX_RATES)
+            if table is None:
                 result.append(_dataframe_to_markdown(df, sheet_name))
+                continue
+            tables.append(table)
+            result.append(
+                format_summary(table, settings.TABLE_SUMMARY_GROUPS)
+                + "\n"
+                + _dataframe_to_markdown(df, sheet_name, settings.TABLE_PREVIEW_ROWS)
+            )
         
         content = "\n\n".join(result)
-        return content if content.strip() else "[Excel 文件为空或无法读取内容]"
+        return (content if content.strip() else "[Excel 文件为空或无法读取内容]"), tables
     except Exception as e:
         raise Exception(f"Excel解析错误: {str(e)}")
 
-def _dataframe_to_markdown(df: pd.DataFrame, title: str) -> str:
+def _read_sheets(file_obj: io.BytesIO, ext: str) -> Dict[str, pd.DataFrame]:
+    if ext == 'csv':
+        return {"Sheet1": pd.read_csv(file_obj)}
+    # xlsx or xls
+    excel_file = pd.ExcelFile(file_obj)
+    return {
+        sheet_name: pd.read_excel(excel_file, sheet_name=sheet_name)
+        for sheet_name in excel_file.sheet_names
+    }
+
+def extract_file_tables(data: bytes, ext: str) -> List[ExtractedTable]:
+    """只做报价表提取（不生成 markdown），用于为已存储的表格文件补算提取结果；同步函数，在线程中调用。"""
+    tables = []
+    for sheet_name, df in _read_sheets(io.BytesIO(data), ext).items():
+        table = extract_table(df, str(sheet_name), FX_RATES)
+        if table is not None:
+            tables.append(table)
+    return tables
+
+def _dataframe_to_markdown(df: pd.DataFrame, title: str, max_rows: int = 100) -> str:
     if df.empty:
         return ""
     
     # 限制行数，避免过长
-    display_df = df.head(100)
+    display_df = df.head(max_rows)
     markdown = f"【工作表: {title}】\n"
     markdown += display_df.to_markdown(index=False)
     
-    if len(df) > 100:
-        markdown += f"\n... 共 {len(df)} 行数据，仅显示前 100 行"
+    if len(df) > max_rows:
+        markdown += f"\n... 共 {len(df)} 行数据，仅显示前 {max_rows} 行"
     
     return markdown
 
 def _parse_pdf(file_obj: io.BytesIO) -> str:
+    """在当前线程中顺序提取，达到字符上限即停止。"""
     try:
-        reader = pypdf.PdfReader(file_obj)
-        text_parts = []
-        max_pages = min(len(reader.pages), 50)
-        
-        for i in range(max_pages):
-            page = reader.pages[i]
-            text = page.extract_text()
-            if text.strip():
-                text_parts.append(f"【第 {i+1} 页】\n{text}")
-        
-        if len(reader.pages) > max_pages:
-            text_parts.append(f"\n... 共 {len(reader.pages)} 页，仅解析前 {max_pages} 页")
-            
-        content = "\n\n".join(text_parts)
-        return content if content.strip() else "[PDF 文件为空或为扫描件（无可提取文本）]"
+        return extract_pdf_text_sync(
+            file_obj, settings.FILE_CONTENT_MAX_CHARS, settings.PDF_MAX_PAGES
+        )
+    except Exception as e:
+        raise Exception(f"PDF解析错误: {str(e)}")
+
+async def _parse_pdf_async(
+    file_bytes: bytes, keep_pages: bool = False
+) -> Tuple[str, Optional[List[PdfPage]]]:
+    """大文档按页分块在进程池中并行提取，不阻塞事件循环；keep_pages 时同时返回全部页。"""
+    pages = None
+    try:
+        if keep_pages:
+            pages, total = await extract_pdf_pages(
+                file_bytes,
+                max_pages=settings.PDF_MAX_PAGES,
+                workers=settings.PDF_WORKERS,
+                min_parallel_pages=settings.PDF_PARALLEL_MIN_PAGES,
+            )
+            content, _, _ = render_pages(
+                pages,
+                total,
+                char_budget=settings.FILE_CONTENT_MAX_CHARS,
+                max_pages=settings.PDF_MAX_PAGES,
+            )
+            scanned = sum(page.scanned for page in pages)
+            extracted = len(pages) - scanned
+        else:
+            content, extracted, scanned = await extract_pdf_text(
+                file_bytes,
+                char_budget=settings.FILE_CONTENT_MAX_CHARS,
+                max_pages=settings.PDF_MAX_PAGES,
+                workers=settings.PDF_WORKERS,
+                min_parallel_pages=settings.PDF_PARALLEL_MIN_PAGES,
+            )
     except Exception as e:
         raise Exception(f"PDF解析错误: {str(e)}")
+    PDF_PAGES.labels("extracted").inc(extracted)
+    PDF_PAGES.labels("scanned").inc(scanned)
+    return content, pages
 
 def _parse_word(file_obj: io.BytesIO) -> str:
     try:
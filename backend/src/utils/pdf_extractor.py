@@ -0,0 +1,269 @@
+"""
+PDF 文本提取
+- 按页分块提交到进程池并行提取，按页序流式取回；累计字符数达到上限（下游只保留前
+  FILE_CONTENT_MAX_CHARS 个字符）即停止，尚未开始的分块直接取消；
+- 页面资源中既没有字体也没有表单 XObject 的页面（扫描件 / 纯图片页）不可能有文本层，跳过 extract_text；
+- 页数较少的文档在线程中顺序提取，省去进程间开销；进程池异常时同样退化为线程内提取；
+- 需要建立检索索引时用 extract_pdf_pages 提取全部页，上下文文本与切块共用同一次提取结果。
+
+本模块会在进程池的子进程中导入，只依赖 pypdf 与标准库，不要引入应用的其他模块。
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import IO, AsyncIterator, List, Optional, Tuple
+
+import pypdf
+
+logger = logging.getLogger(__name__)
+
+# 每个任务提取的页数：越小越早停止，越大进程间往返越少
+CHUNK_PAGES = 4
+
+EMPTY_TEXT = "[PDF 文件为空或为扫描件（无可提取文本）]"
+
+
+@dataclass(frozen=True, slots=True)
+class PdfPage:
+    number: int
+    text: str
+    scanned: bool
+
+
+def is_scanned(page: pypdf.PageObject) -> bool:
+    """页面没有字体资源、也没有可能包含文字的表单 XObject，即无文本层。"""
+    resources = page.get("/Resources")
+    if resources is None:
+        return True
+    resources = resources.get_object()
+    if resources.get("/Font"):
+        return False
+    xobjects = resources.get("/XObject")
+    if xobjects:
+        for xobject in xobjects.get_object().values():
+            if xobject.get_object().get("/Subtype") == "/Form":
+                return False
+    return True
+
+
+def extract_pages(reader: pypdf.PdfReader, start: int, stop: int) -> List[PdfPage]:
+    pages = []
+    for index in range(start, stop):
+        page = reader.pages[index]
+        if is_scanned(page):
+            pages.append(PdfPage(index + 1, "", True))
+        else:
+            pages.append(PdfPage(index + 1, page.extract_text() or "", False))
+    return pages
+
+
+class PageCollector:
+    """按页序累计文本，达到字符上限后停止，并生成与原解析器一致的输出格式。"""
+
+    def __init__(self, char_budget: int) -> None:
+        self.char_budget = char_budget
+        self.parts: List[str] = []
+        self.length = 0
+        self.last_page = 0
+        self.scanned = 0
+
+    @property
+    def full(self) -> bool:
+        return self.length >= self.char_budget
+
+    def add(self, page: PdfPage) -> bool:
+        """加入一页，返回是否已达到字符上限。"""
+        self.last_page = page.number
+        if page.scanned:
+            self.scanned += 1
+        elif page.text.strip():
+            part = f"【第 {page.number} 页】\n{page.text}"
+            self.parts.append(part)
+            self.length += len(part) + 2
+        return self.full
+
+    def render(self, total_pages: int, max_pages: int) -> str:
+        notes = []
+        if self.full and self.last_page < min(total_pages, max_pages):
+            notes.append(f"\n... 共 {total_pages} 页，已达到字符上限，仅解析前 {self.last_page} 页")
+        elif total_pages > max_pages:
+            notes.append(f"\n... 共 {total_pages} 页，仅解析前 {max_pages} 页")
+        if self.scanned and self.parts:
+            notes.append(f"[已跳过 {self.scanned} 页扫描页（无可提取文本）]")
+        content = "\n\n".join(self.parts + notes)
+        return content if self.parts else EMPTY_TEXT
+
+
+def extract_pdf_text_sync(file_obj: IO[bytes], char_budget: int, max_pages: int) -> str:
+    """在当前线程中顺序提取（小文档、进程池不可用时使用）。"""
+    reader = pypdf.PdfReader(file_obj)
+    total = len(reader.pages)
+    collector = PageCollector(char_budget)
+    for index in range(min(total, max_pages)):
+        if collector.add(extract_pages(reader, index, index + 1)[0]):
+            break
+    return collector.render(total, max_pages)
+
+
+# ---------------------------------------------------------------------------
+# 进程池
+# ---------------------------------------------------------------------------
+
+# 子进程内缓存最近打开的文档，同一文档的后续分块不必重新解析交叉引用表
+_worker_reader: Tuple[Optional[str], Optional[pypdf.PdfReader]] = (None, None)
+
+
+def _extract_chunk(path: str, start: int, stop: int) -> List[PdfPage]:
+    global _worker_reader
+    if _worker_reader[0] != path:
+        _worker_reader = (path, pypdf.PdfReader(path))
+    return extract_pages(_worker_reader[1], start, stop)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def _get_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_workers
+    if workers <= 0:
+        return None
+    if _pool is None:
+        # spawn：事件循环进程中有日志等后台线程，fork 出的子进程可能继承被持有的锁
+        _pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        _pool_workers = workers
+    return _pool
+
+
+def _warmup() -> None:
+    pass
+
+
+def start_pdf_pool(workers: int) -> None:
+    """启动时预先拉起子进程（spawn 启动约需 1 秒），不等待完成。"""
+    pool = _get_pool(workers)
+    if pool is not None:
+        for _ in range(workers):
+            pool.submit(_warmup)
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _open(data: bytes) -> Tuple[pypdf.PdfReader, int]:
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    return reader, len(reader.pages)
+
+
+def _write_temp(data: bytes) -> str:
+    # 子进程按路径读取，避免每个分块都序列化整份文档
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        return f.name
+
+
+async def _iter_pages(
+    reader: pypdf.PdfReader, data: bytes, count: int, workers: int, min_parallel_pages: int
+) -> AsyncIterator[PdfPage]:
+    """按页序产出前 count 页；调用方提前结束迭代时取消未开始的分块。"""
+    next_index = 0
+    pool = _get_pool(workers) if count >= min_parallel_pages else None
+    if pool is not None:
+        loop = asyncio.get_running_loop()
+        path = await asyncio.to_thread(_write_temp, data)
+        pending: deque = deque()
+        chunk_starts = iter(range(0, count, CHUNK_PAGES))
+
+        def submit() -> None:
+            start = next(chunk_starts, None)
+            if start is not None:
+                stop = min(start + CHUNK_PAGES, count)
+                pending.append(loop.run_in_executor(pool, _extract_chunk, path, start, stop))
+
+        try:
+            # 在途分块数限制为 worker 数的两倍，达到上限时浪费的工作有界
+            for _ in range(_pool_workers * 2):
+                submit()
+            while pending:
+                pages = await pending.popleft()
+                submit()
+                for page in pages:
+                    next_index = page.number
+                    yield page
+        except BrokenProcessPool:
+            logger.warning("PDF 进程池异常，改为线程内提取")
+            shutdown_pdf_pool()
+        finally:
+            for future in pending:
+                future.cancel()
+            await asyncio.to_thread(os.unlink, path)
+
+    for start in range(next_index, count, CHUNK_PAGES):
+        pages = await asyncio.to_thread(extract_pages, reader, start, min(start + CHUNK_PAGES, count))
+        for page in pages:
+            yield page
+
+
+async def extract_pdf_text(
+    data: bytes,
+    *,
+    char_budget: int,
+    max_pages: int,
+    workers: int = 0,
+    min_parallel_pages: int = 8,
+) -> Tuple[str, int, int]:
+    """提取 PDF 文本，返回 (文本, 已提取页数, 跳过的扫描页数)。"""
+    reader, total = await asyncio.to_thread(_open, data)
+    count = min(total, max_pages)
+    collector = PageCollector(char_budget)
+    pages = _iter_pages(reader, data, count, workers, min_parallel_pages)
+    try:
+        async for page in pages:
+            if collector.add(page):
+                break
+    finally:
+        await pages.aclose()
+    return _collected(collector, total, max_pages)
+
+
+async def extract_pdf_pages(
+    data: bytes, *, max_pages: int, workers: int = 0, min_parallel_pages: int = 8
+) -> Tuple[List[PdfPage], int]:
+    """提取前 max_pages 页（不设字符上限，建立检索索引时使用），返回 (各页, 总页数)。"""
+    reader, total = await asyncio.to_thread(_open, data)
+    count = min(total, max_pages)
+    pages = [page async for page in _iter_pages(reader, data, count, workers, min_parallel_pages)]
+    return pages, total
+
+
+def render_pages(
+    pages: List[PdfPage], total: int, *, char_budget: int, max_pages: int
+) -> Tuple[str, int, int]:
+    """由已提取的页生成与 extract_pdf_text 相同的返回值。"""
+    collector = PageCollector(char_budget)
+    for page in pages:
+        if collector.add(page):
+            break
+    return _collected(collector, total, max_pages)
+
+
+def _collected(collector: PageCollector, total: int, max_pages: int) -> Tuple[str, int, int]:
+    return (
+        collector.render(total, max_pages),
+        collector.last_page - collector.scanned,
+        collector.scanned,
+    )
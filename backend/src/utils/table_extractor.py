@@ -0,0 +1,365 @@
+"""
+采购表格结构化提取
+从工作表中识别产品、型号、供应商、单位、数量、单价、金额列，统一换算为人民币与标准计量单位，
+结果保存为按列的类型化数组（pandas / NumPy），比价统计直接在进程内向量化计算，不再交给大模型逐行心算。
+
+- 表头行：取列名与前 HEADER_SCAN_ROWS 行中命中字段最多的一行（表格上方常有标题行）；
+- 金额：识别 ¥ / $ / € / 港币等符号与列名中的币种、"万元"单位，按 rates 换算为人民币，无法识别的币种记为 NaN；
+- 单位：同义词归一（pcs→个、公斤→千克），长度 / 重量 / 容量换算到基准单位，单价随之换算为每基准单位价格；
+- 缺少单价列时由金额 / 数量推算。
+
+本模块只依赖 pandas / numpy，可在线程中调用。
+"""
+
+import io
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 表头行的搜索范围（列名 + 前 N 行）
+HEADER_SCAN_ROWS = 10
+
+# 合计 / 小计行的产品或型号单元格
+TOTAL_RE = r"\s*(合\s*计|总\s*计|小\s*计|total|subtotal)[:：]?\s*"
+
+TEXT_FIELDS = ("product", "model", "supplier", "unit")
+NUMBER_FIELDS = ("quantity", "unit_price", "amount")
+
+# 字段 -> 列名关键词（按优先级）；unit 只做精确匹配，避免命中“采购单位”“需求单位”等组织名称列
+HEADER_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "unit_price": ("含税单价", "不含税单价", "单价", "报价", "unitprice", "price"),
+    "amount": ("中标金额", "总价", "合价", "金额", "合计", "total", "amount"),
+    "quantity": ("采购数量", "数量", "采购量", "qty", "quantity"),
+    "unit": ("计量单位", "物料单位", "单位", "unit", "uom"),
+    "model": ("规格型号", "型号", "规格", "model", "spec"),
+    "supplier": ("供应商名称", "供应商", "投标人", "中标人", "厂商", "vendor", "supplier"),
+    "product": (
+        "细化产品", "物料短描述", "产品名称", "物料名称", "货物名称", "品名", "名称",
+        "产品", "物料", "item", "product", "description",
+    ),
+}
+EXACT_FIELDS = {"unit"}
+# 匹配顺序：先匹配含义最明确的列，每列只归属一个字段
+FIELD_ORDER = ("unit_price", "amount", "quantity", "unit", "model", "supplier", "product")
+
+# 币种：列名或单元格中的标记 -> 代码
+# 顺序：更具体的标记在前（HK$ 先于 $，美元 / 港元先于 元）
+# 不区分大小写：列名经 _normalize_header 转为小写，单元格中也常见 "usd 100"
+CURRENCY_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ("HKD", r"(?i)HK\$|港币|港元|HKD"),
+    ("EUR", r"(?i)€|欧元|EUR"),
+    ("JPY", r"(?i)日元|JPY"),
+    ("USD", r"(?i)US\$|\$|美元|USD"),
+    ("CNY", r"(?i)¥|￥|人民币|RMB|CNY|元"),
+)
+NUMBER_RE = r"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+
+# 单位别名 -> (标准单位, 换算到标准单位的倍数)
+UNIT_ALIASES: Dict[str, Tuple[str, float]] = {
+    "台": ("台", 1), "套": ("套", 1), "set": ("套", 1), "sets": ("套", 1),
+    "个": ("个", 1), "pcs": ("个", 1), "pc": ("个", 1), "ea": ("个", 1),
+    "件": ("件", 1), "只": ("只", 1), "块": ("块", 1), "根": ("根", 1), "张": ("张", 1),
+    "把": ("把", 1), "卷": ("卷", 1), "箱": ("箱", 1), "批": ("批", 1), "项": ("项", 1),
+    "米": ("米", 1), "m": ("米", 1), "千米": ("米", 1000), "公里": ("米", 1000), "km": ("米", 1000),
+    "厘米": ("米", 0.01), "cm": ("米", 0.01), "毫米": ("米", 0.001), "mm": ("米", 0.001),
+    "千克": ("千克", 1), "公斤": ("千克", 1), "kg": ("千克", 1), "克": ("千克", 0.001),
+    "g": ("千克", 0.001), "吨": ("千克", 1000), "t": ("千克", 1000),
+    "升": ("升", 1), "l": ("升", 1), "毫升": ("升", 0.001), "ml": ("升", 0.001),
+    "平方米": ("平方米", 1), "㎡": ("平方米", 1), "m2": ("平方米", 1),
+}
+
+
+@dataclass(slots=True)
+class ExtractedTable:
+    sheet: str
+    # 字段 -> 原表列名
+    columns: Dict[str, str]
+    # 列：row（原表行号，从 1 开始含表头行）、TEXT_FIELDS（object）、NUMBER_FIELDS（float64，金额为人民币、
+    # 单价为每标准单位人民币）、currency（原币种）
+    frame: pd.DataFrame
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+
+def _normalize_header(value: object) -> str:
+    text = "" if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _strip_parens(header: str) -> str:
+    return re.sub(r"[（(].*?[）)]", "", header)
+
+
+def match_columns(headers: Sequence[object]) -> Dict[str, int]:
+    """字段 -> 列位置。"""
+    # 去括号只做一次：表头扫描对每个候选行都要调用，宽表上是解析的主要固定开销
+    bare_headers = [_strip_parens(_normalize_header(h)) for h in headers]
+    taken: set[int] = set()
+    matched: Dict[str, int] = {}
+    for field in FIELD_ORDER:
+        for keyword in HEADER_KEYWORDS[field]:
+            for i, bare in enumerate(bare_headers):
+                if i in taken or not bare:
+                    continue
+                hit = bare == keyword if field in EXACT_FIELDS else keyword in bare
+                if hit:
+                    matched[field] = i
+                    taken.add(i)
+                    break
+            if field in matched:
+                break
+    return matched
+
+
+def _is_price_table(matched: Mapping[str, int]) -> bool:
+    priced = "unit_price" in matched or {"amount", "quantity"} <= matched.keys()
+    return priced and ("product" in matched or "model" in matched)
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """解析 "USD=7.1,EUR=7.8" 形式的汇率配置（对人民币），CNY 固定为 1。"""
+    rates = {"CNY": 1.0}
+    for item in spec.split(","):
+        code, sep, value = item.partition("=")
+        if sep and code.strip():
+            rates[code.strip().upper()] = float(value)
+    return rates
+
+
+def _header_currency(header: str) -> Optional[str]:
+    for code, pattern in CURRENCY_PATTERNS:
+        if re.search(pattern, header):
+            return code
+    return None
+
+
+def _repeat(value: str, n: int) -> np.ndarray:
+    """同一字符串重复 n 次的 object 数组；np.full 会为每个元素各建一个字符串对象。"""
+    out = np.empty(n, dtype=object)
+    out.fill(value)
+    return out
+
+
+def _factorize(values: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """(每行对应的去重值下标, 去重并去除首尾空白后的文本)；报价表中重复值很多，字符串处理只对去重值做一次。"""
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(np.append(uniques.astype(object), None)).astype("string").str.strip()
+    return np.where(codes < 0, len(uniques), codes), text
+
+
+def _numbers(text: pd.Series) -> np.ndarray:
+    return pd.to_numeric(
+        text.str.replace(",", "", regex=False).str.extract(NUMBER_RE, expand=False),
+        errors="coerce",
+    ).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def parse_money(
+    values: pd.Series, header: str, rates: Mapping[str, float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """解析金额列，返回 (人民币金额 float64, 原币种)。"""
+    default = _header_currency(header) or "CNY"
+    scale = 10000 if "万" in header else 1
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        # 已是数值列：币种只能来自列名
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan) * scale
+        return numbers * rates.get(default, np.nan), _repeat(default, len(values))
+
+    codes, text = _factorize(values)
+    currency = _repeat(default, len(text))
+    for code, pattern in reversed(CURRENCY_PATTERNS):
+        # 倒序覆盖：单元格中更具体的外币标记优先于“元”
+        mask = text.str.contains(pattern, regex=True, na=False).to_numpy()
+        currency[mask] = code
+    wan = text.str.contains("万", na=False).to_numpy()
+    numbers = _numbers(text) * np.where(wan, 10000, scale)
+    rate = np.array([rates.get(c, np.nan) for c in currency], dtype=np.float64)
+    return (numbers * rate)[codes], currency[codes]
+
+
+def normalize_units(units: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """返回 (标准单位, 换算倍数)；无法识别的单位原样保留、倍数为 1。"""
+    codes, text = _factorize(units)
+    mapped = [UNIT_ALIASES.get(k, (k, 1.0)) for k in text.str.lower().fillna("")]
+    canonical = np.array([m[0] for m in mapped], dtype=object)
+    factor = np.array([m[1] for m in mapped], dtype=np.float64)
+    return canonical[codes], factor[codes]
+
+
+def _text(values: pd.Series) -> np.ndarray:
+    codes, text = _factorize(values)
+    return text.fillna("").to_numpy(dtype=object)[codes]
+
+
+def _is_total(values: np.ndarray) -> np.ndarray:
+    """合计 / 小计行标记，只对去重值做正则匹配。"""
+    codes, uniques = pd.factorize(values)
+    hit = pd.Series(uniques, dtype="string").str.fullmatch(TOTAL_RE, case=False)
+    return np.append(hit.fillna(False).to_numpy(dtype=bool), False)[codes]
+
+
+def _locate_header(df: pd.DataFrame) -> Tuple[int, Dict[str, int]]:
+    """返回 (表头所在行，-1 表示列名；字段 -> 列位置)。"""
+    best_row, best = -1, match_columns(list(df.columns))
+    for row in range(min(HEADER_SCAN_ROWS, len(df))):
+        matched = match_columns(df.iloc[row].tolist())
+        if len(matched) > len(best):
+            best_row, best = row, matched
+    return best_row, best
+
+
+def extract_table(
+    df: pd.DataFrame, sheet: str, rates: Mapping[str, float]
+) -> Optional[ExtractedTable]:
+    """识别并提取采购报价表；不像报价表（缺少价格列或产品 / 型号列）时返回 None。"""
+    if df.empty:
+        return None
+    header_row, matched = _locate_header(df)
+    if not _is_price_table(matched):
+        return None
+    headers = list(df.columns) if header_row < 0 else df.iloc[header_row].tolist()
+    body = df.iloc[header_row + 1 :]
+    out: Dict[str, object] = {
+        # 与 Excel 行号一致：列名占第 1 行
+        "row": (np.arange(header_row + 1, len(df)) + 2).astype(np.int64),
+    }
+    n = len(body)
+    for field in TEXT_FIELDS:
+        out[field] = _text(body.iloc[:, matched[field]]) if field in matched else _repeat("", n)
+
+    quantity = np.full(n, np.nan)
+    if "quantity" in matched:
+        raw = body.iloc[:, matched["quantity"]]
+        if pd.api.types.is_numeric_dtype(raw.dtype):
+            quantity = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            codes, text = _factorize(raw)
+            quantity = _numbers(text)[codes]
+            if "unit" not in matched:
+                # 数量列中的单位，例如 "10台"
+                units = text.str.replace(NUMBER_RE, "", regex=True).str.strip().fillna("")
+                out["unit"] = units.to_numpy(dtype=object)[codes]
+
+    unit, factor = normalize_units(pd.Series(out["unit"]))
+    currency = _repeat("CNY", n)
+    amount = np.full(n, np.nan)
+    if "amount" in matched:
+        amount, currency = parse_money(
+            body.iloc[:, matched["amount"]], _normalize_header(headers[matched["amount"]]), rates
+        )
+    if "unit_price" in matched:
+        price, currency = parse_money(
+            body.iloc[:, matched["unit_price"]],
+            _normalize_header(headers[matched["unit_price"]]),
+            rates,
+        )
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = np.where(quantity > 0, amount / quantity, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 数量换算到标准单位，单价相应换算为每标准单位价格
+        out["quantity"] = quantity * factor
+        out["unit_price"] = price / factor
+    out["amount"] = amount
+    out["unit"] = unit
+    out["currency"] = currency
+
+    # 丢弃没有价格、没有产品 / 型号的行（空行等）以及合计行；在数组上过滤，只构造一次 DataFrame
+    keep = (
+        ~np.isnan(out["unit_price"])
+        & ((out["product"] != "") | (out["model"] != ""))
+        & ~(_is_total(out["product"]) | _is_total(out["model"]))
+    )
+    if not keep.any():
+        return None
+    if not keep.all():
+        out = {field: values[keep] for field, values in out.items()}
+    frame = pd.DataFrame(out)
+    columns = {field: str(headers[i]) for field, i in matched.items()}
+    return ExtractedTable(sheet=sheet, columns=columns, frame=frame)
+
+
+# ---------------------------------------------------------------------------
+# 统计与格式化
+# ---------------------------------------------------------------------------
+
+GROUP_KEYS = ("product", "model", "unit")
+
+
+def summarize(table: ExtractedTable) -> pd.DataFrame:
+    """按 产品 / 型号 / 单位 分组统计单价：报价数、最低 / 最高 / 平均单价与最低价供应商。"""
+    frame = table.frame
+    grouped = frame.groupby(list(GROUP_KEYS), sort=False)["unit_price"]
+    # 逐个调用聚合而非 agg([...])：小表上 agg 的多函数分派是主要开销
+    summary = pd.DataFrame(
+        {"count": grouped.count(), "min": grouped.min(), "max": grouped.max(), "mean": grouped.mean()}
+    )
+    summary["best_supplier"] = frame["supplier"].to_numpy()[grouped.idxmin().to_numpy()]
+    return summary.reset_index().sort_values("count", ascending=False, kind="stable")
+
+
+def format_summary(table: ExtractedTable, max_groups: int) -> str:
+    """比价统计的 markdown 摘要（单价为人民币 / 标准单位）。"""
+    summary = summarize(table)
+    shown = summary.head(max_groups).rename(
+        columns={
+            "product": "产品", "model": "型号", "unit": "单位", "count": "报价数",
+            "min": "最低单价", "max": "最高单价", "mean": "平均单价", "best_supplier": "最低价供应商",
+        }
+    )
+    text = (
+        f"【结构化提取: {table.sheet}】共 {len(table)} 条报价，单价已换算为人民币 / 标准单位\n"
+        + shown.round(2).to_markdown(index=False)
+    )
+    if len(summary) > max_groups:
+        text += f"\n... 共 {len(summary)} 组，仅显示报价数最多的 {max_groups} 组"
+    return text
+
+
+def to_records(frame: pd.DataFrame) -> List[Dict[str, object]]:
+    """转为 JSON 可序列化的行列表，NaN 记为 None。"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict("records")
+
+
+# ---------------------------------------------------------------------------
+# 存储：每个文件一个 npz（存入 file_artifacts.tables），数值列为 float64，文本列为定长 unicode 数组（不使用 pickle）
+# ---------------------------------------------------------------------------
+
+COLUMNS = ("row", *TEXT_FIELDS, *NUMBER_FIELDS, "currency")
+
+
+def dump_tables(tables: Sequence[ExtractedTable]) -> bytes:
+    arrays: Dict[str, np.ndarray] = {}
+    meta = []
+    for i, table in enumerate(tables):
+        meta.append({"sheet": table.sheet, "columns": table.columns})
+        for name in COLUMNS:
+            values = table.frame[name].to_numpy()
+            arrays[f"{i}/{name}"] = values.astype(str) if values.dtype == object else values
+    arrays["meta"] = np.array(json.dumps(meta, ensure_ascii=False))
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_tables(data: bytes) -> List[ExtractedTable]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        meta = json.loads(str(archive["meta"]))
+        tables = []
+        for i, info in enumerate(meta):
+            frame = pd.DataFrame(
+                {
+                    name: archive[f"{i}/{name}"].astype(object)
+                    if archive[f"{i}/{name}"].dtype.kind == "U"
+                    else archive[f"{i}/{name}"]
+                    for name in COLUMNS
+                }
+            )
+            tables.append(ExtractedTable(sheet=info["sheet"], columns=info["columns"], frame=frame))
+    return tables
@@ -0,0 +1,205 @@
+"""
+链路追踪
+基于 OpenTelemetry：请求入口建立 server span，数据库（crud_*、run_sql）、文件解析与 LLM 调用
+各自建立子 span，trace id 写入日志与 X-Trace-Id 响应头。
+
+opentelemetry-sdk 为可选依赖（uv pip install -e ".[tracing]"），未安装或未配置 TRACING_EXPORTER 时
+所有 span 都是空操作；采样按 TRACING_SAMPLE_RATIO 的比例，并沿用上游 traceparent 的采样决定
+"""
+
+import functools
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from src.config import settings
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind
+except ImportError:  # pragma: no cover - 可选依赖
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = b"x-trace-id"
+
+# 启用后才创建 tracer：未启用时各入口直接返回，不经过 OpenTelemetry API
+_tracer: Any = None
+_provider: Any = None
+
+
+def setup_tracing() -> None:
+    """按 TRACING_EXPORTER 配置 TracerProvider；SDK 或导出器缺失时保持空操作并记录警告。"""
+    global _provider, _tracer
+    exporter_name = settings.TRACING_EXPORTER
+    if not exporter_name or _provider is not None:
+        return
+    if trace is None:
+        logger.warning("未安装 opentelemetry，链路追踪未启用")
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("未安装 opentelemetry-sdk，链路追踪未启用")
+        return
+
+    try:
+        exporter = _create_exporter(exporter_name)
+    except ImportError as exc:
+        logger.warning(f"追踪导出器不可用: {exporter_name}, {exc}")
+        return
+    if exporter is None:
+        logger.warning(f"未知的 TRACING_EXPORTER: {exporter_name}")
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.APP_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    # 批量异步导出，span 结束时只入队
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    _tracer = trace.get_tracer("source-comparison-backend")
+    logger.info(
+        f"链路追踪已启用: exporter={exporter_name}, sample_ratio={settings.TRACING_SAMPLE_RATIO}"
+    )
+
+
+def _create_exporter(name: str) -> Any:
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if name in ("file", "console"):
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        if name == "console":
+            return ConsoleSpanExporter()
+        os.makedirs(os.path.dirname(settings.TRACING_FILE) or ".", exist_ok=True)
+        # 每行一个 span 的 JSON，可直接导入 collector 或用 jq 查看
+        return ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    return None
+
+
+def shutdown_tracing() -> None:
+    """导出剩余的 span。"""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+        _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """在当前上下文下建立子 span；未启用时为空操作。异常会记录到 span 上并继续抛出。"""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes or None) as current:
+        yield current
+
+
+def start_span(name: str, parent: Any = None, **attributes: Any) -> Any:
+    """建立不绑定为当前上下文的 span，须手动 end()；用于跨 yield 的异步生成器。
+
+    parent 为空时以当前上下文中的 span 为父。
+    """
+    if _tracer is None:
+        return None
+    context = trace.set_span_in_context(parent) if parent is not None else None
+    return _tracer.start_span(name, context=context, attributes=attributes or None)
+
+
+def end_span(current: Any) -> None:
+    if current is not None:
+        current.end()
+
+
+def mark_error(current: Any, description: str) -> None:
+    """将未以异常形式抛出的失败（如 run_sql 返回的 error）标记到 span 上。"""
+    if current is not None:
+        current.set_status(trace.Status(trace.StatusCode.ERROR, description))
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """为协程函数建立 span 的装饰器，默认以函数限定名命名。"""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_trace_id() -> Optional[str]:
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.is_valid else None
+
+
+class TraceIdFilter(logging.Filter):
+    """为日志记录附加 trace_id 字段，没有活动 span 时为 -。"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class TracingMiddleware:
+    """纯 ASGI 中间件：提取上游 traceparent，建立 server span，并在响应头写入 X-Trace-Id。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as server_span:
+            context = server_span.get_span_context()
+            trace_id = format(context.trace_id, "032x").encode() if context.is_valid else None
+
+            async def send_wrapper(message) -> None:
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.response.status_code", message["status"])
+                    if trace_id is not None:
+                        message["headers"] = [
+                            *message.get("headers", []),
+                            (TRACE_ID_HEADER, trace_id),
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    server_span.update_name(f"{method} {route}")
+                    server_span.set_attribute("http.route", route)
@@ -21,7 +21,9 @@ CREATE TABLE IF NOT EXISTS conversations (
     name VARCHAR(255) NOT NULL,
     first_user_message TEXT,
     status VARCHAR(50) DEFAULT 'active',
-    pinned TINYINT DEFAULT 0 COMMENT '是否置顶（1 置顶，0 普通）'
+    pinned TINYINT DEFAULT 0 COMMENT '是否置顶（1 置顶，0 普通）',
+    INDEX idx_conversations_pinned_updated (pinned, updated_at, id),
+    INDEX idx_conversations_status_updated (status, updated_at)
 );
 
 -- 创建消息表
@@ -34,10 +36,65 @@ CREATE TABLE IF NOT EXISTS messages (
     content TEXT NOT NULL,
     deep_thinking TEXT,
     model VARCHAR(100),
+    -- 大字段移出行外时指向 message_blobs.sha256，content / deep_thinking 只保留预览
+    content_ref CHAR(64),
+    thinking_ref CHAR(64),
     CONSTRAINT fk_messages_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
-    INDEX idx_messages_conversation (conversation_id)
+    INDEX idx_messages_conversation_created (conversation_id, created_at, id),
+    INDEX idx_messages_content_ref (content_ref),
+    INDEX idx_messages_thinking_ref (thinking_ref)
 );
 
+-- 创建消息大字段表：按内容 sha256 去重，zstd / zlib 压缩存储
+CREATE TABLE IF NOT EXISTS message_blobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    raw_size INT NOT NULL,
+    data LONGBLOB NOT NULL,
+    UNIQUE KEY uk_message_blobs_sha256 (sha256)
+);
+
+-- 创建上传文件工件表：原文件与解析文本按内容 sha256 去重压缩存储，tables 为识别出的报价表
+CREATE TABLE IF NOT EXISTS file_artifacts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    ext VARCHAR(16) NOT NULL,
+    size INT NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    data LONGBLOB NOT NULL,
+    parsed_codec VARCHAR(16) NOT NULL,
+    parsed_size INT NOT NULL,
+    parsed LONGBLOB NOT NULL,
+    tables LONGBLOB,
+    UNIQUE KEY uk_file_artifacts_sha256 (sha256)
+);
+
+-- 创建会话与上传文件的关联表，chunks 为写入会话检索索引的片段数
+CREATE TABLE IF NOT EXISTS conversation_artifacts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    conversation_id INT NOT NULL,
+    artifact_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    chunks INT NOT NULL DEFAULT 0,
+    CONSTRAINT fk_conversation_artifacts_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+    CONSTRAINT fk_conversation_artifacts_artifact FOREIGN KEY (artifact_id) REFERENCES file_artifacts(id),
+    UNIQUE KEY uk_conversation_artifacts (conversation_id, artifact_id),
+    INDEX idx_conversation_artifacts_artifact (artifact_id)
+);
+
+-- 会话历史检索：标题与消息内容的中文全文索引（ngram 二元组），消息写入时由数据库增量维护
+SET experimental_fulltext_index = 1;
+CREATE FULLTEXT INDEX ftidx_conversations_name ON conversations (name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftidx_messages_content ON messages (content) WITH PARSER ngram;
+
 -- 创建 MOI 业务数据库 (如果不存在)
 CREATE DATABASE IF NOT EXISTS xunyuan_agent;
 
@@ -45,7 +102,9 @@ CREATE DATABASE IF NOT EXISTS xunyuan_agent;
 USE xunyuan_agent;
 
 -- 创建示例表结构 (根据项目需求调整)
--- 这里只创建基本的表结构，实际数据需要从外部导入
+-- 这里只创建基本的表结构，实际数据通过导入命令写入：
+--   cd backend && python -m src.ingest load bidding <CSV/Excel 文件>...
+--   cd backend && python -m src.ingest load price <CSV/Excel 文件>...
 
 -- 采购项目投标记录表
 CREATE TABLE IF NOT EXISTS bidding_records_1 (
@@ -65,8 +124,9 @@ CREATE TABLE IF NOT EXISTS bidding_records_1 (
   PRIMARY KEY (`id`),
 );
 
--- 产品价格表
+-- 产品价格表（全文索引要求表带主键）
 CREATE TABLE IF NOT EXISTS product_price (
+  `id` bigint NOT NULL AUTO_INCREMENT,
   `项目名称` varchar(255) DEFAULT NULL,
   `单位` varchar(255) DEFAULT NULL,
   `物料编码` varchar(255) DEFAULT NULL,
@@ -77,8 +137,21 @@ CREATE TABLE IF NOT EXISTS product_price (
   `最低价（元）` varchar(255) DEFAULT NULL,
   `project_name_embedding` vecf64 (1024) DEFAULT NULL,
   `product_embedding` vecf64 (1024) DEFAULT NULL,
+  PRIMARY KEY (`id`)
 );
 
+-- 中文关键词检索：ngram 全文索引（二元组切分），导入数据时由数据库自动维护
+SET experimental_fulltext_index = 1;
+CREATE FULLTEXT INDEX ftidx_bidding_item ON bidding_records_1 (`项目名称`, `细化产品`) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftidx_price_item ON product_price (`物料短描述`, `项目名称`) WITH PARSER ngram;
+
+-- 向量索引（IVF）：导入数据后创建，导入命令以 --ivf-lists 重建
+-- SET experimental_ivf_index = 1;
+-- CREATE INDEX ivf_bidding_project USING ivfflat ON bidding_records_1 (project_name_embedding) LISTS = 256 OP_TYPE 'vector_l2_ops';
+-- CREATE INDEX ivf_bidding_product USING ivfflat ON bidding_records_1 (product_embedding) LISTS = 256 OP_TYPE 'vector_l2_ops';
+-- CREATE INDEX ivf_price_project USING ivfflat ON product_price (project_name_embedding) LISTS = 64 OP_TYPE 'vector_l2_ops';
+-- CREATE INDEX ivf_price_product USING ivfflat ON product_price (product_embedding) LISTS = 64 OP_TYPE 'vector_l2_ops';
+
 -- 输出初始化完成信息
 SELECT 'MatrixOne database initialization completed successfully!' as status;
 
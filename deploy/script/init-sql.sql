@@ -15,7 +15,9 @@ CREATE TABLE IF NOT EXISTS conversations (
     name VARCHAR(255) NOT NULL,
     first_user_message TEXT NULL,
     status VARCHAR(50) NOT NULL DEFAULT 'active',
-    pinned TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否置顶（1 置顶，0 普通）'
+    pinned TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否置顶（1 置顶，0 普通）',
+    INDEX idx_conversations_pinned_updated (pinned, updated_at, id),
+    INDEX idx_conversations_status_updated (status, updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS messages (
@@ -28,6 +30,60 @@ CREATE TABLE IF NOT EXISTS messages (
     content TEXT NOT NULL,
     deep_thinking TEXT NULL,
     model VARCHAR(100) NULL,
+    -- 大字段移出行外时指向 message_blobs.sha256，content / deep_thinking 只保留预览
+    content_ref CHAR(64) NULL,
+    thinking_ref CHAR(64) NULL,
     CONSTRAINT fk_messages_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
-    INDEX idx_messages_conversation (conversation_id)
+    INDEX idx_messages_conversation_created (conversation_id, created_at, id),
+    INDEX idx_messages_content_ref (content_ref),
+    INDEX idx_messages_thinking_ref (thinking_ref)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS message_blobs (
+    -- 消息大字段：按内容 sha256 去重，zstd / zlib 压缩存储
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    raw_size INT NOT NULL,
+    data LONGBLOB NOT NULL,
+    UNIQUE KEY uk_message_blobs_sha256 (sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS file_artifacts (
+    -- 上传文件与解析文本：按内容 sha256 去重，zstd / zlib 压缩存储
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    ext VARCHAR(16) NOT NULL,
+    size INT NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    data LONGBLOB NOT NULL,
+    parsed_codec VARCHAR(16) NOT NULL,
+    parsed_size INT NOT NULL,
+    parsed LONGBLOB NOT NULL,
+    tables LONGBLOB NULL,
+    UNIQUE KEY uk_file_artifacts_sha256 (sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS conversation_artifacts (
+    -- 会话与上传文件的关联，chunks 为写入会话检索索引的片段数
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    conversation_id INT NOT NULL,
+    artifact_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    chunks INT NOT NULL DEFAULT 0,
+    CONSTRAINT fk_conversation_artifacts_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+    CONSTRAINT fk_conversation_artifacts_artifact FOREIGN KEY (artifact_id) REFERENCES file_artifacts(id),
+    UNIQUE KEY uk_conversation_artifacts (conversation_id, artifact_id),
+    INDEX idx_conversation_artifacts_artifact (artifact_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 会话历史检索：标题与消息内容的中文全文索引（ngram 二元组）
+CREATE FULLTEXT INDEX ftidx_conversations_name ON conversations (name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftidx_messages_content ON messages (content) WITH PARSER ngram;
@@ -0,0 +1,42 @@
+-- 迁移 001：为 MOI 数据表建立中文全文索引（MatrixOne）
+-- 替代 `项目名称` / `细化产品` / `物料短描述` 上的前导通配 LIKE 全表扫描
+-- 执行：mysql -h <host> -P 6001 -u <account:admin> -p < 001_moi_fulltext_index.sql
+
+USE xunyuan_agent;
+
+-- product_price 原表无主键，全文索引需要主键：重建表并保留数据
+CREATE TABLE IF NOT EXISTS product_price_new (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `项目名称` varchar(255) DEFAULT NULL,
+  `单位` varchar(255) DEFAULT NULL,
+  `物料编码` varchar(255) DEFAULT NULL,
+  `物料短描述` varchar(255) DEFAULT NULL,
+  `物料单位` varchar(255) DEFAULT NULL,
+  `平均单价（元）` varchar(255) DEFAULT NULL,
+  `最高价（元）` varchar(255) DEFAULT NULL,
+  `最低价（元）` varchar(255) DEFAULT NULL,
+  `project_name_embedding` vecf64 (1024) DEFAULT NULL,
+  `product_embedding` vecf64 (1024) DEFAULT NULL,
+  PRIMARY KEY (`id`)
+);
+
+INSERT INTO product_price_new (
+  `项目名称`, `单位`, `物料编码`, `物料短描述`, `物料单位`,
+  `平均单价（元）`, `最高价（元）`, `最低价（元）`,
+  `project_name_embedding`, `product_embedding`
+)
+SELECT
+  `项目名称`, `单位`, `物料编码`, `物料短描述`, `物料单位`,
+  `平均单价（元）`, `最高价（元）`, `最低价（元）`,
+  `project_name_embedding`, `product_embedding`
+FROM product_price;
+
+ALTER TABLE product_price RENAME TO product_price_old;
+ALTER TABLE product_price_new RENAME TO product_price;
+
+SET experimental_fulltext_index = 1;
+CREATE FULLTEXT INDEX ftidx_bidding_item ON bidding_records_1 (`项目名称`, `细化产品`) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftidx_price_item ON product_price (`物料短描述`, `项目名称`) WITH PARSER ngram;
+
+-- 确认数据无误后再删除旧表
+-- DROP TABLE product_price_old;
@@ -0,0 +1,11 @@
+-- 迁移 002：会话 / 消息列表的 keyset 分页复合索引（MySQL 8+ / MatrixOne）
+-- 会话列表排序 (pinned DESC, updated_at DESC, id DESC)
+-- 消息列表排序 conversation_id = ? ORDER BY (created_at, id)
+
+USE source_agent;
+
+CREATE INDEX idx_conversations_pinned_updated ON conversations (pinned, updated_at, id);
+
+-- 新索引以 conversation_id 开头，可继续支撑外键，原单列索引随后删除
+CREATE INDEX idx_messages_conversation_created ON messages (conversation_id, created_at, id);
+DROP INDEX idx_messages_conversation ON messages;
@@ -0,0 +1,7 @@
+-- 迁移 003：会话清理 / 归档
+-- 删除与归档先把 status 置为 deleting / archiving，列表接口过滤这两种状态；
+-- 保留策略按 (status, updated_at) 扫描长期未更新的会话
+
+USE source_agent;
+
+CREATE INDEX idx_conversations_status_updated ON conversations (status, updated_at);
@@ -0,0 +1,23 @@
+-- 迁移 004：消息大字段压缩与行外存储
+-- 超过阈值的 content / deep_thinking 压缩后存入 message_blobs（按 sha256 去重），
+-- 消息行只保留预览与引用；存量数据执行 `python -m src.compact_messages` 迁移
+
+USE source_agent;
+
+ALTER TABLE messages
+    ADD COLUMN content_ref CHAR(64) NULL,
+    ADD COLUMN thinking_ref CHAR(64) NULL;
+
+CREATE INDEX idx_messages_content_ref ON messages (content_ref);
+CREATE INDEX idx_messages_thinking_ref ON messages (thinking_ref);
+
+CREATE TABLE IF NOT EXISTS message_blobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    raw_size INT NOT NULL,
+    data LONGBLOB NOT NULL,
+    UNIQUE KEY uk_message_blobs_sha256 (sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,8 @@
+-- 迁移 005：会话历史检索的中文全文索引（MatrixOne，ngram 按二元组切分）
+-- 消息同步写入时由数据库增量维护；服务启动时也会检查并补建缺失的索引
+
+USE source_agent;
+
+SET experimental_fulltext_index = 1;
+CREATE FULLTEXT INDEX ftidx_conversations_name ON conversations (name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ftidx_messages_content ON messages (content) WITH PARSER ngram;
@@ -0,0 +1,35 @@
+-- 迁移 006：上传文件工件
+-- 指定会话上传的文件与解析文本按内容 sha256 去重压缩存储，消息以 [[artifact:<sha256>]] 引用文件，
+-- 不再在 messages.content 中粘贴解析全文；会话清理时删除关联并回收不再被引用的文件
+
+USE source_agent;
+
+CREATE TABLE IF NOT EXISTS file_artifacts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    sha256 CHAR(64) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    ext VARCHAR(16) NOT NULL,
+    size INT NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    data LONGBLOB NOT NULL,
+    parsed_codec VARCHAR(16) NOT NULL,
+    parsed_size INT NOT NULL,
+    parsed LONGBLOB NOT NULL,
+    UNIQUE KEY uk_file_artifacts_sha256 (sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS conversation_artifacts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    conversation_id INT NOT NULL,
+    artifact_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    chunks INT NOT NULL DEFAULT 0,
+    CONSTRAINT fk_conversation_artifacts_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+    CONSTRAINT fk_conversation_artifacts_artifact FOREIGN KEY (artifact_id) REFERENCES file_artifacts(id),
+    UNIQUE KEY uk_conversation_artifacts (conversation_id, artifact_id),
+    INDEX idx_conversation_artifacts_artifact (artifact_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,7 @@
+-- 迁移 007：报价表结构化提取结果
+-- 表格文件中识别出的报价表以类型化列（npz）随上传文件工件存储，供 /api/files/{sha256}/tables 与比价计算使用；
+-- 历史文件该列为空，首次查询时由原文件重新提取并回填
+
+USE source_agent;
+
+ALTER TABLE file_artifacts ADD COLUMN tables LONGBLOB NULL;